@@ -1,49 +1,247 @@
+import base64
+import itertools
+import json
+import threading
+import time
+
 import requests
 
-def get_jwt_token(config):
+# Refresh tokens this many seconds before their `exp` claim
+DEFAULT_REFRESH_MARGIN = 60
+
+# Lifetime assumed for tokens that carry no `exp` claim
+DEFAULT_TOKEN_TTL = 300
+
+# Delay between refresh attempts after a failed refresh
+REFRESH_RETRY_INTERVAL = 5
+
+
+def _auth_credentials(config):
     """
-    Obtain JWT token from the configured token endpoint.
-    
+    Validate the auth section of the config and return the credential pool.
+
     Args:
         config: Configuration dictionary containing host, auth details
-        
+
     Returns:
-        JWT access token string or empty string if no auth needed
-        
+        List of (username, password) tuples, one per configured credential
+
     Raises:
         ValueError: If required config keys are missing
-        Exception: If token request fails
     """
-    # Check if authentication is disabled
-    if config.get("auth", {}).get("type") == "none":
-        return ""
-    
-    # Validate required configuration
     required_keys = ["host", "auth"]
     for key in required_keys:
         if key not in config:
             raise ValueError(f"Missing required config key: {key}")
-    
+
     auth_config = config["auth"]
-    required_auth_keys = ["token_url", "username", "password"]
+    if "token_url" not in auth_config:
+        raise ValueError("Missing required auth config key: token_url")
+
+    # A pool of credentials replaces the single username/password pair
+    if "credentials" in auth_config:
+        credentials = []
+        for entry in auth_config["credentials"]:
+            for key in ["username", "password"]:
+                if key not in entry:
+                    raise ValueError(f"Missing required auth credential key: {key}")
+            credentials.append((entry["username"], entry["password"]))
+        if not credentials:
+            raise ValueError("auth.credentials must contain at least one entry")
+        return credentials
+
+    required_auth_keys = ["username", "password"]
     for key in required_auth_keys:
         if key not in auth_config:
             raise ValueError(f"Missing required auth config key: {key}")
-    
+
+    return [(auth_config["username"], auth_config["password"])]
+
+
+def _request_token(url, username, password):
+    """
+    POST credentials to the token endpoint and return the access token.
+    """
     try:
-        url = config["host"] + auth_config["token_url"]
         payload = {
-            "username": auth_config["username"],
-            "password": auth_config["password"]
+            "username": username,
+            "password": password
         }
         response = requests.post(url, json=payload, timeout=10)
         response.raise_for_status()
         token = response.json().get("access_token", "")
-        
+
         if not token:
             raise ValueError("No access_token in response")
-        
+
         return token
     except requests.RequestException as e:
         raise Exception(f"Failed to obtain JWT token: {e}")
 
+
+def decode_jwt_expiry(token):
+    """
+    Read the `exp` claim from a JWT without verifying its signature.
+
+    Args:
+        token: Encoded JWT string
+
+    Returns:
+        Expiry as a Unix timestamp, or None if the token has no readable `exp`
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def get_jwt_token(config):
+    """
+    Obtain JWT token from the configured token endpoint.
+
+    Args:
+        config: Configuration dictionary containing host, auth details
+
+    Returns:
+        JWT access token string or empty string if no auth needed
+
+    Raises:
+        ValueError: If required config keys are missing
+        Exception: If token request fails
+    """
+    # Check if authentication is disabled
+    if config.get("auth", {}).get("type") == "none":
+        return ""
+
+    username, password = _auth_credentials(config)[0]
+    url = config["host"] + config["auth"]["token_url"]
+    return _request_token(url, username, password)
+
+
+class CachedToken:
+    """
+    A JWT shared by every user in the process, refreshed before it expires.
+
+    `headers` always holds the current Authorization header and is replaced
+    as a whole on refresh, so readers never see a half-updated value.
+    """
+
+    def __init__(self, url, username, password, refresh_margin):
+        self.url = url
+        self.username = username
+        self._password = password
+        self.refresh_margin = refresh_margin
+        self.token = ""
+        self.expires_at = 0.0
+        self.headers = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def ensure(self):
+        """
+        Fetch the token on first use. Concurrent callers wait for the single
+        in-flight request instead of issuing their own.
+        """
+        if self.token:
+            return self
+        with self._lock:
+            if not self.token:
+                self._fetch()
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop,
+                    name=f"jwt-refresh-{self.username}",
+                    daemon=True
+                )
+                self._refresher.start()
+        return self
+
+    def _fetch(self):
+        token = _request_token(self.url, self.username, self._password)
+        expires_at = decode_jwt_expiry(token)
+        if expires_at is None:
+            expires_at = time.time() + DEFAULT_TOKEN_TTL
+        self.token = token
+        self.expires_at = expires_at
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def _refresh_loop(self):
+        # Refresh ahead of expiry; on failure keep serving the old token
+        # and retry until it is replaced
+        delay = max(self.expires_at - self.refresh_margin - time.time(), 0)
+        while True:
+            time.sleep(delay)
+            try:
+                with self._lock:
+                    self._fetch()
+                delay = max(self.expires_at - self.refresh_margin - time.time(),
+                            REFRESH_RETRY_INTERVAL)
+            except Exception as e:
+                print(f"Warning: JWT refresh for {self.username} failed: {e}")
+                delay = REFRESH_RETRY_INTERVAL
+
+
+class TokenCache:
+    """
+    Process-wide JWT cache keyed by (host, token_url, username).
+
+    With `auth.credentials` configured, successive lookups are handed out
+    round-robin across the credential pool.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, config):
+        """
+        Return the shared CachedToken for the next credential in the pool.
+
+        Args:
+            config: Configuration dictionary containing host, auth details
+
+        Returns:
+            CachedToken holding a valid token, or None if auth is disabled
+
+        Raises:
+            ValueError: If required config keys are missing
+            Exception: If the initial token request fails
+        """
+        if config.get("auth", {}).get("type") == "none":
+            return None
+
+        credentials = _auth_credentials(config)
+        auth_config = config["auth"]
+        pool_key = (config["host"], auth_config["token_url"], tuple(u for u, _ in credentials))
+        refresh_margin = auth_config.get("refresh_margin", DEFAULT_REFRESH_MARGIN)
+
+        with self._lock:
+            if pool_key not in self._pools:
+                self._pools[pool_key] = itertools.cycle(credentials)
+            username, password = next(self._pools[pool_key])
+
+            key = (config["host"], auth_config["token_url"], username)
+            entry = self._tokens.get(key)
+            if entry is None:
+                entry = CachedToken(
+                    config["host"] + auth_config["token_url"],
+                    username,
+                    password,
+                    refresh_margin
+                )
+                self._tokens[key] = entry
+
+        return entry.ensure()
+
+
+_token_cache = TokenCache()
+
+
+def get_shared_token(config):
+    """
+    Return the process-wide CachedToken for this config (None if auth is off).
+    """
+    return _token_cache.get(config)
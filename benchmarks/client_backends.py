@@ -0,0 +1,144 @@
+import argparse
+import csv
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKENDS = ["requests", "fasthttp"]
+
+
+def wait_for_port(host, port, timeout=10):
+    """
+    Block until a TCP server accepts connections on host:port.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Stub server did not start on {host}:{port}")
+
+
+def write_fixtures(workdir, host):
+    """
+    Write a config and a zero-wait scenario pointing at the stub server.
+    """
+    config_path = os.path.join(workdir, "env.yaml")
+    scenario_path = os.path.join(workdir, "scenario.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump({"host": host, "auth": {"type": "none"}}, f)
+    with open(scenario_path, "w") as f:
+        yaml.safe_dump({
+            "name": "Backend benchmark",
+            "wait_time": {"min": 0, "max": 0},
+            "requests": [
+                {"name": "Get Items", "method": "GET", "endpoint": "/items", "weight": 3},
+                {"name": "Create Item", "method": "POST", "endpoint": "/items",
+                 "payload": {"name": "bench"}, "weight": 1},
+            ],
+        }, f)
+    return config_path, scenario_path
+
+
+def read_aggregated(csv_prefix):
+    """
+    Return the Aggregated row of a Locust stats CSV.
+    """
+    with open(f"{csv_prefix}_stats.csv") as f:
+        for row in csv.DictReader(f):
+            if row["Name"] == "Aggregated":
+                return row
+    raise ValueError(f"No Aggregated row in {csv_prefix}_stats.csv")
+
+
+def run_backend(backend, host, users, duration, config_path, scenario_path, workdir):
+    """
+    Run one single-process Locust against the stub and measure its CPU cost.
+    """
+    env = dict(os.environ,
+               API_PERF_CONFIG=config_path,
+               API_PERF_SCENARIO=scenario_path,
+               API_PERF_CLIENT=backend)
+    csv_prefix = os.path.join(workdir, backend)
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    subprocess.run([
+        "locust",
+        "-f", "locustfiles/dynamic_tasks.py",
+        "--headless",
+        "-u", str(users),
+        "-r", str(users),
+        "-t", f"{duration}s",
+        "--host", host,
+        "--csv", csv_prefix,
+        "--only-summary",
+        "--loglevel", "WARNING",
+    ], cwd=ROOT_DIR, env=env, check=False, stdout=subprocess.DEVNULL)
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    row = read_aggregated(csv_prefix)
+    requests = int(row["Request Count"])
+    cpu_seconds = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return {
+        "backend": backend,
+        "requests": requests,
+        "failures": int(row["Failure Count"]),
+        "rps": float(row["Requests/s"]),
+        "cpu_seconds": cpu_seconds,
+        "rps_per_core": requests / cpu_seconds if cpu_seconds > 0 else 0,
+        "p95": float(row["95%"]),
+    }
+
+
+def main():
+    """
+    Compare max sustained RPS per core of the requests and fasthttp backends.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark Locust client backends")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=int, default=20, help="Seconds per backend")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    args = parser.parse_args()
+
+    host = f"http://127.0.0.1:{args.port}"
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, "benchmarks", "stub_server.py"),
+         "--port", str(args.port)],
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port("127.0.0.1", args.port)
+        with tempfile.TemporaryDirectory() as workdir:
+            config_path, scenario_path = write_fixtures(workdir, host)
+            results = []
+            for backend in args.backends:
+                print(f"⏱️  Benchmarking {backend} backend ({args.users} users, {args.duration}s)...")
+                results.append(run_backend(
+                    backend, host, args.users, args.duration, config_path, scenario_path, workdir
+                ))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print("\n" + "="*72)
+    print(f"{'Backend':<10} {'Requests':>10} {'Failures':>9} {'RPS':>9} {'CPU s':>8} {'RPS/core':>10} {'P95 ms':>8}")
+    print("="*72)
+    for r in results:
+        print(f"{r['backend']:<10} {r['requests']:>10,} {r['failures']:>9,} {r['rps']:>9.0f} "
+              f"{r['cpu_seconds']:>8.1f} {r['rps_per_core']:>10.0f} {r['p95']:>8.0f}")
+    print("="*72)
+
+
+if __name__ == "__main__":
+    main()
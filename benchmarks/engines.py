@@ -0,0 +1,158 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import psutil
+import yaml
+
+from client_backends import read_aggregated, wait_for_port
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "runner"))
+sys.path.insert(0, ROOT_DIR)
+
+from run import async_engine_command, locust_env, master_command  # noqa: E402
+
+# Engine name -> Locust HTTP client backend (None for the asyncio engine)
+ENGINES = {"requests": "requests", "fasthttp": "fasthttp", "asyncio": None}
+
+# Seconds between RSS samples of the load generator
+SAMPLE_INTERVAL = 0.5
+
+
+def write_fixtures(workdir, host, wait_seconds):
+    """
+    Write a config and a scenario with a fixed think time, pointing at the stub server.
+
+    Returns:
+        Tuple of (config path, scenario path)
+    """
+    config_path = os.path.join(workdir, f"env_{wait_seconds}.yaml")
+    scenario_path = os.path.join(workdir, f"scenario_{wait_seconds}.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump({"host": host, "auth": {"type": "none"}, "sla_monitor": {"enabled": False},
+                        "generator_monitor": {"enabled": False}}, f)
+    with open(scenario_path, "w") as f:
+        yaml.safe_dump({
+            "name": "Engine benchmark",
+            "wait_time": {"min": wait_seconds, "max": wait_seconds},
+            "requests": [
+                {"name": "Get Items", "method": "GET", "endpoint": "/items", "weight": 3},
+                {"name": "Create Item", "method": "POST", "endpoint": "/items",
+                 "payload": {"name": "bench"}, "weight": 1},
+            ],
+        }, f)
+    return config_path, scenario_path
+
+
+def run_engine(engine, host, users, duration, config_path, scenario_path, reports_dir):
+    """
+    Run one single-process load generator the way runner/run.py would,
+    sampling its resident memory while it runs.
+
+    Returns:
+        Tuple of (Aggregated CSV row, CPU seconds, peak RSS in bytes)
+    """
+    os.makedirs(reports_dir, exist_ok=True)
+    settings = {"users": users, "spawn_rate": users, "run_time": f"{duration}s"}
+    env = dict(locust_env(reports_dir), API_PERF_CONFIG=config_path, API_PERF_SCENARIO=scenario_path)
+    if ENGINES[engine]:
+        env["API_PERF_CLIENT"] = ENGINES[engine]
+        command = master_command(settings, host, reports_dir, expect_workers=0) + [
+            "--only-summary", "--loglevel", "WARNING"]
+    else:
+        command = async_engine_command(settings, host, reports_dir)
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL)
+    monitored = psutil.Process(process.pid)
+    peak_rss = 0
+    while process.poll() is None:
+        try:
+            peak_rss = max(peak_rss, monitored.memory_info().rss)
+        except psutil.NoSuchProcess:
+            break
+        time.sleep(SAMPLE_INTERVAL)
+    process.wait()
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return read_aggregated(os.path.join(reports_dir, "results")), cpu_seconds, peak_rss
+
+
+def memory_stage(engine, args, host, workdir):
+    """
+    Hold `--idle-users` mostly idle users and one user, and return the
+    memory each additional user costs.
+    """
+    config_path, scenario_path = write_fixtures(workdir, host, args.idle_wait)
+    rss = {}
+    for users in (1, args.idle_users):
+        reports_dir = os.path.join(workdir, f"{engine}_memory_{users}")
+        _, _, rss[users] = run_engine(engine, host, users, args.idle_duration, config_path, scenario_path,
+                                      reports_dir)
+    return (rss[args.idle_users] - rss[1]) / (args.idle_users - 1), rss[args.idle_users]
+
+
+def throughput_stage(engine, args, host, workdir):
+    """
+    Saturate the engine with zero-wait users.
+
+    Returns:
+        Tuple of (max RPS, CPU microseconds per request, failures)
+    """
+    config_path, scenario_path = write_fixtures(workdir, host, 0)
+    reports_dir = os.path.join(workdir, f"{engine}_throughput")
+    row, cpu_seconds, _ = run_engine(engine, host, args.users, args.duration, config_path, scenario_path,
+                                     reports_dir)
+    requests = int(row["Request Count"])
+    return float(row["Requests/s"]), cpu_seconds / requests * 1e6 if requests else 0.0, int(row["Failure Count"])
+
+
+def main():
+    """
+    Compare memory per user and max RPS of the Locust client backends and the asyncio engine.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the load engines")
+    parser.add_argument("--users", type=int, default=50, help="Zero-wait users of the throughput stage")
+    parser.add_argument("--duration", type=int, default=20, help="Seconds of the throughput stage")
+    parser.add_argument("--idle-users", type=int, default=5000, help="Users of the memory stage")
+    parser.add_argument("--idle-wait", type=int, default=60, help="Think time (s) of the memory stage users")
+    parser.add_argument("--idle-duration", type=int, default=15, help="Seconds of the memory stage")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    args = parser.parse_args()
+
+    host = f"http://127.0.0.1:{args.port}"
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, "benchmarks", "stub_server.py"),
+         "--port", str(args.port)],
+        stdout=subprocess.DEVNULL
+    )
+    results = []
+    try:
+        wait_for_port("127.0.0.1", args.port)
+        with tempfile.TemporaryDirectory() as workdir:
+            for engine in args.engines:
+                print(f"⏱️  Benchmarking {engine} ({args.idle_users} idle users, then {args.users} busy users)...")
+                per_user, peak = memory_stage(engine, args, host, workdir)
+                rps, cpu_us, failures = throughput_stage(engine, args, host, workdir)
+                results.append((engine, per_user, peak, rps, cpu_us, failures))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print("\n" + "="*72)
+    print(f"{'Engine':<10} {'KB/user':>9} {'Peak MB':>9} {'Max RPS':>9} {'CPU us/req':>11} {'Failures':>9}")
+    print("="*72)
+    for engine, per_user, peak, rps, cpu_us, failures in results:
+        print(f"{engine:<10} {per_user / 1024:>9.1f} {peak / 2**20:>9.0f} {rps:>9.0f} {cpu_us:>11.0f} "
+              f"{failures:>9,}")
+    print("="*72)
+
+
+if __name__ == "__main__":
+    main()
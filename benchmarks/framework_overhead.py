@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+from client_backends import read_aggregated, wait_for_port
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "runner"))
+sys.path.insert(0, ROOT_DIR)
+
+from config.loader import CLIENT_BACKENDS  # noqa: E402
+from metrics.artifacts import HISTOGRAM_FILE  # noqa: E402
+from metrics.hdr_histogram import load_histograms, merge_all  # noqa: E402
+from report_generator import create_comprehensive_report  # noqa: E402
+from run import locust_env, master_command  # noqa: E402
+
+# Requests served by the stub; the latency stage adds a fixed delay to each
+BENCHMARK_REQUESTS = [
+    {"name": "List Items", "method": "GET", "endpoint": "/items", "weight": 3},
+    {"name": "Get Item", "method": "GET", "endpoint": "/items/{id}", "weight": 3,
+     "feeder": "items"},
+    {"name": "Create Item", "method": "POST", "endpoint": "/items", "weight": 1,
+     "payload": {"name": "bench", "owner": "{id}"}, "feeder": "items"},
+]
+
+# Metrics compared by --compare; True when a higher value is better
+COMPARED_RESULTS = {
+    "max_rps_per_worker": True,
+    "cpu_us_per_request": False,
+    "overhead_p50_ms": False,
+    "overhead_p99_ms": False,
+    "report_seconds": False,
+}
+
+
+def write_fixtures(workdir, host, latency_ms=None, payload_bytes=None):
+    """
+    Write a config, a zero-wait scenario and its feeder file for one stage.
+
+    Returns:
+        Tuple of (config path, scenario path)
+    """
+    config_path = os.path.join(workdir, "env.yaml")
+    scenario_path = os.path.join(workdir, "scenario.yaml")
+    feeder_path = os.path.join(workdir, "items.csv")
+    with open(feeder_path, "w") as f:
+        f.write("id\n" + "".join(f"{i}\n" for i in range(10000)))
+    with open(config_path, "w") as f:
+        yaml.safe_dump({"host": host, "auth": {"type": "none"}, "sla_monitor": {"enabled": False}}, f)
+
+    stub = {}
+    if latency_ms:
+        stub["latency"] = latency_ms
+    if payload_bytes:
+        stub["payload_bytes"] = payload_bytes
+    with open(scenario_path, "w") as f:
+        yaml.safe_dump({
+            "name": "Framework benchmark",
+            "wait_time": {"min": 0, "max": 0},
+            "stub": stub,
+            "feeders": {"items": {"file": feeder_path, "mode": "random"}},
+            "requests": BENCHMARK_REQUESTS,
+        }, f)
+    return config_path, scenario_path
+
+
+def start_stub(port, scenario_path):
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, "benchmarks", "stub_server.py"),
+         "--port", str(port), "--scenario", scenario_path, "--seed", "1"],
+        stdout=subprocess.DEVNULL
+    )
+    wait_for_port("127.0.0.1", port)
+    return stub
+
+
+def run_locust(host, users, duration, config_path, scenario_path, reports_dir, backend):
+    """
+    Run one standalone Locust process the way runner/run.py would.
+
+    Returns:
+        Tuple of (Aggregated CSV row, CPU seconds used by the process)
+    """
+    os.makedirs(reports_dir, exist_ok=True)
+    settings = {"users": users, "spawn_rate": users, "run_time": f"{duration}s"}
+    env = dict(locust_env(reports_dir),
+               API_PERF_CONFIG=config_path,
+               API_PERF_SCENARIO=scenario_path,
+               API_PERF_CLIENT=backend)
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    subprocess.run(
+        master_command(settings, host, reports_dir, expect_workers=0) + ["--only-summary", "--loglevel", "WARNING"],
+        cwd=ROOT_DIR, env=env, check=False, stdout=subprocess.DEVNULL
+    )
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return read_aggregated(os.path.join(reports_dir, "results")), cpu_seconds
+
+
+def throughput_stage(args, workdir):
+    """
+    Saturate one worker against a zero-latency stub.
+
+    Returns:
+        Dict with max RPS per worker, CPU time per request and the run folder
+    """
+    host = f"http://127.0.0.1:{args.port}"
+    config_path, scenario_path = write_fixtures(workdir, host, payload_bytes=args.payload_bytes)
+    reports_dir = os.path.join(workdir, "throughput")
+    stub = start_stub(args.port, scenario_path)
+    try:
+        row, cpu_seconds = run_locust(host, args.users, args.duration, config_path, scenario_path,
+                                      reports_dir, args.backend)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    requests = int(row["Request Count"])
+    return {
+        "requests": requests,
+        "failures": int(row["Failure Count"]),
+        "max_rps_per_worker": float(row["Requests/s"]),
+        "cpu_us_per_request": cpu_seconds / requests * 1e6 if requests else 0.0,
+        "reports_dir": reports_dir,
+    }
+
+
+def latency_stage(args, workdir):
+    """
+    Measure how much latency the framework adds on top of a fixed server delay.
+
+    A light load keeps the generator far from saturation, so the difference
+    between measured and configured latency is the per-request cost of the
+    client, the scenario plan and the event hooks.
+    """
+    host = f"http://127.0.0.1:{args.port}"
+    config_path, scenario_path = write_fixtures(workdir, host, latency_ms=args.latency_ms,
+                                                payload_bytes=args.payload_bytes)
+    reports_dir = os.path.join(workdir, "latency")
+    stub = start_stub(args.port, scenario_path)
+    try:
+        run_locust(host, args.latency_users, args.duration, config_path, scenario_path,
+                   reports_dir, args.backend)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    histogram = merge_all(load_histograms(os.path.join(reports_dir, HISTOGRAM_FILE)).values())
+    percentiles = histogram.percentiles_ms((50, 99))
+    return {
+        "overhead_p50_ms": percentiles[50] - args.latency_ms,
+        "overhead_p99_ms": percentiles[99] - args.latency_ms,
+    }
+
+
+def report_stage(reports_dir):
+    """
+    Time report generation for the throughput run.
+    """
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            create_comprehensive_report(reports_dir)
+        finally:
+            sys.stdout = stdout
+    return {"report_seconds": time.perf_counter() - started}
+
+
+def print_results(results, previous=None):
+    print("\n" + "="*64)
+    print(f"{'Metric':<24} {'Value':>14} {'Previous':>12} {'Change':>9}")
+    print("="*64)
+    for key, higher_is_better in COMPARED_RESULTS.items():
+        line = f"{key:<24} {results[key]:>14.3f}"
+        if previous and key in previous:
+            before = previous[key]
+            change = (results[key] - before) / abs(before) * 100 if before else 0.0
+            worse = change < 0 if higher_is_better else change > 0
+            line += f" {before:>12.3f} {change:>+8.1f}%{' ⚠️' if worse and abs(change) >= 10 else ''}"
+        print(line)
+    print("="*64)
+
+
+def main():
+    """
+    Benchmark the framework itself against the local stub server.
+
+    Reports the max request rate one worker process sustains, the CPU cost
+    and added latency per request, and the time to build the reports.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the framework's own overhead")
+    parser.add_argument("--users", type=int, default=50, help="Users in the throughput stage")
+    parser.add_argument("--latency-users", type=int, default=10, help="Users in the latency stage")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Stub latency in the latency stage")
+    parser.add_argument("--payload-bytes", type=int, default=1024, help="Stub response size")
+    parser.add_argument("--duration", type=int, default=20, help="Seconds per stage")
+    parser.add_argument("--backend", default="requests", choices=CLIENT_BACKENDS)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Compare with a results JSON written by --output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"⏱️  Throughput: {args.users} users, {args.duration}s, {args.backend} backend...")
+        throughput = throughput_stage(args, workdir)
+        print(f"⏱️  Latency overhead: {args.latency_users} users against {args.latency_ms:g}ms stub latency...")
+        latency = latency_stage(args, workdir)
+        print("⏱️  Report generation...")
+        report = report_stage(throughput.pop("reports_dir"))
+
+    results = {
+        "backend": args.backend,
+        "users": args.users,
+        "payload_bytes": args.payload_bytes,
+        **throughput,
+        **latency,
+        **report,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
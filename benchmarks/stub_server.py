@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+from http import HTTPStatus
+
+import yaml
+
+DEFAULT_BODY = json.dumps([{"id": i, "name": f"item {i}"} for i in range(10)]).encode()
+
+# Latency distributions selectable via `stub.latency.distribution`
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal", "exponential")
+
+# `{name}` placeholders in scenario endpoints match one path segment
+PLACEHOLDER = re.compile(r"\{[A-Za-z_][\w.]*\}")
+
+
+def build_response(body, status=200, reason=None):
+    """
+    Build a complete HTTP/1.1 keep-alive response for the given body.
+    """
+    reason = reason or HTTPStatus(status).phrase
+    head = (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: keep-alive\r\n\r\n"
+    ).encode()
+    return head + body
+
+
+def padded_body(size):
+    """
+    Build a JSON list of items of roughly `size` bytes.
+    """
+    item = json.dumps({"id": 0, "name": "item 0", "data": "x" * 64}, separators=(",", ":"))
+    count = max(size // (len(item) + 1), 1)
+    return json.dumps([
+        {"id": i, "name": f"item {i}", "data": "x" * 64} for i in range(count)
+    ], separators=(",", ":")).encode()
+
+
+def compile_latency(latency, rng):
+    """
+    Compile a latency spec into a callable returning seconds, or None.
+
+    A bare number is a constant latency in milliseconds.
+
+    Raises:
+        ValueError: If the distribution is unknown
+    """
+    if not latency:
+        return None
+    if isinstance(latency, (int, float)):
+        latency = {"distribution": "constant", "ms": latency}
+    distribution = latency.get("distribution", "constant")
+    if distribution not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution '{distribution}', expected one of {LATENCY_DISTRIBUTIONS}")
+
+    if distribution == "constant":
+        seconds = latency["ms"] / 1000
+        return lambda: seconds
+    if distribution == "uniform":
+        low, high = latency["min_ms"] / 1000, latency["max_ms"] / 1000
+        return lambda: rng.uniform(low, high)
+    if distribution == "normal":
+        mean, stddev = latency["mean_ms"] / 1000, latency["stddev_ms"] / 1000
+        return lambda: max(rng.gauss(mean, stddev), 0.0)
+    if distribution == "lognormal":
+        # median = exp(mu), so mu = ln(median)
+        mu, sigma = math.log(latency["median_ms"] / 1000), latency["sigma"]
+        return lambda: rng.lognormvariate(mu, sigma)
+    rate = 1000 / latency["mean_ms"]
+    return lambda: rng.expovariate(rate)
+
+
+class StubRoute:
+    """
+    Canned behaviour of one endpoint: latency, response body and injected errors.
+    """
+    __slots__ = ("name", "_ok", "_error", "_error_rate", "_latency", "_random")
+
+    def __init__(self, name, settings, rng):
+        self.name = name
+        if "body" in settings:
+            body = json.dumps(settings["body"], separators=(",", ":")).encode()
+        elif "payload_bytes" in settings:
+            body = padded_body(settings["payload_bytes"])
+        else:
+            body = DEFAULT_BODY
+        self._ok = build_response(body, settings.get("status", 200))
+        error_status = settings.get("error_status", 500)
+        self._error = build_response(json.dumps({"error": HTTPStatus(error_status).phrase}).encode(), error_status)
+        # Percent, like error_rate in thresholds/sla.yaml
+        self._error_rate = settings.get("error_rate", 0) / 100
+        self._latency = compile_latency(settings.get("latency"), rng)
+        self._random = rng.random
+
+    def respond(self):
+        """
+        Return (delay in seconds or None, response bytes) for one request.
+        """
+        delay = self._latency() if self._latency is not None else None
+        if self._error_rate and self._random() < self._error_rate:
+            return delay, self._error
+        return delay, self._ok
+
+
+class StubRoutes:
+    """
+    Maps (method, path) to a StubRoute. Literal endpoints are a dict lookup;
+    templated ones (`/users/{id}`) fall back to a regex scan.
+    """
+
+    def __init__(self, default=None):
+        self.exact = {}
+        self.patterns = []
+        self.default = default
+        self.not_found = build_response(b'{"error":"Not Found"}', 404)
+
+    def add(self, method, endpoint, route):
+        path = endpoint.split("?", 1)[0]
+        key = method.upper().encode()
+        if PLACEHOLDER.search(path):
+            pattern = "".join(
+                "[^/]+" if PLACEHOLDER.fullmatch(part) else re.escape(part)
+                for part in re.split(f"({PLACEHOLDER.pattern})", path)
+            )
+            self.patterns.append((key, re.compile(pattern.encode() + b"$"), route))
+        else:
+            self.exact.setdefault((key, path.encode()), route)
+
+    def find(self, method, path):
+        route = self.exact.get((method, path))
+        if route is not None:
+            return route
+        for key, pattern, route in self.patterns:
+            if key == method and pattern.match(path):
+                return route
+        return self.default
+
+    def __len__(self):
+        return len(self.exact) + len(self.patterns)
+
+
+def scenario_routes(scenario, seed=None):
+    """
+    Build routes for every request and flow step of a scenario.
+
+    The top-level `stub` section sets defaults; a request's own `stub`
+    section overrides them for that endpoint.
+    """
+    rng = random.Random(seed)
+    defaults = scenario.get("stub") or {}
+    routes = StubRoutes()
+    requests = list(scenario.get("requests") or [])
+    for flow in scenario.get("flows") or []:
+        requests.extend(flow.get("steps") or [])
+    for req in requests:
+        settings = {**defaults, **(req.get("stub") or {})}
+        routes.add(req["method"], req["endpoint"], StubRoute(req["name"], settings, rng))
+    return routes
+
+
+async def handle_connection(reader, writer, routes):
+    """
+    Serve requests on one connection until the client closes it.
+    """
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            if length:
+                await reader.readexactly(length)
+
+            method, target = head.split(b" ", 2)[:2]
+            route = routes.find(method, target.split(b"?", 1)[0])
+            if route is None:
+                writer.write(routes.not_found)
+                continue
+            delay, response = route.respond()
+            if delay:
+                await asyncio.sleep(delay)
+            writer.write(response)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, routes):
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(r, w, routes), host, port, backlog=4096
+    )
+    print(f"Stub server listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    """
+    Run a keep-alive HTTP stub server.
+
+    Without --scenario every request is answered with a small JSON list.
+    With --scenario only the scenario's endpoints are served, each with the
+    latency, payload size and error rate from its `stub` settings.
+    """
+    parser = argparse.ArgumentParser(description="Local stub API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--scenario", help="Scenario YAML whose endpoints to serve")
+    parser.add_argument("--seed", type=int, help="Seed for latency and error sampling")
+    args = parser.parse_args()
+
+    if args.scenario:
+        with open(args.scenario) as f:
+            routes = scenario_routes(yaml.safe_load(f) or {}, args.seed)
+        print(f"Serving {len(routes)} endpoint(s) from {args.scenario}")
+    else:
+        routes = StubRoutes(default=StubRoute("default", {}, random.Random(args.seed)))
+
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+    try:
+        asyncio.run(serve(args.host, args.port, routes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,602 @@
+import difflib
+import hashlib
+import marshal
+import os
+import re
+import sys
+
+import yaml
+
+from metrics import sla_rules
+from metrics.sla_rules import LATENCY_SOURCES, compile_pattern, percentile_of
+
+# LibYAML's C parser when PyYAML was built with it, the pure-Python one otherwise
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CONFIG_FILE = "config/env.yaml"
+DEFAULT_SCENARIO_FILE = "scenarios/users_api.yaml"
+DEFAULT_THRESHOLDS_FILE = "thresholds/sla.yaml"
+
+# Validated files are stored here in marshal format, so every worker process
+# after the first skips YAML parsing and schema validation
+CACHE_DIR = os.path.join(ROOT_DIR, ".cache", "config")
+
+NUMBER = (int, float)
+
+# Client backends selectable via `client.backend` (see locustfiles/base_api_user.py)
+CLIENT_BACKENDS = ("requests", "fasthttp", "httpx")
+
+
+class Field:
+    """
+    Expected shape of one value in a config file.
+
+    Args:
+        types: Accepted type or tuple of types; bool is only accepted when listed
+        required: The key must be present in its mapping
+        choices: Allowed values
+        minimum: Smallest allowed number
+        keys: For mappings, schema of the allowed keys ({key: Field});
+            other keys are reported as unknown
+        values: For mappings with free-form keys, the Field of every value
+        items: For lists, the Field of every item
+        check: Callable(value, path, errors) for rules spanning several keys
+    """
+    __slots__ = ("types", "required", "choices", "minimum", "keys", "values", "items", "check")
+
+    def __init__(self, types, required=False, choices=None, minimum=None, keys=None, values=None, items=None,
+                 check=None):
+        self.types = types if isinstance(types, tuple) else (types,)
+        self.required = required
+        self.choices = choices
+        self.minimum = minimum
+        self.keys = keys
+        self.values = values
+        self.items = items
+        self.check = check
+
+
+ANY = Field(object)
+
+
+def _type_names(types):
+    names = {dict: "mapping", list: "list", str: "string", int: "integer", float: "number", bool: "boolean"}
+    if int in types and float in types:
+        types = tuple(t for t in types if t is not int)
+    return " or ".join(names.get(t, t.__name__) for t in types)
+
+
+def _yaml_value(value):
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def validate(value, field, path, errors):
+    """
+    Check a parsed value against its Field, appending one message per problem.
+
+    Args:
+        value: Parsed YAML value
+        field: Expected Field
+        path: Dotted location of the value, used in messages
+        errors: List the messages are appended to
+    """
+    where = path or "top level"
+    if value is None and not field.required:
+        return
+    if (isinstance(value, bool) and bool not in field.types) or not isinstance(value, field.types):
+        errors.append(f"{where}: expected {_type_names(field.types)}, got {type(value).__name__} {value!r}")
+        return
+    if field.choices is not None and value not in field.choices:
+        errors.append(f"{where}: must be one of {', '.join(map(_yaml_value, field.choices))}, got {value!r}")
+    if field.minimum is not None and isinstance(value, NUMBER) and value < field.minimum:
+        errors.append(f"{where}: must be >= {field.minimum}, got {value!r}")
+
+    prefix = f"{path}." if path else ""
+    if isinstance(value, dict):
+        if field.keys is not None:
+            for key, sub in field.keys.items():
+                if key in value:
+                    validate(value[key], sub, f"{prefix}{key}", errors)
+                elif sub.required:
+                    errors.append(f"{prefix}{key}: missing required key")
+            for key in value:
+                if key not in field.keys:
+                    close = difflib.get_close_matches(str(key), list(field.keys), n=1)
+                    hint = f" (did you mean '{close[0]}'?)" if close else ""
+                    errors.append(f"{prefix}{key}: unknown key{hint}")
+        if field.values is not None:
+            for key, item in value.items():
+                validate(item, field.values, f"{prefix}{key}", errors)
+    elif isinstance(value, list) and field.items is not None:
+        for i, item in enumerate(value):
+            validate(item, field.items, f"{path}[{i}]", errors)
+
+    if field.check is not None:
+        field.check(value, where, errors)
+
+
+def _check_auth(auth, path, errors):
+    if auth.get("type") == "none":
+        return
+    if "token_url" not in auth:
+        errors.append(f"{path}.token_url: required unless auth.type is none")
+    if "credentials" not in auth:
+        for key in ("username", "password"):
+            if key not in auth:
+                errors.append(f"{path}.{key}: required unless auth.credentials or auth.type: none is set")
+    elif not auth["credentials"]:
+        errors.append(f"{path}.credentials: must contain at least one entry")
+
+
+def _check_workers(workers, path, errors):
+    if workers != "auto" and not isinstance(workers, int):
+        errors.append(f"{path}: must be auto or a number of processes, got {workers!r}")
+
+
+# Keys each `load_shape.type` needs (see locustfiles/load_shapes.py)
+SHAPE_REQUIRED_KEYS = {
+    "stages": ("stages",),
+    "step": ("step_users", "step_duration", "steps"),
+    "spike": ("base_users", "spike_at", "spike_duration", "spike_users", "duration"),
+    "soak": ("users", "duration"),
+    "knee": (),
+}
+
+
+def _check_load_shape(shape, path, errors):
+    shape_type = shape.get("type")
+    for key in SHAPE_REQUIRED_KEYS.get(shape_type, ()) if isinstance(shape_type, str) else ():
+        if key not in shape:
+            errors.append(f"{path}.{key}: required for load_shape.type {shape['type']}")
+
+
+def _check_extractor(extractor, path, errors):
+    if len(extractor) != 1:
+        errors.append(f"{path}: needs exactly one of jsonpath, regex or header")
+
+
+def _check_range(bounds, path, errors):
+    if isinstance(bounds, dict) and isinstance(bounds.get("min"), NUMBER) and isinstance(bounds.get("max"), NUMBER) \
+            and bounds["min"] > bounds["max"]:
+        errors.append(f"{path}: min must not exceed max")
+
+
+def _check_scenario(scenario, path, errors):
+    if not (scenario.get("requests") or scenario.get("flows") or scenario.get("replay")):
+        errors.append("requests: the scenario must define at least one request, flow or replay")
+    feeders = scenario.get("feeders") or {}
+    requests = [("requests", req) for req in scenario.get("requests") or []]
+    for flow in scenario.get("flows") or []:
+        if isinstance(flow, dict):
+            requests += [(f"flow '{flow.get('name')}'", step) for step in flow.get("steps") or []]
+    for where, req in requests:
+        if isinstance(req, dict) and req.get("feeder") is not None and req["feeder"] not in feeders:
+            errors.append(f"{where}: request '{req.get('name')}' uses undefined feeder '{req['feeder']}'")
+
+
+CLIENT = Field(dict, keys={
+    "backend": Field(str, choices=CLIENT_BACKENDS),
+    "keep_alive": Field(bool),
+    "max_connections": Field(int, minimum=1),
+    "http2": Field(bool),
+    "tls_session_resumption": Field(bool),
+    "concurrency": Field(int, minimum=1),
+    "connection_timeout": Field(NUMBER, minimum=0),
+    "network_timeout": Field(NUMBER, minimum=0),
+    "max_retries": Field(int, minimum=0),
+    "insecure": Field(bool),
+})
+
+LOAD_SHAPE = Field(dict, check=_check_load_shape, keys={
+    "type": Field(str, required=True, choices=tuple(SHAPE_REQUIRED_KEYS)),
+    "stages": Field(list, items=Field(dict, keys={
+        "duration": Field(NUMBER, required=True, minimum=0),
+        "users": Field(int, required=True, minimum=0),
+        "spawn_rate": Field(NUMBER, minimum=0),
+    })),
+    "users": Field(int, minimum=0),
+    "spawn_rate": Field(NUMBER, minimum=0),
+    "duration": Field(NUMBER, minimum=0),
+    "ramp_up": Field(NUMBER, minimum=0),
+    "start_users": Field(int, minimum=0),
+    "step_users": Field(int, minimum=1),
+    "step_duration": Field(NUMBER, minimum=0),
+    "steps": Field(int, minimum=1),
+    "base_users": Field(int, minimum=0),
+    "spike_at": Field(NUMBER, minimum=0),
+    "spike_duration": Field(NUMBER, minimum=0),
+    "spike_users": Field(int, minimum=0),
+    "spike_spawn_rate": Field(NUMBER, minimum=0),
+    "settle": Field(NUMBER, minimum=0),
+    "max_users": Field(int, minimum=1),
+    "min_requests": Field(int, minimum=0),
+})
+
+# Responses of benchmarks/stub_server.py
+STUB = Field(dict, keys={
+    "latency": Field(NUMBER + (dict,), keys={
+        "distribution": Field(str, choices=("constant", "uniform", "normal", "lognormal", "exponential")),
+        "ms": Field(NUMBER, minimum=0),
+        "min_ms": Field(NUMBER, minimum=0),
+        "max_ms": Field(NUMBER, minimum=0),
+        "mean_ms": Field(NUMBER, minimum=0),
+        "stddev_ms": Field(NUMBER, minimum=0),
+        "median_ms": Field(NUMBER, minimum=0),
+        "sigma": Field(NUMBER, minimum=0),
+    }),
+    "payload_bytes": Field(int, minimum=0),
+    "body": ANY,
+    "status": Field(int),
+    "error_rate": Field(NUMBER, minimum=0),
+    "error_status": Field(int),
+})
+
+THINK_TIME = Field(NUMBER + (dict,), minimum=0, check=_check_range, keys={
+    "min": Field(NUMBER, required=True, minimum=0),
+    "max": Field(NUMBER, required=True, minimum=0),
+})
+
+CHECKS = Field(dict, keys={
+    "status": Field((int, list), items=Field(int, minimum=100)),
+    "max_body_bytes": Field(int, minimum=0),
+    "headers": Field(list, items=Field(str)),
+    "json": Field(list, items=Field(dict, keys={
+        "path": Field(str, required=True),
+        "equals": ANY,
+    })),
+    "body_sha256": Field(str),
+})
+
+REQUEST_KEYS = {
+    "name": Field(str, required=True),
+    "method": Field(str, required=True),
+    "endpoint": Field(str, required=True),
+    "weight": Field(NUMBER, minimum=0),
+    "headers": Field(dict, values=Field((str, int, float, bool))),
+    "payload": ANY,
+    "feeder": Field(str),
+    "checks": CHECKS,
+    "stub": STUB,
+}
+
+FLOW_STEP = Field(dict, keys={
+    **REQUEST_KEYS,
+    "extract": Field(dict, values=Field(dict, check=_check_extractor, keys={
+        "jsonpath": Field(str),
+        "regex": Field(str),
+        "header": Field(str),
+    })),
+    "think_time": THINK_TIME,
+})
+
+ENV_SCHEMA = Field(dict, keys={
+    "host": Field(str),
+    "auth": Field(dict, check=_check_auth, keys={
+        "type": Field(str, choices=("none", "jwt")),
+        "token_url": Field(str),
+        "username": Field(str),
+        "password": Field(str),
+        "credentials": Field(list, items=Field(dict, keys={
+            "username": Field(str, required=True),
+            "password": Field(str, required=True),
+        })),
+        "refresh_margin": Field(NUMBER, minimum=0),
+    }),
+    "client": CLIENT,
+    "run": Field(dict, keys={
+        "users": Field(int, minimum=0),
+        "spawn_rate": Field(NUMBER, minimum=0),
+        "run_time": Field((str, int)),
+        "workers": Field((str, int), minimum=0, check=_check_workers),
+        "remote_workers": Field(int, minimum=0),
+        "master_bind_host": Field(str),
+        "master_bind_port": Field(int, minimum=1),
+        "worker_connect_timeout": Field(NUMBER, minimum=0),
+        "engine": Field(str, choices=("locust", "asyncio")),
+    }),
+    "async_engine": Field(dict, keys={
+        "connection_limit": Field(int, minimum=0),
+        "request_timeout": Field(NUMBER, minimum=0),
+        "uvloop": Field(bool),
+    }),
+    "sla_monitor": Field(dict, keys={
+        "enabled": Field(bool),
+        "window": Field(NUMBER, minimum=1),
+        "breach_duration": Field(NUMBER, minimum=0),
+        "check_interval": Field(NUMBER, minimum=0),
+        "min_requests": Field(int, minimum=0),
+    }),
+    "generator_monitor": Field(dict, keys={
+        "enabled": Field(bool),
+        "interval": Field(NUMBER, minimum=0),
+        "cpu_percent": Field(NUMBER, minimum=0),
+        "loop_lag_ms": Field(NUMBER, minimum=0),
+        "saturated_share": Field(NUMBER, minimum=0),
+        "fail_on_saturation": Field(bool),
+    }),
+    "sample_log": Field(dict, keys={
+        "enabled": Field(bool),
+        "flush_bytes": Field(int, minimum=1),
+    }),
+    "metrics_exporter": Field(dict, keys={
+        "enabled": Field(bool),
+        "host": Field(str),
+        "port": Field(int, minimum=1),
+        "buckets_ms": Field(list, items=Field(NUMBER, minimum=0)),
+        "rps_window": Field(NUMBER, minimum=1),
+        "file_sink": Field(bool),
+        "sink_interval": Field(NUMBER, minimum=1),
+    }),
+    "report": Field(dict, keys={
+        "compress_data": Field((bool, str), choices=(True, False, "auto")),
+        "chart_assets": Field(str, choices=("inline", "shared")),
+    }),
+    "load_shape": LOAD_SHAPE,
+})
+
+SCENARIO_SCHEMA = Field(dict, check=_check_scenario, keys={
+    "name": Field(str),
+    "wait_time": Field(dict, check=_check_range, keys={
+        "min": Field(NUMBER, required=True, minimum=0),
+        "max": Field(NUMBER, required=True, minimum=0),
+    }),
+    "client": CLIENT,
+    "load_shape": LOAD_SHAPE,
+    "arrival": Field(dict, keys={
+        "process": Field(str, choices=("constant", "poisson")),
+        "rate": Field(NUMBER, minimum=0),
+    }),
+    "replay": Field(dict, keys={
+        "file": Field(str, required=True),
+        "format": Field(str, choices=("auto", "jsonl", "har", "access_log")),
+        "speed": Field(NUMBER, minimum=0),
+        "shard": Field(bool),
+        "loop": Field(bool),
+        "headers": Field(list, items=Field(str)),
+        "group_ids": Field(bool),
+    }),
+    "stub": STUB,
+    "feeders": Field(dict, values=Field(dict, keys={
+        "file": Field(str, required=True),
+        "mode": Field(str, choices=("sequential", "random", "unique")),
+        "bind": Field(str, choices=("request", "user")),
+        "format": Field(str, choices=("csv", "jsonl")),
+    })),
+    "requests": Field(list, items=Field(dict, keys={**REQUEST_KEYS, "rate": Field(NUMBER, minimum=0)})),
+    "flows": Field(list, items=Field(dict, keys={
+        "name": Field(str, required=True),
+        "weight": Field(NUMBER, minimum=0),
+        "think_time": THINK_TIME,
+        "steps": Field(list, required=True, items=FLOW_STEP),
+    })),
+})
+
+
+def _check_apdex(apdex, path, errors):
+    if isinstance(apdex.get("min"), NUMBER) and apdex["min"] > 1:
+        errors.append(f"{path}.min: apdex scores range from 0 to 1, got {apdex['min']!r}")
+
+
+# Rule keys besides `pNN_ms` percentiles (see metrics/sla_rules.py); `latency`
+# is a setting of the rule rather than a check
+SLA_RULE_KEYS = {
+    "max_ms": Field(NUMBER, minimum=0),
+    "error_rate": Field(NUMBER, minimum=0),
+    "min_rps": Field(NUMBER, minimum=0),
+    "apdex": Field(dict, check=_check_apdex, keys={
+        "t_ms": Field(NUMBER, required=True, minimum=0),
+        "min": Field(NUMBER, required=True, minimum=0),
+    }),
+    "latency": Field(str, choices=LATENCY_SOURCES),
+}
+PERCENTILE_THRESHOLD = Field(NUMBER, minimum=0)
+
+
+def _check_sla_rule(rule, path, errors):
+    for key, value in rule.items():
+        percentile = percentile_of(key)
+        if key in SLA_RULE_KEYS:
+            validate(value, SLA_RULE_KEYS[key], f"{path}.{key}", errors)
+        elif percentile is not None:
+            if not 0 < percentile <= 100:
+                errors.append(f"{path}.{key}: percentile must be above 0 and at most 100")
+            validate(value, PERCENTILE_THRESHOLD, f"{path}.{key}", errors)
+        else:
+            close = difflib.get_close_matches(str(key), ["p50_ms", "p95_ms", "p99_ms", *SLA_RULE_KEYS], n=1)
+            hint = f" (did you mean '{close[0]}'?)" if close else ""
+            errors.append(f"{path}.{key}: unknown key{hint}")
+
+
+SLA_RULE = Field(dict, check=_check_sla_rule)
+
+
+def _check_endpoint_patterns(endpoints, path, errors):
+    for pattern in endpoints:
+        try:
+            compile_pattern(str(pattern))
+        except re.error as e:
+            errors.append(f"{path}.{pattern}: invalid regular expression ({e})")
+
+
+THRESHOLDS_SECTIONS = {
+    "defaults": SLA_RULE,
+    "aggregate": SLA_RULE,
+    "endpoints": Field(dict, values=SLA_RULE, check=_check_endpoint_patterns),
+}
+
+
+def _check_thresholds(thresholds, path, errors):
+    # Keys other than the sections are endpoint names: the original flat layout
+    for key, value in thresholds.items():
+        validate(value, THRESHOLDS_SECTIONS.get(key, SLA_RULE), str(key), errors)
+
+
+# `defaults` and `aggregate` rules plus endpoint rules by name, glob or `re:` pattern
+THRESHOLDS_SCHEMA = Field(dict, check=_check_thresholds)
+
+SCHEMAS = {
+    "config": ENV_SCHEMA,
+    "scenario": SCENARIO_SCHEMA,
+    "thresholds": THRESHOLDS_SCHEMA,
+}
+
+# Parsed files of this process: (kind, absolute path) -> ((mtime, size), value)
+_loaded = {}
+_schema_digest = None
+
+
+def _cache_key(kind, content):
+    """
+    Hash a file's content together with the source of the schema modules,
+    so any change to the schema or the Python version invalidates cached
+    entries.
+    """
+    global _schema_digest
+    if _schema_digest is None:
+        digest = hashlib.sha256(sys.version.encode())
+        for module in (__file__, sla_rules.__file__):
+            with open(module, "rb") as f:
+                digest.update(f.read())
+        _schema_digest = digest.digest()
+    return hashlib.sha256(_schema_digest + kind.encode() + b"\0" + content).hexdigest()
+
+
+def _cache_path(path):
+    # One entry per source file; it is replaced when the file changes
+    return os.path.join(CACHE_DIR, hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:24] + ".marshal")
+
+
+def _read_cache(path, key):
+    try:
+        with open(_cache_path(path), "rb") as f:
+            cached_key, value = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return value if cached_key == key else None
+
+
+def _write_cache(path, key, value):
+    cache_path = _cache_path(path)
+    try:
+        blob = marshal.dumps((key, value))
+    except ValueError:
+        # Values marshal cannot store (e.g. YAML dates) are simply not cached
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temporary = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(blob)
+        os.replace(temporary, cache_path)
+    except OSError:
+        pass
+
+
+def _parse(kind, path, content):
+    try:
+        value = yaml.load(content, Loader=SafeLoader)
+    except yaml.YAMLError as e:
+        mark = getattr(e, "problem_mark", None)
+        where = f" at line {mark.line + 1}, column {mark.column + 1}" if mark else ""
+        raise ValueError(f"Invalid {path}: {getattr(e, 'problem', None) or e}{where}") from None
+    if value is None:
+        value = {}
+    errors = []
+    validate(value, SCHEMAS[kind], "", errors)
+    if errors:
+        raise ValueError(f"Invalid {path}:\n" + "\n".join(f"  - {error}" for error in errors))
+    return value
+
+
+def load_file(kind, path):
+    """
+    Load a validated config file, parsing it at most once per version.
+
+    Within a process the result is reused until the file's mtime or size
+    changes. Across processes it is reused from CACHE_DIR, keyed by a hash
+    of the file content, so workers started after the master skip parsing.
+    The returned value is shared and must not be modified.
+
+    Args:
+        kind: 'config', 'scenario' or 'thresholds'
+        path: File to load
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+        ValueError: If the file is not valid YAML or does not match its schema
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    entry = (kind, os.path.abspath(path))
+    loaded = _loaded.get(entry)
+    if loaded is not None and loaded[0] == version:
+        return loaded[1]
+
+    with open(path, "rb") as f:
+        content = f.read()
+    key = _cache_key(kind, content)
+    value = _read_cache(path, key)
+    if value is None:
+        value = _parse(kind, path, content)
+        _write_cache(path, key, value)
+    _loaded[entry] = (version, value)
+    return value
+
+
+def config_path():
+    return os.environ.get("API_PERF_CONFIG", DEFAULT_CONFIG_FILE)
+
+
+def scenario_path():
+    return os.environ.get("API_PERF_SCENARIO", DEFAULT_SCENARIO_FILE)
+
+
+def load_config(path=None):
+    """
+    Load the environment config ($API_PERF_CONFIG or config/env.yaml).
+    """
+    return load_file("config", path or config_path())
+
+
+def load_scenario(path=None):
+    """
+    Load a scenario file ($API_PERF_SCENARIO or scenarios/users_api.yaml).
+    """
+    return load_file("scenario", path or scenario_path())
+
+
+def load_thresholds(path=None):
+    """
+    Load the SLA thresholds (thresholds/sla.yaml).
+    """
+    return load_file("thresholds", path or DEFAULT_THRESHOLDS_FILE)
+
+
+def validate_files(config=None, scenario=None, thresholds=None):
+    """
+    Validate the environment config, scenario and SLA thresholds up front.
+
+    A missing environment config is allowed (the runner has defaults and
+    --host); the scenario and thresholds files must exist.
+
+    Returns:
+        List of error messages, empty when every file is valid
+    """
+    errors = []
+    files = (
+        ("config", config or config_path(), False),
+        ("scenario", scenario or scenario_path(), True),
+        ("thresholds", thresholds or DEFAULT_THRESHOLDS_FILE, True),
+    )
+    for kind, path, required in files:
+        if not os.path.exists(path):
+            if required:
+                errors.append(f"Missing {path}")
+            continue
+        try:
+            load_file(kind, path)
+        except ValueError as e:
+            errors.append(str(e))
+    return errors
@@ -0,0 +1,335 @@
+import heapq
+import json
+import os
+import random
+import time
+from functools import lru_cache
+
+import gevent
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+from base_api_user import generator_partition
+from metrics.artifacts import ARRIVAL_FILE
+from metrics.hdr_histogram import HdrHistogram
+from scenario_plan import ScenarioPlan
+
+# Arrival processes selectable via `arrival.process`
+ARRIVAL_PROCESSES = ("constant", "poisson")
+
+# Stream name for requests without their own rate, sharing `arrival.rate` by weight
+SHARED_STREAM = "Weighted mix"
+
+# Request context key carrying how late a request was sent, in milliseconds
+SEND_LAG_KEY = "send_lag_ms"
+
+# Key under which workers ship dispatch counts in their stats reports
+REPORT_KEY = "arrival_rate"
+
+
+def arrival_settings(scenario):
+    """
+    Parse the open-loop settings of a scenario.
+
+    A scenario is open-loop when it has an `arrival` section or any request
+    defines its own `rate`. Requests with a `rate` get their own clock; the
+    remaining requests share `arrival.rate` according to their weights.
+
+    Returns:
+        Dict with 'process' and 'targets' ({stream name: requests/s}), or
+        None for a closed-loop scenario
+
+    Raises:
+        ValueError: If rates are missing, invalid or ambiguous
+    """
+    arrival = scenario.get("arrival")
+    requests = scenario.get("requests") or []
+    rated = [req for req in requests if "rate" in req]
+    if arrival is None and not rated:
+        return None
+    arrival = arrival or {}
+    if scenario.get("flows"):
+        raise ValueError("Open-loop arrival rates apply to single requests; remove `flows` or the rates")
+
+    process = arrival.get("process", "constant")
+    if process not in ARRIVAL_PROCESSES:
+        raise ValueError(f"Unknown arrival process '{process}', expected one of {ARRIVAL_PROCESSES}")
+
+    targets = {}
+    for req in rated:
+        if req["name"] in targets:
+            raise ValueError(f"Duplicate request name with a rate: {req['name']}")
+        targets[req["name"]] = req["rate"]
+
+    unrated = len(requests) - len(rated)
+    if "rate" in arrival:
+        if not unrated:
+            raise ValueError("arrival.rate is set but every request defines its own rate")
+        targets[SHARED_STREAM] = arrival["rate"]
+    elif unrated:
+        raise ValueError("Open-loop scenarios need arrival.rate or a rate on every request")
+
+    for name, rate in targets.items():
+        if not isinstance(rate, (int, float)) or rate <= 0:
+            raise ValueError(f"Invalid arrival rate for '{name}': {rate}")
+
+    return {"process": process, "targets": targets}
+
+
+class ArrivalStream:
+    """
+    One arrival clock: the intended send times of a single request, or of a
+    weighted mix of requests, at a fixed average rate.
+    """
+    __slots__ = ("name", "rate", "next_time", "_request", "_plan", "_poisson", "_interval")
+
+    def __init__(self, name, rate, process, rng, request=None, plan=None):
+        self.name = name
+        self.rate = rate
+        self.next_time = None
+        self._request = request
+        self._plan = plan
+        self._poisson = process == "poisson"
+        if self._poisson:
+            self._interval = lambda: rng.expovariate(rate)
+        else:
+            self._interval = lambda: 1.0 / rate
+
+    def start(self, now):
+        self.next_time = now + self._interval() if self._poisson else now
+
+    def advance(self):
+        self.next_time += self._interval()
+
+    def request(self):
+        return self._request if self._request is not None else self._plan.choose()
+
+
+class ArrivalSchedule:
+    """
+    Open-loop request schedule shared by all users of one process.
+
+    Each stream advances on its own constant or Poisson clock regardless of
+    how long responses take. Users act as a bounded pool of senders: a free
+    user claims the earliest unclaimed send time, sleeps until it and sends.
+    When every user is busy, the backlog is sent as soon as users free up
+    and the delay is reported as send lag rather than silently lowering the
+    offered load.
+    """
+
+    def __init__(self, streams):
+        self.streams = streams
+        self._heap = None
+
+    def _start(self):
+        now = time.time()
+        for stream in self.streams:
+            stream.start(now)
+        self._heap = [(stream.next_time, i) for i, stream in enumerate(self.streams)]
+        heapq.heapify(self._heap)
+
+    def reset(self):
+        self._heap = None
+
+    def next_request(self):
+        """
+        Claim the next send slot, wait for its intended time and return it.
+
+        Returns:
+            Tuple of (RequestSpec, send lag in milliseconds)
+        """
+        if self._heap is None:
+            self._start()
+
+        # Claiming never yields to other greenlets, so no lock is needed
+        intended, index = self._heap[0]
+        stream = self.streams[index]
+        stream.advance()
+        heapq.heapreplace(self._heap, (stream.next_time, index))
+
+        delay = intended - time.time()
+        if delay > 0:
+            gevent.sleep(delay)
+        lag_ms = max(time.time() - intended, 0.0) * 1000
+        tracker.record_dispatch(stream.name, lag_ms)
+        return stream.request(), lag_ms
+
+
+def compile_schedule(settings, plan, processes=1):
+    """
+    Build the arrival streams for a compiled plan. Rates are divided evenly
+    between the `processes` load generators running the same scenario.
+    """
+    rng = random.Random()
+    targets = settings["targets"]
+    streams = []
+    unrated = []
+    for spec in plan.requests:
+        if spec.name in targets:
+            streams.append(ArrivalStream(spec.name, targets[spec.name] / processes, settings["process"],
+                                         rng, request=spec))
+        else:
+            unrated.append(spec)
+    if unrated:
+        streams.append(ArrivalStream(SHARED_STREAM, targets[SHARED_STREAM] / processes, settings["process"],
+                                     rng, plan=ScenarioPlan(plan.name, unrated)))
+    return ArrivalSchedule(streams)
+
+
+@lru_cache(maxsize=None)
+def load_schedule(plan, processes):
+    """
+    Build the arrival schedule once per process and share it with every user.
+    """
+    schedule = compile_schedule(tracker.settings, plan, processes)
+    _schedules.append(schedule)
+    return schedule
+
+
+def process_count(environment):
+    """
+    Number of load generator processes sharing the target rate.
+    """
+    return generator_partition(environment)[1]
+
+
+class ArrivalTracker:
+    """
+    Counts dispatched requests and their send lag per arrival stream.
+
+    Workers ship interval counts with each stats report; the master (or a
+    standalone process) compares the totals with the configured target
+    rates and writes arrival_rate.json on quit.
+    """
+
+    def __init__(self):
+        self.settings = None
+        self.buffered = False
+        self.started_at = None
+        self.stopped_at = None
+        self.reset()
+
+    def configure(self, scenario):
+        self.settings = arrival_settings(scenario)
+        return self.settings
+
+    def reset(self):
+        self.totals = {}
+        self.interval = {} if self.buffered else self.totals
+
+    def _entry(self, counts, stream):
+        entry = counts.get(stream)
+        if entry is None:
+            entry = counts[stream] = [0, HdrHistogram()]
+        return entry
+
+    def record_dispatch(self, stream, lag_ms):
+        entry = self._entry(self.interval, stream)
+        entry[0] += 1
+        entry[1].record_ms(lag_ms)
+
+    def drain_interval(self):
+        encoded = {stream: [count, lag.encode()] for stream, (count, lag) in self.interval.items()}
+        self.interval = {}
+        return encoded
+
+    def merge_encoded(self, encoded):
+        for stream, (count, blob) in encoded.items():
+            entry = self._entry(self.totals, stream)
+            entry[0] += count
+            entry[1].merge(HdrHistogram.decode(blob))
+
+    def summary(self):
+        """
+        Compare dispatched requests with the target rates.
+
+        Returns:
+            Dict with run duration, per-stream and total target vs achieved
+            rate, shortfall and send lag percentiles
+        """
+        duration = (self.stopped_at or time.time()) - (self.started_at or time.time())
+
+        def describe(target_rps, dispatched, lag):
+            expected = target_rps * duration
+            lag_ms = lag.percentiles_ms((50, 99))
+            return {
+                "target_rps": target_rps,
+                "achieved_rps": dispatched / duration if duration > 0 else 0.0,
+                "dispatched": dispatched,
+                "expected": round(expected),
+                "shortfall_pct": max(1 - dispatched / expected, 0.0) * 100 if expected else 0.0,
+                "send_lag_p50_ms": lag_ms[50],
+                "send_lag_p99_ms": lag_ms[99],
+                "send_lag_max_ms": lag.max_value / 1000,
+            }
+
+        streams = {}
+        total_lag = HdrHistogram()
+        for stream, target_rps in self.settings["targets"].items():
+            count, lag = self.totals.get(stream, (0, HdrHistogram()))
+            streams[stream] = describe(target_rps, count, lag)
+            total_lag.merge(lag)
+        total = describe(
+            sum(self.settings["targets"].values()),
+            sum(s["dispatched"] for s in streams.values()),
+            total_lag,
+        )
+        return {
+            "process": self.settings["process"],
+            "duration_s": duration,
+            "streams": streams,
+            "total": total,
+        }
+
+    def save(self, reports_dir):
+        path = os.path.join(reports_dir, ARRIVAL_FILE)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+
+tracker = ArrivalTracker()
+_schedules = []
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    if tracker.settings is None:
+        return
+    runner = environment.runner
+
+    def on_test_start(**kw):
+        tracker.reset()
+        for schedule in _schedules:
+            schedule.reset()
+        tracker.started_at = time.time()
+        tracker.stopped_at = None
+
+    environment.events.test_start.add_listener(on_test_start)
+
+    if isinstance(runner, WorkerRunner):
+        tracker.buffered = True
+        tracker.reset()
+
+        def on_report_to_master(client_id, data, **kw):
+            data[REPORT_KEY] = tracker.drain_interval()
+
+        environment.events.report_to_master.add_listener(on_report_to_master)
+        return
+
+    if isinstance(runner, MasterRunner):
+        def on_worker_report(client_id, data, **kw):
+            tracker.merge_encoded(data.get(REPORT_KEY) or {})
+
+        environment.events.worker_report.add_listener(on_worker_report)
+
+    def on_test_stop(**kw):
+        tracker.stopped_at = time.time()
+
+    def on_quitting(**kw):
+        reports_dir = os.environ.get("API_PERF_REPORTS_DIR")
+        if reports_dir and tracker.started_at:
+            tracker.save(reports_dir)
+
+    environment.events.test_stop.add_listener(on_test_stop)
+    environment.events.quitting.add_listener(on_quitting)
@@ -1,31 +1,181 @@
+import os
 from locust import HttpUser, between
-import yaml
-from auth.jwt import get_jwt_token
+from locust.contrib.fasthttp import FastHttpUser
+from locust.runners import WorkerRunner
+from auth.jwt import get_shared_token
+from config.loader import CLIENT_BACKENDS, load_config
+from connection_policy import CLOSE_HEADERS, DEFAULT_CONNECTION_POLICY, PolicyHttpAdapter
+from metrics.pacing import PACING_KEY, UserPacing
+import httpx_client
 
-class BaseApiUser(HttpUser):
-    abstract = True
-    wait_time = between(1, 2)
+# Connection policy settings that only some backends implement
+BACKEND_ONLY_POLICIES = {
+    "http2": ("httpx",),
+    "tls_session_resumption": ("requests", "httpx"),
+}
+
+# Connection tuning applied to FastHttpUser when the fasthttp backend is used
+FASTHTTP_DEFAULTS = {
+    "concurrency": 10,
+    "connection_timeout": 60.0,
+    "network_timeout": 60.0,
+    "max_retries": 0,
+    "insecure": True,
+}
+
+def client_settings(config, scenario=None):
+    """
+    Resolve client backend settings.
+
+    Precedence (highest first): $API_PERF_CLIENT for the backend name, the
+    scenario's `client` section, then the `client` section of env.yaml.
+
+    Raises:
+        ValueError: For an unknown backend, or a connection policy the
+            backend does not implement
+    """
+    settings = {"backend": "requests", **DEFAULT_CONNECTION_POLICY}
+    settings.update((config or {}).get("client") or {})
+    settings.update((scenario or {}).get("client") or {})
+    if os.environ.get("API_PERF_CLIENT"):
+        settings["backend"] = os.environ["API_PERF_CLIENT"]
+
+    if settings["backend"] not in CLIENT_BACKENDS:
+        raise ValueError(
+            f"Unknown client backend '{settings['backend']}', expected one of {CLIENT_BACKENDS}"
+        )
+    for key, backends in BACKEND_ONLY_POLICIES.items():
+        if settings[key] and settings["backend"] not in backends:
+            raise ValueError(f"client.{key} needs the {' or '.join(backends)} backend, not {settings['backend']}")
+    if settings["backend"] == "httpx" and httpx_client.httpx is None:
+        raise ValueError("The httpx backend needs httpx: pip install 'httpx[http2]'")
+    return settings
+
+def generator_partition(environment):
+    """
+    Return (index, count) of this load generator among all worker processes.
+
+    Standalone processes are (0, 1). Workers learn the count from the
+    master's --expect-workers, so it is only reliable once a test started.
+    """
+    runner = environment.runner
+    if isinstance(runner, WorkerRunner):
+        count = getattr(environment.parsed_options, "expect_workers", 1) or 1
+        return max(runner.worker_index, 0), max(count, 1)
+    return 0, 1
+
+class ApiUserMixin:
+    """
+    Backend-independent user setup shared by the requests, fasthttp and httpx users.
+    """
+
+    # Headers the connection policy adds to every request
+    connection_headers = {}
+
+    # Added to every request event; set per user in on_start()
+    request_context = {}
 
     def on_start(self):
         """
-        Initialize user: load config and obtain JWT token.
+        Initialize user: load config and attach the shared JWT token.
         """
         try:
-            # Load configuration
-            with open("config/env.yaml") as f:
-                self.config = yaml.safe_load(f)
-
-            self.host = self.config["host"]
-            
-            # Obtain JWT token (if auth is enabled)
-            token = get_jwt_token(self.config)
-
-            # Set authorization headers
-            headers = {"Content-Type": "application/json"}
-            if token:
-                headers["Authorization"] = f"Bearer {token}"
-            
-            self.client.headers.update(headers)
+            # Validated configuration, parsed once and shared by every user
+            self.config = load_config()
+
+            # A host given to Locust (runner/run.py --host) wins over env.yaml
+            self.host = self.environment.host or self.config["host"]
+
+            # Shared, auto-refreshed token (None if auth is disabled)
+            self.token = get_shared_token(self.config)
         except Exception as e:
             raise Exception(f"Failed to initialize user: {e}")
 
+        # Lets the latency recorder correct this user's samples for coordinated omission
+        self.request_context = {PACING_KEY: UserPacing()}
+
+    def context(self):
+        """
+        Context Locust adds to every request event of this user.
+        """
+        return self.request_context
+
+    def request_headers(self, headers):
+        """
+        Merge the current Authorization header into precomputed request headers.
+        """
+        if self.connection_headers:
+            headers = {**headers, **self.connection_headers}
+        if not self.token:
+            return headers
+        return {**headers, **self.token.headers}
+
+    def send(self, request, url, body, headers, context=None):
+        """
+        Send one resolved scenario request and apply its response checks.
+
+        Args:
+            request: RequestSpec the request was resolved from
+            url: Resolved URL
+            body: Resolved body
+            headers: Resolved headers, without authorization
+            context: Extra context for request event listeners
+
+        Returns:
+            Tuple of (response, CheckFailed or None)
+        """
+        kwargs = dict(method=request.method, url=url, data=body, headers=self.request_headers(headers),
+                      name=request.name, context=context or {})
+        if request.checks is None:
+            return self.client.request(**kwargs), None
+        with self.client.request(catch_response=True, **kwargs) as response:
+            failure = request.checks.apply(response)
+        return response, failure
+
+class BaseApiUser(ApiUserMixin, HttpUser):
+    abstract = True
+    wait_time = between(1, 2)
+    connection_policy = DEFAULT_CONNECTION_POLICY
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Applies the connection policy and times connect, TLS and TTFB
+        adapter = PolicyHttpAdapter(self.connection_policy)
+        self.client.mount("https://", adapter)
+        self.client.mount("http://", adapter)
+
+class FastBaseApiUser(ApiUserMixin, FastHttpUser):
+    abstract = True
+    wait_time = between(1, 2)
+
+class HttpxBaseApiUser(ApiUserMixin, httpx_client.HttpxUser):
+    abstract = True
+    wait_time = between(1, 2)
+
+def base_user_class(settings):
+    """
+    Return the abstract base user class for the resolved client settings.
+
+    The connection policy and, for the fasthttp backend, the connection
+    pool and timeout options are applied as class attributes.
+    """
+    policy = {key: settings[key] for key in DEFAULT_CONNECTION_POLICY}
+    tuning = {
+        "abstract": True,
+        "connection_headers": {} if policy["keep_alive"] else CLOSE_HEADERS,
+    }
+    if settings["backend"] == "requests":
+        tuning["connection_policy"] = policy
+        return type("TunedBaseApiUser", (BaseApiUser,), tuning)
+    if settings["backend"] == "httpx":
+        tuning["connection_policy"] = policy
+        tuning.update((key, settings[key]) for key in ("insecure", "connection_timeout", "network_timeout")
+                      if key in settings)
+        return type("TunedHttpxBaseApiUser", (HttpxBaseApiUser,), tuning)
+
+    tuning.update(
+        (key, settings.get(key, default)) for key, default in FASTHTTP_DEFAULTS.items()
+    )
+    # `concurrency` is fasthttp's name for the connections per user
+    tuning["concurrency"] = settings.get("concurrency", policy["max_connections"])
+    return type("TunedFastBaseApiUser", (FastBaseApiUser,), tuning)
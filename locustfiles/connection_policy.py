@@ -0,0 +1,217 @@
+import ssl
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+from gevent.local import local
+from locust.clients import LocustHttpAdapter
+from requests.certs import where as ca_bundle
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from metrics.artifacts import CONNECTION_PHASES
+
+# Connection settings of the `client` section, shared by all backends
+DEFAULT_CONNECTION_POLICY = {
+    "keep_alive": True,               # False: ask the server to close the connection after every response
+    "max_connections": 10,            # Connections per host and user
+    "http2": False,                   # Multiplex over HTTP/2 (httpx backend only)
+    "tls_session_resumption": False,  # Resume the user's previous TLS session on new connections
+}
+
+# Request header that turns keep-alive off
+CLOSE_HEADERS = {"Connection": "close"}
+
+# The user's current request; set around each request by the user's own
+# adapter or session, and read by the connection and TLS hooks it runs
+_current = local()
+
+
+class ConnectionTiming:
+    """
+    Where the time of one request went before its response body.
+
+    connect: TCP handshake of a new connection
+    tls: TLS handshake of a new connection
+    tls_resumed: Same as tls, only set when a previous session was resumed
+    ttfb: From the request being sent until the response headers arrived
+
+    Times are in milliseconds; a phase that did not happen (e.g. connect
+    on a reused connection) is None.
+    """
+    __slots__ = CONNECTION_PHASES
+
+    def __init__(self):
+        self.connect = None
+        self.tls = None
+        self.tls_resumed = None
+        self.ttfb = None
+
+
+@contextmanager
+def traced(timing, tls_sessions):
+    """
+    Route the connection hooks of the enclosed request to `timing`.
+
+    Args:
+        timing: ConnectionTiming of the request
+        tls_sessions: The user's {server hostname: TLS session}, or None
+            when TLS session resumption is off
+    """
+    _current.timing = timing
+    _current.tls_sessions = tls_sessions
+    _current.tls_socket = None
+    try:
+        yield timing
+    finally:
+        _current.timing = None
+        _current.tls_sessions = None
+        _current.tls_socket = None
+
+
+def _elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def response_headers_received(ttfb_ms):
+    """
+    Record the TTFB of the current request and keep the TLS session of a
+    connection it opened.
+
+    TLS 1.3 session tickets arrive after the handshake, so the session can
+    only be taken once the server has answered, and before a connection
+    without keep-alive is closed.
+    """
+    timing = getattr(_current, "timing", None)
+    if timing is None:
+        return
+    timing.ttfb = ttfb_ms
+    if _current.tls_socket is not None:
+        hostname, sock = _current.tls_socket
+        _current.tls_socket = None
+        session = sock.session
+        if session is not None:
+            _current.tls_sessions[hostname] = session
+
+
+class TimedSSLContext(ssl.SSLContext):
+    """
+    SSL context that times TLS handshakes and offers the user's previous
+    session to the server when resumption is on.
+
+    Sessions only resume on the context that created them, so each process
+    shares one context per verification mode; the sessions themselves are
+    kept per user.
+    """
+
+    def wrap_socket(self, sock, server_hostname=None, session=None, **kwargs):
+        timing = getattr(_current, "timing", None)
+        tls_sessions = getattr(_current, "tls_sessions", None)
+        if session is None and tls_sessions is not None:
+            session = tls_sessions.get(server_hostname)
+        started = time.perf_counter()
+        wrapped = super().wrap_socket(sock, server_hostname=server_hostname, session=session, **kwargs)
+        if timing is not None:
+            timing.tls = _elapsed_ms(started)
+            if wrapped.session_reused:
+                timing.tls_resumed = timing.tls
+        if tls_sessions is not None:
+            _current.tls_socket = (server_hostname, wrapped)
+        return wrapped
+
+
+@lru_cache(maxsize=None)
+def shared_ssl_context(verify=True):
+    """
+    Return the process-wide TimedSSLContext for verified or unverified connections.
+
+    Verified connections trust the same CA bundle as requests and httpx do.
+    """
+    context = TimedSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if verify:
+        context.load_verify_locations(ca_bundle())
+    else:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class TimedConnectionMixin:
+    """
+    Times the TCP handshake and the wait for response headers of a urllib3 connection.
+    """
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        timing = getattr(_current, "timing", None)
+        if timing is not None:
+            timing.connect = _elapsed_ms(started)
+        return sock
+
+    def getresponse(self, *args, **kwargs):
+        started = time.perf_counter()
+        response = super().getresponse(*args, **kwargs)
+        response_headers_received(_elapsed_ms(started))
+        return response
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PolicyHttpAdapter(LocustHttpAdapter):
+    """
+    Transport adapter of the requests backend that applies the connection
+    policy and attaches a ConnectionTiming to every response as
+    `response.connection_timing`.
+    """
+
+    def __init__(self, policy):
+        super().__init__(pool_manager=None, pool_maxsize=policy["max_connections"])
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+        self.tls_sessions = {} if policy["tls_session_resumption"] else None
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        if host_params["scheme"] == "https":
+            pool_kwargs["ssl_context"] = shared_ssl_context(verify is not False)
+        return host_params, pool_kwargs
+
+    def send(self, request, *args, **kwargs):
+        with traced(ConnectionTiming(), self.tls_sessions) as timing:
+            response = super().send(request, *args, **kwargs)
+        response.connection_timing = timing
+        return response
+
+
+class HTTPError(Exception):
+    """
+    A response status of 400 or above on a backend other than requests.
+    """
+
+
+def status_error(status, reason, name):
+    """
+    Return the exception a response status of 400 or above is reported with.
+
+    The wording matches Locust's requests backend, which names the request
+    instead of the URL, so failures group the same way on every backend.
+    """
+    kind = "Client" if status < 500 else "Server"
+    return HTTPError(f"{status} {kind} Error: {reason} for url: {name}")
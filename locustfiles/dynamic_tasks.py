@@ -1,23 +1,70 @@
-from locust import task
-from base_api_user import BaseApiUser
-import yaml
-import random
+from locust import between, constant, task
+from base_api_user import base_user_class, client_settings, load_config
+from config.loader import scenario_path
+from scenario_plan import FlowSpec, load_plan, load_scenario
+from flows import run_flow
+import arrival_rate
+import load_shapes
+import replay
+import generator_monitor  # noqa: F401  (registers load generator health sampling)
+import latency_recorder  # noqa: F401  (registers the HDR histogram event hooks)
+import metrics_exporter  # noqa: F401  (registers the opt-in OpenMetrics endpoint)
+import sample_recorder  # noqa: F401  (registers the opt-in per-request sample log)
+import sla_monitor  # noqa: F401  (registers the streaming SLA event hooks)
 
-class ApiUser(BaseApiUser):
+SCENARIO_FILE = scenario_path()
+
+# The client backend and connection policy are fixed when the locustfile is
+# imported, so every user in the process shares the same HttpUser,
+# FastHttpUser or HttpxUser base
+_scenario = load_scenario(SCENARIO_FILE)
+_settings = client_settings(load_config(), _scenario)
+
+# Open-loop arrival-rate settings, or None for the default closed loop
+_arrivals = arrival_rate.tracker.configure(_scenario)
+
+# Captured traffic replay settings; a replay scenario runs ReplayUser instead of ApiUser
+_replay = replay.tracker.configure(_scenario)
+if _replay:
+    ReplayUser = replay.replay_user_class(base_user_class(_settings))
+
+# Optional LoadTestShape from the `load_shape` section; Locust picks up the
+# module-level class, so it is only defined when a shape is configured
+_shape = load_shapes.shape_settings(load_config(), _scenario)
+if _shape:
+    LoadShape = load_shapes.shape_class(_shape)
+
+class ApiUser(base_user_class(_settings)):
+    abstract = bool(_replay)
+
+    if _arrivals:
+        # Pacing comes from the arrival schedule, not from think time
+        wait_time = constant(0)
+    elif "wait_time" in _scenario:
+        wait_time = between(_scenario["wait_time"]["min"], _scenario["wait_time"]["max"])
 
     def on_start(self):
         super().on_start()
-        with open("scenarios/users_api.yaml") as f:
-            self.scenario = yaml.safe_load(f)
+        # Compiled once per worker process and shared by all users
+        self.plan = load_plan(SCENARIO_FILE, self.host)
+        # Per-user template variables: extracted values, rows of user-bound feeders
+        self.variables = {}
+        self.arrivals = None
+        if _arrivals:
+            self.arrivals = arrival_rate.load_schedule(self.plan, arrival_rate.process_count(self.environment))
 
     @task
     def execute(self):
-        # Use weighted random selection based on task weights
-        weights = [req["weight"] for req in self.scenario["requests"]]
-        req = random.choices(self.scenario["requests"], weights=weights, k=1)[0]
-        self.client.request(
-            method=req["method"],
-            url=self.host + req["endpoint"],
-            json=req.get("payload"),
-            name=req["name"]
-        )
+        context = {}
+        if self.arrivals:
+            # Open loop: wait for the next scheduled send time
+            req, send_lag = self.arrivals.next_request()
+            context[arrival_rate.SEND_LAG_KEY] = send_lag
+        else:
+            # O(1) weighted selection from the precompiled plan
+            req = self.plan.choose()
+            if isinstance(req, FlowSpec):
+                run_flow(self, req)
+                return
+        url, body, headers = req.resolve(self.variables)
+        self.send(req, url, body, headers, context)
@@ -0,0 +1,198 @@
+import csv
+import json
+import mmap
+import os
+import random
+from functools import lru_cache
+
+import numpy as np
+from locust import events
+from locust.exception import StopUser
+
+from base_api_user import generator_partition
+
+# Iteration modes selectable via `feeders.<name>.mode`
+FEEDER_MODES = ("sequential", "random", "unique")
+
+# How long a drawn row is used: for one request, or for the user's lifetime
+FEEDER_BINDINGS = ("request", "user")
+
+FEEDER_FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+# Bytes scanned per NumPy pass while indexing line offsets
+INDEX_CHUNK_BYTES = 64 << 20
+
+
+def _index_lines(buffer, start):
+    """
+    Return (starts, ends) byte offsets of every non-empty line after `start`.
+
+    Newlines are located with vectorized NumPy scans over the mapped file in
+    fixed-size chunks, so indexing millions of rows costs 16 bytes per row
+    and never decodes the data.
+    """
+    size = len(buffer)
+    newlines = [
+        np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8, count=min(INDEX_CHUNK_BYTES, size - offset),
+                                     offset=offset) == 0x0A) + offset
+        for offset in range(start, size, INDEX_CHUNK_BYTES)
+    ]
+    newlines = np.concatenate(newlines) if newlines else np.zeros(0, dtype=np.int64)
+
+    starts = np.concatenate(([start], newlines + 1)).astype(np.int64)
+    ends = np.concatenate((newlines, [size])).astype(np.int64)
+    # Drop \r of CRLF files, then empty lines (including the one after a final newline)
+    if len(ends):
+        has_cr = np.zeros(len(ends), dtype=bool)
+        nonempty = ends > starts
+        has_cr[nonempty] = np.frombuffer(buffer, dtype=np.uint8)[ends[nonempty] - 1] == 0x0D
+        ends = ends - has_cr
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+class Feeder:
+    """
+    Memory-mapped CSV or JSONL test data shared by all users of a process.
+
+    Only the line offsets are indexed up front; a row is decoded when it is
+    drawn, so files with millions of rows cost little more than their
+    offset index in memory and the data pages are shared through the OS
+    page cache.
+
+    Modes:
+        sequential: rows in file order, wrapping around at the end
+        random: an independent random row for every draw
+        unique: every row is handed out at most once across all users and
+            worker processes (rows are partitioned by worker index); a user
+            that finds the feeder exhausted is stopped
+    """
+
+    def __init__(self, name, path, mode="sequential", bind="request", data_format=None):
+        if mode not in FEEDER_MODES:
+            raise ValueError(f"Unknown feeder mode '{mode}' for '{name}', expected one of {FEEDER_MODES}")
+        if bind not in FEEDER_BINDINGS:
+            raise ValueError(f"Unknown feeder binding '{bind}' for '{name}', expected one of {FEEDER_BINDINGS}")
+        data_format = data_format or FEEDER_FORMATS.get(os.path.splitext(path)[1].lower())
+        if data_format not in FEEDER_FORMATS.values():
+            raise ValueError(f"Cannot tell the format of feeder file {path}; set `format: csv` or `format: jsonl`")
+
+        self.name = name
+        self.path = path
+        self.mode = mode
+        self.bind = bind
+        self.format = data_format
+        self._user_key = f"_feeder.{name}"
+
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+        start = 0
+        self.columns = None
+        if data_format == "csv":
+            header_end = self._buffer.find(b"\n")
+            header_end = len(self._buffer) if header_end < 0 else header_end
+            header = bytes(self._buffer[:header_end]).decode("utf-8-sig").rstrip("\r")
+            self.columns = tuple(next(csv.reader([header]), []))
+            start = header_end + 1
+        self._starts, self._ends = _index_lines(self._buffer, min(start, len(self._buffer)))
+        if not len(self._starts):
+            raise ValueError(f"Feeder '{name}' has no data rows: {path}")
+
+        self._random = random.Random()
+        self.partition(*_partition)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def partition(self, index, count):
+        """
+        Restrict unique iteration to rows index, index + count, ... and
+        restart iteration from the beginning.
+        """
+        self._step = count if self.mode == "unique" else 1
+        self._cursor = index if self.mode == "unique" else 0
+
+    def _row(self, i):
+        line = self._buffer[self._starts[i]:self._ends[i]]
+        if self.format == "jsonl":
+            return json.loads(line)
+        return dict(zip(self.columns, next(csv.reader([line.decode("utf-8")]))))
+
+    def next_row(self):
+        """
+        Draw the next row according to the iteration mode.
+
+        Raises:
+            StopUser: If a unique feeder has no rows left
+        """
+        if self.mode == "random":
+            return self._row(self._random.randrange(len(self._starts)))
+
+        i = self._cursor
+        if i >= len(self._starts):
+            if self.mode == "unique":
+                raise StopUser(f"Feeder '{self.name}' ran out of unique rows")
+            i = 0
+        self._cursor = i + self._step
+        return self._row(i)
+
+    def row_for(self, variables):
+        """
+        Return the row for one request, reusing the user's row when bound per user.
+        """
+        if self.bind == "request":
+            return self.next_row()
+        row = variables.get(self._user_key)
+        if row is None:
+            row = variables[self._user_key] = self.next_row()
+        return row
+
+
+@lru_cache(maxsize=None)
+def load_feeder(name, path, mode="sequential", bind="request", data_format=None):
+    """
+    Open and index a feeder once per process.
+    """
+    feeder = Feeder(name, path, mode, bind, data_format)
+    _feeders.append(feeder)
+    return feeder
+
+
+def compile_feeders(scenario):
+    """
+    Open every feeder declared under the scenario's `feeders` section.
+
+    Returns:
+        Dict mapping feeder name to Feeder
+    """
+    feeders = {}
+    for name, spec in (scenario.get("feeders") or {}).items():
+        if "file" not in spec:
+            raise ValueError(f"Feeder '{name}' is missing required key: file")
+        feeders[name] = load_feeder(
+            name, spec["file"], spec.get("mode", "sequential"), spec.get("bind", "request"), spec.get("format")
+        )
+    return feeders
+
+
+_feeders = []
+
+# (index, count) of this process among the load generators
+_partition = [0, 1]
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    def on_test_start(**kw):
+        # Workers know their index and the worker count once a test starts;
+        # feeders opened later (by the first user) pick it up on creation
+        _partition[:] = generator_partition(environment)
+        for feeder in _feeders:
+            feeder.partition(*_partition)
+
+    environment.events.test_start.add_listener(on_test_start)
@@ -0,0 +1,205 @@
+import json
+import random
+import re
+import time
+
+import gevent
+
+from metrics.artifacts import FLOW_REQUEST_TYPE
+from templating import Deferred
+
+# JSONPath subset: $.key, $['key'], $["key"], $[0], $.items[-1].id
+_JSONPATH_TOKEN = re.compile(r"""\.([A-Za-z_][\w-]*)|\[(-?\d+)\]|\['([^']*)'\]|\["([^"]*)"\]""")
+
+
+class ExtractionError(Exception):
+    """
+    An extracted variable could not be found in the response it came from.
+    """
+
+
+class FlowStepFailed(Exception):
+    """
+    A flow step got a failed response, so the rest of the flow was skipped.
+    """
+
+
+def compile_jsonpath(path):
+    """
+    Compile a JSONPath expression into a tuple of keys and list indices.
+
+    Raises:
+        ValueError: If the expression is outside the supported subset
+    """
+    if not path.startswith("$"):
+        raise ValueError(f"JSONPath must start with '$': {path}")
+    keys = []
+    position = 1
+    for match in _JSONPATH_TOKEN.finditer(path, 1):
+        if match.start() != position:
+            break
+        name, index, quoted, double_quoted = match.groups()
+        if index is not None:
+            keys.append(int(index))
+        else:
+            keys.append(name if name is not None else quoted if quoted is not None else double_quoted)
+        position = match.end()
+    if position != len(path):
+        raise ValueError(f"Unsupported JSONPath expression: {path}")
+    return tuple(keys)
+
+
+class Extractor:
+    """
+    Pulls one value out of a captured response: a JSONPath into the JSON
+    body, the first group of a regex over the body, or a response header.
+    """
+    __slots__ = ("source", "kind", "_path", "_pattern", "_header")
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict) or len(spec) != 1:
+            raise ValueError(f"Extractor must have exactly one of jsonpath, regex or header: {spec}")
+        (kind, expression), = spec.items()
+        self.source = f"{kind} {expression}"
+        self.kind = kind
+        if kind == "jsonpath":
+            self._path = compile_jsonpath(expression)
+        elif kind == "regex":
+            self._pattern = re.compile(expression)
+        elif kind == "header":
+            self._header = expression
+        else:
+            raise ValueError(f"Unknown extractor type '{kind}', expected jsonpath, regex or header")
+
+    def extract(self, response):
+        try:
+            if self.kind == "jsonpath":
+                value = response.json()
+                for key in self._path:
+                    value = value[key]
+                return value
+            if self.kind == "regex":
+                match = self._pattern.search(response.text())
+                if match is None:
+                    raise LookupError
+                return match.group(1) if self._pattern.groups else match.group(0)
+            return response.headers[self._header]
+        except (LookupError, TypeError, ValueError):
+            raise ExtractionError(f"No match for {self.source}") from None
+
+
+def compile_extractors(extract):
+    """
+    Compile a step's `extract` mapping of variable name to extractor spec.
+    """
+    return tuple((name, Extractor(spec)) for name, spec in (extract or {}).items())
+
+
+class CapturedResponse:
+    """
+    The parts of a response that extractors may read, decoded on demand.
+
+    JSON parsing and text decoding happen at most once, and only when an
+    extracted variable is actually used by a later request.
+    """
+    __slots__ = ("content", "headers", "_json", "_text")
+
+    def __init__(self, response):
+        self.content = response.content or b""
+        self.headers = response.headers
+        self._json = None
+        self._text = None
+
+    def json(self):
+        if self._json is None:
+            self._json = json.loads(self.content)
+        return self._json
+
+    def text(self):
+        if self._text is None:
+            self._text = self.content.decode("utf-8", errors="replace")
+        return self._text
+
+
+class ExtractedValue(Deferred):
+    """
+    A variable extracted lazily from a captured response on first use.
+    """
+    __slots__ = ("_response", "_extractor")
+
+    def __init__(self, response, extractor):
+        super().__init__()
+        self._response = response
+        self._extractor = extractor
+
+    def compute(self):
+        return self._extractor.extract(self._response)
+
+
+def compile_think_time(think_time):
+    """
+    Compile a think time (seconds, or {min, max}) into a callable, or None.
+    """
+    if think_time is None:
+        return None
+    if isinstance(think_time, dict):
+        low, high = think_time["min"], think_time["max"]
+        return lambda: random.uniform(low, high)
+    return lambda: think_time
+
+
+def response_failed(status, checks=None):
+    """
+    Whether a step's response status fails the flow: not the `status` of
+    its checks when set, else no response or a status of 400 and above.
+    """
+    if checks is not None and checks.statuses is not None:
+        return status not in checks.statuses
+    return not 0 < status < 400
+
+
+def run_flow(user, flow):
+    """
+    Run a flow's steps in order for one user and report the transaction.
+
+    Each step is a normal request in Locust's stats. The whole flow is also
+    reported with request type FLOW; its response time is the time spent in
+    requests, excluding think time. A failed step or response check, or a
+    variable that cannot be extracted, ends the flow and marks the
+    transaction failed.
+    """
+    variables = user.variables
+    active = 0.0
+    exception = None
+    for step in flow.steps:
+        request = step.request
+        started = time.perf_counter()
+        try:
+            url, body, headers = request.resolve(variables)
+        except (KeyError, ExtractionError) as e:
+            exception = e
+            break
+        response, check_failure = user.send(request, url, body, headers)
+        active += time.perf_counter() - started
+
+        if response_failed(response.status_code, request.checks):
+            exception = FlowStepFailed(f"Step '{request.name}' failed with status {response.status_code}")
+            break
+        if check_failure is not None:
+            exception = FlowStepFailed(f"Step '{request.name}' failed its {check_failure.category} check")
+            break
+        if step.extractors:
+            captured = CapturedResponse(response)
+            for name, extractor in step.extractors:
+                variables[name] = ExtractedValue(captured, extractor)
+        if step.think_time is not None:
+            gevent.sleep(step.think_time())
+
+    user.environment.events.request.fire(
+        request_type=FLOW_REQUEST_TYPE,
+        name=flow.name,
+        response_time=active * 1000,
+        response_length=0,
+        exception=exception,
+        context={},
+    )
@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import time
+
+import gevent
+import psutil
+from locust import events
+from locust.runners import STATE_SPAWNING, MasterRunner, WorkerRunner
+
+from base_api_user import load_config
+from metrics.artifacts import GENERATOR_HEALTH_FILE
+
+# Key under which workers ship their samples in their stats reports
+REPORT_KEY = "generator_health"
+
+# Seconds between event-loop lag probes; lag is how late a probe wakes up
+LAG_PROBE_INTERVAL = 0.1
+
+# Defaults for the `generator_monitor` section of config/env.yaml
+DEFAULT_GENERATOR_SETTINGS = {
+    "enabled": True,
+    "interval": 1,               # Seconds between samples
+    "cpu_percent": 90,           # A sample at or above this CPU usage is saturated
+    "loop_lag_ms": 50,           # ... as is one whose worst loop lag reached this
+    "saturated_share": 0.1,      # Flag a generator saturated in this share of samples
+    "fail_on_saturation": False, # Make runner/validate.py fail saturated runs
+}
+
+logger = logging.getLogger(__name__)
+
+# Sampler of this process, for live exporters; None on the master or when disabled
+current_sampler = None
+
+
+def generator_settings(config):
+    settings = dict(DEFAULT_GENERATOR_SETTINGS)
+    settings.update((config or {}).get("generator_monitor") or {})
+    return settings
+
+
+def is_saturated(sample, settings):
+    if sample.get("warmup"):
+        return False
+    return sample["cpu_percent"] >= settings["cpu_percent"] or sample["loop_lag_ms"] >= settings["loop_lag_ms"]
+
+
+class GeneratorSampler:
+    """
+    Samples the health of one load generator process.
+
+    A single greenlet wakes up every LAG_PROBE_INTERVAL seconds; how late it
+    wakes is the gevent loop lag, i.e. how long users had to wait to run.
+    Every `interval` seconds it records process CPU, RSS, the worst loop
+    lag of the interval and the number of running user greenlets.
+
+    The first sample of a run and those taken while users are still being
+    spawned are marked `warmup`: start-up lag spikes there on every healthy
+    generator, so they never count as saturated.
+    """
+
+    def __init__(self, runner, settings):
+        self.runner = runner
+        self.settings = settings
+        self.process = psutil.Process()
+        self.samples = []
+        self.samples_taken = 0
+        self.latest = None
+        self.warned = False
+        self.greenlet = None
+
+    def sample(self, loop_lag):
+        sample = {
+            "time": time.time(),
+            "cpu_percent": self.process.cpu_percent(None),
+            "rss_mb": self.process.memory_info().rss / (1 << 20),
+            "loop_lag_ms": loop_lag * 1000,
+            "greenlets": len(self.runner.user_greenlets),
+            "warmup": not self.samples_taken or self.runner.state == STATE_SPAWNING,
+        }
+        self.samples_taken += 1
+        self.samples.append(sample)
+        self.latest = sample
+        if not self.warned and is_saturated(sample, self.settings):
+            self.warned = True
+            logger.warning(
+                "Load generator saturated (CPU %.0f%%, loop lag %.0fms): "
+                "response times include time spent waiting on this process",
+                sample["cpu_percent"], sample["loop_lag_ms"]
+            )
+        return sample
+
+    def run(self):
+        interval = self.settings["interval"]
+        # The first cpu_percent call only sets the baseline
+        self.process.cpu_percent(None)
+        next_sample = time.monotonic() + interval
+        worst_lag = 0.0
+        while True:
+            started = time.monotonic()
+            gevent.sleep(LAG_PROBE_INTERVAL)
+            now = time.monotonic()
+            worst_lag = max(worst_lag, now - started - LAG_PROBE_INTERVAL)
+            if now >= next_sample:
+                self.sample(worst_lag)
+                worst_lag = 0.0
+                next_sample = now + interval
+
+    def start(self):
+        self.samples = []
+        self.samples_taken = 0
+        self.warned = False
+        self.stop()
+        self.greenlet = gevent.spawn(self.run)
+
+    def stop(self):
+        if self.greenlet is not None:
+            self.greenlet.kill(block=False)
+            self.greenlet = None
+
+    def drain(self):
+        samples = self.samples
+        self.samples = []
+        return samples
+
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percentile), len(ordered) - 1)]
+
+
+def summarize(generators, settings):
+    """
+    Summarize the samples of every generator and decide whether the run's
+    latencies can be trusted.
+
+    Args:
+        generators: Dict mapping generator name to its list of samples
+        settings: Resolved generator_monitor settings
+
+    Returns:
+        Health dict with 'saturated', 'warnings', thresholds and a summary
+        plus the raw samples per generator
+    """
+    warnings = []
+    summaries = {}
+    for name, samples in sorted(generators.items()):
+        if not samples:
+            continue
+        # Warm-up samples are kept for the charts but left out of the share
+        counted = sum(1 for sample in samples if not sample.get("warmup"))
+        saturated = sum(1 for sample in samples if is_saturated(sample, settings))
+        share = saturated / counted if counted else 0.0
+        cpu = [sample["cpu_percent"] for sample in samples]
+        lag = [sample["loop_lag_ms"] for sample in samples]
+        summary = {
+            "samples": len(samples),
+            "warmup_samples": len(samples) - counted,
+            "cpu_avg_percent": sum(cpu) / len(cpu),
+            "cpu_max_percent": max(cpu),
+            "rss_max_mb": max(sample["rss_mb"] for sample in samples),
+            "loop_lag_p99_ms": _percentile(lag, 0.99),
+            "loop_lag_max_ms": max(lag),
+            "greenlets_max": max(sample["greenlets"] for sample in samples),
+            "saturated_share": share,
+            "saturated": share >= settings["saturated_share"],
+        }
+        summaries[name] = {"summary": summary, "samples": samples}
+        if summary["saturated"]:
+            warnings.append(
+                f"{name} was saturated in {share * 100:.0f}% of samples "
+                f"(CPU max {summary['cpu_max_percent']:.0f}%, loop lag max {summary['loop_lag_max_ms']:.0f}ms)"
+            )
+    return {
+        "saturated": bool(warnings),
+        "warnings": warnings,
+        "thresholds": {key: settings[key] for key in ("cpu_percent", "loop_lag_ms", "saturated_share")},
+        "fail_on_saturation": settings["fail_on_saturation"],
+        "generators": summaries,
+    }
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    settings = generator_settings(load_config())
+    if not settings["enabled"]:
+        return
+    runner = environment.runner
+
+    # The master runs no users; it only collects the workers' samples
+    if isinstance(runner, MasterRunner):
+        generators = {}
+
+        def on_test_start(**kw):
+            generators.clear()
+
+        def on_worker_report(client_id, data, **kw):
+            health = data.get(REPORT_KEY)
+            if health:
+                generators.setdefault(f"worker {health['index']}", []).extend(health["samples"])
+
+        environment.events.test_start.add_listener(on_test_start)
+        environment.events.worker_report.add_listener(on_worker_report)
+    else:
+        global current_sampler
+        sampler = current_sampler = GeneratorSampler(runner, settings)
+        generators = {"local": sampler.samples}
+
+        def on_test_start(**kw):
+            sampler.start()
+            generators["local"] = sampler.samples
+
+        environment.events.test_start.add_listener(on_test_start)
+        environment.events.test_stop.add_listener(lambda **kw: sampler.stop())
+
+        if isinstance(runner, WorkerRunner):
+            def on_report_to_master(client_id, data, **kw):
+                data[REPORT_KEY] = {"index": runner.worker_index, "samples": sampler.drain()}
+
+            environment.events.report_to_master.add_listener(on_report_to_master)
+            return
+
+    def on_quitting(**kw):
+        reports_dir = os.environ.get("API_PERF_REPORTS_DIR")
+        if reports_dir and any(generators.values()):
+            with open(os.path.join(reports_dir, GENERATOR_HEALTH_FILE), "w") as f:
+                json.dump(summarize(generators, settings), f, indent=2)
+
+    environment.events.quitting.add_listener(on_quitting)
@@ -0,0 +1,189 @@
+import time
+from urllib.parse import urlsplit
+
+from locust import User
+from locust.exception import CatchResponseError, StopTest
+
+from connection_policy import ConnectionTiming, response_headers_received, shared_ssl_context, status_error, traced
+
+try:
+    import httpx
+except ImportError:  # Optional: only the httpx backend needs it
+    httpx = None
+
+# httpcore trace events that bound the TCP handshake and the wait for response headers
+CONNECT_EVENTS = ("connection.connect_tcp.started", "connection.connect_tcp.complete")
+HEADERS_STARTED = ".receive_response_headers.started"
+HEADERS_COMPLETE = ".receive_response_headers.complete"
+
+
+class RequestTrace:
+    """
+    httpcore trace callback that fills in a request's ConnectionTiming.
+
+    TLS handshakes are timed by the shared SSL context, like on the requests backend.
+    """
+    __slots__ = ("timing", "connect_started", "headers_started")
+
+    def __init__(self, timing):
+        self.timing = timing
+        self.connect_started = None
+        self.headers_started = None
+
+    def __call__(self, event_name, info):
+        now = time.perf_counter()
+        if event_name == CONNECT_EVENTS[0]:
+            self.connect_started = now
+        elif event_name == CONNECT_EVENTS[1] and self.connect_started is not None:
+            self.timing.connect = (now - self.connect_started) * 1000
+        elif event_name.endswith(HEADERS_STARTED):
+            self.headers_started = now
+        elif event_name.endswith(HEADERS_COMPLETE) and self.headers_started is not None:
+            response_headers_received((now - self.headers_started) * 1000)
+
+
+class CaughtResponse:
+    """
+    What HttpxSession.request(catch_response=True) returns, like Locust's
+    ResponseContextManager: the request is reported when the `with` block
+    exits, as failed or successful by failure() and success().
+    """
+
+    def __init__(self, response, report, exception):
+        self._response = response
+        self._report = report
+        self._exception = exception
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._report(self._exception)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def success(self):
+        self._exception = None
+
+    def failure(self, exc):
+        self._exception = exc if isinstance(exc, Exception) else CatchResponseError(exc)
+
+
+class HttpxSession:
+    """
+    A Locust-style HTTP client on httpx, for HTTP/2 and the connection policy.
+
+    request() has the signature the scenario, flow and replay users call,
+    reports every request to Locust's request event like HttpSession does,
+    and returns the httpx response with `connection_timing` attached. A
+    request that fails without a response returns a response with status 0.
+    """
+
+    def __init__(self, base_url, request_event, user, policy, insecure=False, connection_timeout=60.0,
+                 network_timeout=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.request_event = request_event
+        self.user = user
+        max_connections = policy["max_connections"]
+        self.tls_sessions = {} if policy["tls_session_resumption"] else None
+        self.client = httpx.Client(
+            http2=policy["http2"],
+            verify=shared_ssl_context(not insecure),
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections if policy["keep_alive"] else 0),
+            timeout=httpx.Timeout(network_timeout, connect=connection_timeout),
+            follow_redirects=True,
+        )
+
+    def request(self, method, url, name=None, data=None, headers=None, context=None, catch_response=False,
+                **kwargs):
+        """
+        Send one request and report it.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL, or a path relative to the user's host
+            name: Name the request is reported under (default: the URL path)
+            data: Body; str or bytes are sent as is, dicts form-encoded
+            headers: Request headers
+            context: Extra context for request event listeners
+            catch_response: Return a CaughtResponse to mark the request
+                failed or successful before it is reported
+
+        Returns:
+            httpx.Response, or CaughtResponse with catch_response
+        """
+        if "://" not in url:
+            url = self.base_url + url
+        if isinstance(data, (str, bytes)):
+            kwargs["content"] = data
+        elif data is not None:
+            kwargs["data"] = data
+        timing = ConnectionTiming()
+        exception = None
+        start_time = time.time()
+        started = time.perf_counter()
+        with traced(timing, self.tls_sessions):
+            try:
+                response = self.client.request(method, url, headers=headers,
+                                               extensions={"trace": RequestTrace(timing)}, **kwargs)
+            except httpx.HTTPError as e:
+                exception = e
+                response = httpx.Response(0, request=httpx.Request(method, url))
+        response_time = (time.perf_counter() - started) * 1000
+
+        name = name or urlsplit(url).path
+        if exception is None and response.status_code >= 400:
+            # HTTP/2 has no reason phrase, so use the standard one
+            reason = response.reason_phrase or httpx.codes.get_reason_phrase(response.status_code)
+            exception = status_error(response.status_code, reason, name)
+        response.connection_timing = timing
+
+        def report(exception):
+            self.request_event.fire(
+                request_type=method,
+                name=name,
+                response_time=response_time,
+                response_length=len(response.content),
+                response=response,
+                context={**self.user.context(), **(context or {})},
+                exception=exception,
+                start_time=start_time,
+                url=url,
+            )
+
+        if catch_response:
+            return CaughtResponse(response, report, exception)
+        report(exception)
+        return response
+
+    def close(self):
+        self.client.close()
+
+
+class HttpxUser(User):
+    """
+    User with an HttpxSession as `self.client`.
+
+    Connection settings are class attributes, set from the `client`
+    section by base_api_user.base_user_class().
+    """
+    abstract = True
+
+    connection_policy = None
+    insecure = False
+    connection_timeout = 60.0
+    network_timeout = 60.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.host is None:
+            raise StopTest("You must specify the base host, in the User class or with --host.")
+        self.client = HttpxSession(
+            self.host, self.environment.events.request, self, self.connection_policy, self.insecure,
+            self.connection_timeout, self.network_timeout,
+        )
+
+    def on_stop(self):
+        self.client.close()
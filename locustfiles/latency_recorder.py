@@ -0,0 +1,203 @@
+import os
+
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+from arrival_rate import SEND_LAG_KEY
+from metrics.artifacts import (CONNECTION_PHASES, CORRECTED_HISTOGRAM_FILE, FAILED_HISTOGRAM_FILE, HISTOGRAM_FILE,
+                               INTENDED_HISTOGRAM_FILE, PHASE_HISTOGRAM_FILES)
+from metrics.hdr_histogram import MICROS_PER_MS, HdrHistogram, histogram_key, save_histograms
+from metrics.pacing import PACING_KEY
+
+# Keys under which workers ship interval histograms in their stats reports
+REPORT_KEY = "hdr_histograms"
+INTENDED_REPORT_KEY = "hdr_histograms_intended"
+CORRECTED_REPORT_KEY = "hdr_histograms_corrected"
+FAILED_REPORT_KEY = "hdr_histograms_failed"
+
+
+class LatencyRecorder:
+    """
+    Records every response time into per-endpoint HDR histograms.
+
+    Workers record into interval histograms that are shipped with each
+    regular stats report and then reset; the master (or a standalone
+    process) merges them into run totals and writes them out on quit.
+    """
+
+    # Write the file even when nothing was recorded
+    save_empty = False
+
+    def __init__(self, buffered=False, file_name=HISTOGRAM_FILE, report_key=REPORT_KEY):
+        self.buffered = buffered
+        self.file_name = file_name
+        self.report_key = report_key
+        self.reset()
+
+    def histogram(self, request_type, name):
+        """
+        Return the current interval histogram of an endpoint.
+        """
+        key = histogram_key(request_type, name)
+        histogram = self.interval.get(key)
+        if histogram is None:
+            histogram = self.interval[key] = HdrHistogram()
+        return histogram
+
+    def record(self, request_type, name, response_time, **kwargs):
+        if response_time is None:
+            return
+        self.histogram(request_type, name).record_ms(response_time)
+
+    def merge_encoded(self, encoded):
+        for key, blob in encoded.items():
+            histogram = HdrHistogram.decode(blob)
+            if key in self.totals:
+                self.totals[key].merge(histogram)
+            else:
+                self.totals[key] = histogram
+
+    def drain_interval(self):
+        """
+        Return the encoded interval histograms and start a new interval.
+        """
+        encoded = {key: h.encode() for key, h in self.interval.items() if h.total_count}
+        self.interval = {}
+        return encoded
+
+    def reset(self):
+        self.totals = {}
+        # Unbuffered (standalone) recorders write straight into the totals
+        self.interval = {} if self.buffered else self.totals
+
+    def save(self, reports_dir):
+        path = os.path.join(reports_dir, self.file_name)
+        save_histograms(path, self.totals)
+        return path
+
+
+class FailedLatencyRecorder(LatencyRecorder):
+    """
+    Records the response times of failed requests.
+
+    Kept alongside the main histograms so the report can take request and
+    failure counts from the same source; the file is written even when no
+    request failed, so its absence means an older run rather than no failures.
+    """
+    save_empty = True
+
+    def record(self, request_type, name, response_time, exception=None, **kwargs):
+        if exception is None:
+            return
+        super().record(request_type, name, response_time)
+
+
+class IntendedLatencyRecorder(LatencyRecorder):
+    """
+    Records latency measured from each request's intended send time.
+
+    Only requests sent by the open-loop arrival schedule carry a send lag in
+    their context; adding it to the response time gives the latency a user
+    arriving on schedule would have seen, even when the generator fell behind.
+    """
+
+    def record(self, request_type, name, response_time, context=None, **kwargs):
+        send_lag = (context or {}).get(SEND_LAG_KEY)
+        if send_lag is None or response_time is None:
+            return
+        super().record(request_type, name, response_time + send_lag)
+
+
+class CorrectedLatencyRecorder(LatencyRecorder):
+    """
+    Records response times corrected for coordinated omission.
+
+    A response slower than its user's expected request interval also
+    records the responses the user would have waited for had it kept
+    sending on time, HdrHistogram-style. Open-loop requests are left to
+    IntendedLatencyRecorder, which measures them from their schedule, and
+    requests without a pacing (flow transactions) are recorded as is.
+    """
+
+    def record(self, request_type, name, response_time, context=None, start_time=None, **kwargs):
+        context = context or {}
+        if response_time is None or SEND_LAG_KEY in context:
+            return
+        pacing = context.get(PACING_KEY)
+        expected = pacing.expected_interval(start_time, response_time) \
+            if pacing is not None and start_time is not None else None
+        if expected is None:
+            super().record(request_type, name, response_time)
+            return
+        self.histogram(request_type, name).record_corrected_value(
+            int(response_time * MICROS_PER_MS), int(expected * MICROS_PER_MS))
+
+
+class ConnectionPhaseRecorder(LatencyRecorder):
+    """
+    Records one connection phase (connect, TLS or TTFB) of each request.
+
+    The requests and httpx backends attach a ConnectionTiming to their
+    responses; phases that did not happen, like the TCP handshake on a
+    reused connection, are not recorded, so a phase's count is how often it
+    happened.
+    """
+
+    def __init__(self, phase, **kwargs):
+        super().__init__(file_name=PHASE_HISTOGRAM_FILES[phase], report_key=f"{REPORT_KEY}_{phase}", **kwargs)
+        self.phase = phase
+
+    def record(self, request_type, name, response_time, response=None, **kwargs):
+        timing = getattr(response, "connection_timing", None)
+        if timing is None:
+            return
+        super().record(request_type, name, getattr(timing, self.phase))
+
+
+recorder = LatencyRecorder()
+failed_recorder = FailedLatencyRecorder(file_name=FAILED_HISTOGRAM_FILE, report_key=FAILED_REPORT_KEY)
+intended_recorder = IntendedLatencyRecorder(file_name=INTENDED_HISTOGRAM_FILE, report_key=INTENDED_REPORT_KEY)
+corrected_recorder = CorrectedLatencyRecorder(file_name=CORRECTED_HISTOGRAM_FILE, report_key=CORRECTED_REPORT_KEY)
+phase_recorders = tuple(ConnectionPhaseRecorder(phase) for phase in CONNECTION_PHASES)
+RECORDERS = (recorder, failed_recorder, intended_recorder, corrected_recorder, *phase_recorders)
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    runner = environment.runner
+
+    if isinstance(runner, WorkerRunner):
+        for rec in RECORDERS:
+            rec.buffered = True
+            rec.reset()
+            environment.events.request.add_listener(rec.record)
+
+        def on_report_to_master(client_id, data, **kw):
+            for rec in RECORDERS:
+                data[rec.report_key] = rec.drain_interval()
+
+        environment.events.report_to_master.add_listener(on_report_to_master)
+        return
+
+    if isinstance(runner, MasterRunner):
+        def on_worker_report(client_id, data, **kw):
+            for rec in RECORDERS:
+                rec.merge_encoded(data.get(rec.report_key) or {})
+
+        environment.events.worker_report.add_listener(on_worker_report)
+    else:
+        for rec in RECORDERS:
+            environment.events.request.add_listener(rec.record)
+
+    def on_test_start(**kw):
+        for rec in RECORDERS:
+            rec.reset()
+
+    def on_quitting(**kw):
+        reports_dir = os.environ.get("API_PERF_REPORTS_DIR")
+        for rec in RECORDERS:
+            if reports_dir and (rec.totals or rec.save_empty):
+                rec.save(reports_dir)
+
+    environment.events.test_start.add_listener(on_test_start)
+    environment.events.quitting.add_listener(on_quitting)
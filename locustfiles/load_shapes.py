@@ -0,0 +1,251 @@
+import json
+import logging
+import math
+import os
+import time
+
+from locust import LoadTestShape
+
+from config.loader import load_thresholds
+from metrics.artifacts import CAPACITY_FILE
+from metrics.sla_rules import SlaRules
+from sla_monitor import EndpointWindow, endpoint_rule, request_total, rule_percentiles, window_breaches
+
+# Profiles selectable via `load_shape.type`
+SHAPE_TYPES = ("stages", "step", "spike", "soak", "knee")
+
+# Defaults for `load_shape.type: knee`
+DEFAULT_KNEE_SETTINGS = {
+    "start_users": 10,
+    "step_users": 10,
+    "step_duration": 60,
+    "settle": 10,
+    "max_users": 1000,
+    "min_requests": 20,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def shape_settings(config, scenario=None):
+    """
+    Resolve the load shape: the scenario's `load_shape` section takes
+    precedence over the one in env.yaml.
+
+    Returns:
+        Shape settings dict, or None to use the flat -u/-r/-t load
+
+    Raises:
+        ValueError: If the shape type is unknown
+    """
+    settings = (scenario or {}).get("load_shape") or (config or {}).get("load_shape")
+    if not settings:
+        return None
+    if settings.get("type") not in SHAPE_TYPES:
+        raise ValueError(f"Unknown load shape '{settings.get('type')}', expected one of {SHAPE_TYPES}")
+    return settings
+
+
+def compile_stages(settings):
+    """
+    Expand a stages, step, spike or soak profile into cumulative stages.
+
+    Returns:
+        List of (end time in seconds, users, spawn rate) tuples
+    """
+    shape_type = settings["type"]
+
+    if shape_type == "stages":
+        stages = []
+        end = 0
+        for stage in settings["stages"]:
+            end += stage["duration"]
+            stages.append((end, stage["users"], stage.get("spawn_rate", stage["users"])))
+        return stages
+
+    if shape_type == "step":
+        step_users = settings["step_users"]
+        return [
+            ((i + 1) * settings["step_duration"],
+             settings.get("start_users", step_users) + i * step_users,
+             settings.get("spawn_rate", step_users))
+            for i in range(settings["steps"])
+        ]
+
+    if shape_type == "spike":
+        base = settings["base_users"]
+        spike_at = settings["spike_at"]
+        spike_end = spike_at + settings["spike_duration"]
+        spawn_rate = settings.get("spawn_rate", base)
+        spike_rate = settings.get("spike_spawn_rate", settings["spike_users"])
+        return [
+            (spike_at, base, spawn_rate),
+            (spike_end, settings["spike_users"], spike_rate),
+            (settings["duration"], base, spike_rate),
+        ]
+
+    # soak: ramp up once, then hold
+    users = settings["users"]
+    spawn_rate = settings.get("spawn_rate", users / max(settings.get("ramp_up", 1), 1))
+    return [(settings["duration"], users, spawn_rate)]
+
+
+class StagesShape(LoadTestShape):
+    """
+    Runs a fixed list of (end time, users, spawn rate) stages, then stops.
+    """
+    abstract = True
+    stages = ()
+
+    def tick(self):
+        run_time = self.get_run_time()
+        for end, users, spawn_rate in self.stages:
+            if run_time < end:
+                return users, spawn_rate
+        return None
+
+
+class KneeShape(LoadTestShape):
+    """
+    Steps the user count up until an SLA in thresholds/sla.yaml breaks.
+
+    Each step holds its user count for `step_duration` seconds; traffic after
+    the first `settle` seconds is measured. The search stops at the first
+    step that breaches a percentile or error-rate threshold (or at `max_users`) and
+    writes capacity.json with the throughput of the last passing step: the
+    maximum sustainable request rate per endpoint.
+    """
+    abstract = True
+    settings = {}
+
+    # The knee search breaches SLAs on purpose; the streaming SLA monitor
+    # must not abort the run when it does
+    evaluates_sla = True
+
+    def __init__(self):
+        super().__init__()
+        settings = dict(DEFAULT_KNEE_SETTINGS)
+        settings.update(self.settings)
+        if settings["settle"] >= settings["step_duration"]:
+            raise ValueError("load_shape.settle must be shorter than load_shape.step_duration")
+        self.knee = settings
+        self.rules = SlaRules(load_thresholds())
+        self._reset()
+
+    def _reset(self):
+        self.step = 0
+        self.windows = None
+        self.results = []
+        self.finished = False
+
+    def reset_time(self):
+        super().reset_time()
+        self._reset()
+
+    def step_users(self, step):
+        return self.knee["start_users"] + step * self.knee["step_users"]
+
+    def tick(self):
+        if self.finished:
+            return None
+
+        run_time = self.get_run_time()
+        step = int(run_time // self.knee["step_duration"])
+        if step != self.step:
+            passed = self._finish_step()
+            self.step = step
+            if not passed or self.step_users(step) > self.knee["max_users"]:
+                self._write_capacity(saturated=not passed)
+                self.finished = True
+                return None
+
+        if self.windows is None and run_time - step * self.knee["step_duration"] >= self.knee["settle"]:
+            self._start_measuring()
+
+        users = self.step_users(self.step)
+        return users, self.knee.get("spawn_rate", self.knee["step_users"])
+
+    def _entries(self):
+        stats = self.runner.stats
+        entries = {f"{method} {name}": entry for (name, method), entry in stats.entries.items()}
+        # Without flow transactions, which would count their steps' requests twice
+        entries["Aggregated"] = request_total(stats)
+        return entries
+
+    def _start_measuring(self):
+        now = time.time()
+        self.windows = {}
+        for key, entry in self._entries().items():
+            window = self.windows[key] = EndpointWindow(math.inf)
+            window.update(entry, now)
+        self.measure_started = now
+
+    def _finish_step(self):
+        """
+        Measure the step that just ended against the SLA thresholds.
+
+        Returns:
+            True if every endpoint with thresholds met them
+        """
+        now = time.time()
+        duration = now - self.measure_started if self.windows else 0
+        endpoints = {}
+        breaches = []
+        for key, entry in self._entries().items():
+            window = (self.windows or {}).get(key)
+            if window is None:
+                continue
+            window.update(entry, now)
+            rule = self.rules.aggregate if key == "Aggregated" else endpoint_rule(self.rules, entry)
+            count, error_rate, latencies = window.stats(sorted({95, *rule_percentiles(rule)}))
+            endpoints[key] = {
+                "rps": count / duration if duration > 0 else 0.0,
+                "requests": count,
+                "p95_ms": latencies[95],
+                "error_rate": error_rate,
+            }
+
+            if not rule or count < self.knee["min_requests"]:
+                continue
+            breaches.extend(window_breaches(entry.name, rule, error_rate, latencies).values())
+
+        self.results.append({
+            "users": self.step_users(self.step),
+            "measured_seconds": duration,
+            "passed": not breaches,
+            "breaches": breaches,
+            "endpoints": endpoints,
+        })
+        self.windows = None
+        logger.info("Knee search: %d users %s", self.step_users(self.step),
+                    "passed" if not breaches else "breached: " + "; ".join(breaches))
+        return not breaches
+
+    def capacity(self, saturated):
+        passing = [result for result in self.results if result["passed"]]
+        last = passing[-1] if passing else None
+        return {
+            "saturated": saturated,
+            "knee_users": last["users"] if last else None,
+            "limited_by": self.results[-1]["breaches"] if saturated and self.results else [],
+            "max_sustainable_rps": {
+                key: values["rps"] for key, values in last["endpoints"].items()
+            } if last else {},
+            "steps": self.results,
+        }
+
+    def _write_capacity(self, saturated):
+        reports_dir = os.environ.get("API_PERF_REPORTS_DIR")
+        if not reports_dir:
+            return
+        with open(os.path.join(reports_dir, CAPACITY_FILE), "w") as f:
+            json.dump(self.capacity(saturated), f, indent=2)
+
+
+def shape_class(settings):
+    """
+    Return a concrete LoadTestShape class for the resolved shape settings.
+    """
+    if settings["type"] == "knee":
+        return type("KneeLoadShape", (KneeShape,), {"settings": settings, "abstract": False})
+    return type("StagesLoadShape", (StagesShape,), {"stages": compile_stages(settings), "abstract": False})
@@ -0,0 +1,201 @@
+import logging
+import os
+import time
+
+import gevent
+from gevent.pywsgi import WSGIServer
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+import generator_monitor
+from base_api_user import load_config
+from metrics.openmetrics import CONTENT_TYPE, DEFAULT_BUCKETS_MS, LiveMetrics, PREFIX, FileSink, exposition, labels
+
+# Key under which workers ship their counters in their stats reports
+REPORT_KEY = "live_metrics"
+
+# Sub-folder of the report folder holding one OpenMetrics file per process
+SINK_DIR = "live_metrics"
+
+# Defaults for the `metrics_exporter` section of config/env.yaml
+DEFAULT_EXPORTER_SETTINGS = {
+    "enabled": False,
+    "host": "127.0.0.1",
+    "port": 9646,                 # Master (or standalone) port; worker N serves port + 1 + N
+    "buckets_ms": list(DEFAULT_BUCKETS_MS),
+    "rps_window": 10,             # Seconds behind the requests-per-second gauges
+    "file_sink": False,           # Also write <reports>/live_metrics/<node>.om snapshots
+    "sink_interval": 10,          # Seconds between file sink snapshots
+}
+
+logger = logging.getLogger(__name__)
+
+
+def exporter_settings(config):
+    """
+    Resolve the `metrics_exporter` settings; $API_PERF_METRICS_PORT enables
+    the endpoint on that port.
+    """
+    settings = dict(DEFAULT_EXPORTER_SETTINGS)
+    settings.update((config or {}).get("metrics_exporter") or {})
+    port = os.environ.get("API_PERF_METRICS_PORT")
+    if port:
+        settings["enabled"] = True
+        settings["port"] = int(port)
+    return settings
+
+
+def health_families(generators):
+    """
+    Gauges of the newest generator health sample of every node.
+
+    Args:
+        generators: Dict mapping node name to its latest sample
+    """
+    gauges = (
+        ("cpu_percent", None, "Load generator process CPU usage.", lambda s: s["cpu_percent"]),
+        ("rss_bytes", "bytes", "Load generator resident memory.", lambda s: s["rss_mb"] * (1 << 20)),
+        ("loop_lag_seconds", "seconds", "Worst gevent loop lag of the last sample interval.",
+         lambda s: s["loop_lag_ms"] / 1000),
+        ("greenlets", None, "Running user greenlets.", lambda s: s["greenlets"]),
+    )
+    for suffix, unit, help_text, value in gauges:
+        name = f"{PREFIX}_generator_{suffix}"
+        yield name, "gauge", unit, help_text, [
+            (name, labels(node=node), value(sample)) for node, sample in sorted(generators.items())
+        ]
+
+
+class MetricsExporter:
+    """
+    Serves one process's live metrics at /metrics and feeds the file sink.
+
+    Load generators record every request into their own LiveMetrics. The
+    master records nothing itself: it sums the counters workers ship with
+    their stats reports, so scraping only the master gives run totals.
+    """
+
+    def __init__(self, environment, settings, node):
+        self.environment = environment
+        self.settings = settings
+        self.node = node
+        self.live = LiveMetrics(settings["buckets_ms"], settings["rps_window"])
+        self.worker_states = {}
+        self.worker_health = {}
+        self.server = None
+        self.sink = None
+        self.greenlet = None
+
+    def families(self):
+        yield from self.live.families(self.node)
+        runner = self.environment.runner
+        users = f"{PREFIX}_users"
+        yield users, "gauge", None, "Running users.", [(users, labels(node=self.node), runner.user_count)]
+        if isinstance(runner, MasterRunner):
+            workers = f"{PREFIX}_workers"
+            yield workers, "gauge", None, "Connected workers.", [(workers, labels(node=self.node), runner.worker_count)]
+            yield from health_families(self.worker_health)
+        else:
+            sampler = generator_monitor.current_sampler
+            if sampler is not None and sampler.latest is not None:
+                yield from health_families({self.node: sampler.latest})
+
+    def on_request(self, request_type, name, response_time, exception=None, **kw):
+        if response_time is not None:
+            self.live.record(request_type, name, response_time, exception is not None)
+
+    def handle(self, env, start_response):
+        if env["PATH_INFO"] != "/metrics":
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"Not Found\n"]
+        body = exposition(self.families()).encode("utf-8")
+        start_response("200 OK", [("Content-Type", CONTENT_TYPE), ("Content-Length", str(len(body)))])
+        return [body]
+
+    def serve(self, port):
+        if self.server is not None:
+            return
+        self.server = WSGIServer((self.settings["host"], port), self.handle, log=None)
+        self.server.start()
+        logger.info("OpenMetrics endpoint for %s at http://%s:%d/metrics", self.node, self.settings["host"], port)
+
+    def on_worker_report(self, client_id, data, **kw):
+        state = data.get(REPORT_KEY)
+        if state is not None:
+            self.worker_states[client_id] = state
+        health = data.get(generator_monitor.REPORT_KEY)
+        if health and health["samples"]:
+            self.worker_health[f"worker-{health['index']}"] = health["samples"][-1]
+
+    def run(self):
+        next_snapshot = time.monotonic()
+        while True:
+            gevent.sleep(1)
+            if isinstance(self.environment.runner, MasterRunner):
+                self.live.load_states(self.worker_states.values())
+            self.live.tick(time.monotonic())
+            if self.sink is not None and time.monotonic() >= next_snapshot:
+                self.sink.write(self.families(), time.time())
+                next_snapshot += self.settings["sink_interval"]
+
+    def start(self):
+        if self.settings["file_sink"] and self.sink is None:
+            reports_dir = os.environ.get("API_PERF_REPORTS_DIR")
+            if reports_dir:
+                directory = os.path.join(reports_dir, SINK_DIR)
+                os.makedirs(directory, exist_ok=True)
+                self.sink = FileSink(os.path.join(directory, f"{self.node}.om"))
+            else:
+                logger.warning("metrics_exporter.file_sink is enabled but API_PERF_REPORTS_DIR is not set")
+        if self.greenlet is None:
+            self.greenlet = gevent.spawn(self.run)
+
+    def stop(self):
+        if self.greenlet is not None:
+            self.greenlet.kill(block=False)
+            self.greenlet = None
+        if self.sink is not None:
+            # One last snapshot so the file ends with the run totals
+            if isinstance(self.environment.runner, MasterRunner):
+                self.live.load_states(self.worker_states.values())
+            self.sink.write(self.families(), time.time())
+            logger.info("Wrote live metrics to %s", self.sink.close())
+            self.sink = None
+        if self.server is not None:
+            self.server.stop(timeout=1)
+            self.server = None
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    settings = exporter_settings(load_config())
+    if not settings["enabled"]:
+        return
+    runner = environment.runner
+
+    if isinstance(runner, WorkerRunner):
+        exporter = MetricsExporter(environment, settings, "worker")
+
+        def on_test_start(**kw):
+            # The worker index is only known once the master has acknowledged the worker
+            exporter.node = f"worker-{runner.worker_index}"
+            exporter.serve(settings["port"] + 1 + runner.worker_index)
+            exporter.start()
+
+        def on_report_to_master(client_id, data, **kw):
+            data[REPORT_KEY] = exporter.live.state()
+
+        environment.events.request.add_listener(exporter.on_request)
+        environment.events.test_start.add_listener(on_test_start)
+        environment.events.report_to_master.add_listener(on_report_to_master)
+    else:
+        master = isinstance(runner, MasterRunner)
+        exporter = MetricsExporter(environment, settings, "all" if master else "local")
+        exporter.serve(settings["port"])
+        if master:
+            environment.events.worker_report.add_listener(exporter.on_worker_report)
+        else:
+            environment.events.request.add_listener(exporter.on_request)
+        environment.events.test_start.add_listener(lambda **kw: exporter.start())
+
+    environment.events.quitting.add_listener(lambda **kw: exporter.stop())
@@ -0,0 +1,574 @@
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import gevent
+from locust import constant, events, task
+from locust.exception import StopUser
+from locust.runners import MasterRunner, WorkerRunner
+
+from arrival_rate import SEND_LAG_KEY
+from base_api_user import generator_partition
+from metrics.artifacts import REPLAY_FILE
+from metrics.hdr_histogram import HdrHistogram
+
+# Capture formats selectable via `replay.format`
+REPLAY_FORMATS = ("auto", "jsonl", "har", "access_log")
+
+# Format picked by `auto` from the file extension (after stripping .gz)
+FORMAT_EXTENSIONS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".har": "har", ".log": "access_log"}
+
+# Defaults for the scenario's `replay` section
+DEFAULT_REPLAY_SETTINGS = {
+    "file": None,
+    "format": "auto",
+    "speed": 1.0,                 # 10 replays the capture ten times faster
+    "shard": True,                # Split the capture between workers instead of replaying it on each
+    "loop": False,                # Start over at the end of the capture instead of ending the test
+    "headers": ["content-type", "accept"],   # Captured request headers sent along
+    "group_ids": True,            # Report /users/42 and /users/43 as /users/{id} unless an entry has a name
+}
+
+# Key under which workers ship replay counts in their stats reports
+REPORT_KEY = "replay"
+
+# Bytes read at a time while streaming HAR entries
+HAR_CHUNK_SIZE = 1 << 16
+
+HAR_ENTRIES = re.compile(r'"entries"\s*:\s*\[')
+
+# Common and combined log format: ... [10/Oct/2000:13:55:36 -0700] "GET /path HTTP/1.1" ...
+ACCESS_LOG_LINE = re.compile(r'\[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<target>\S+)(?: [^"]*)?"')
+ACCESS_LOG_TIME = "%d/%b/%Y:%H:%M:%S %z"
+
+# Path segments collapsed by `group_ids`: numbers, UUIDs and long hex strings
+ID_SEGMENT = re.compile(
+    r"^(?:\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,})$"
+)
+
+
+def replay_settings(scenario):
+    """
+    Parse the `replay` section of a scenario.
+
+    Returns:
+        Settings dict merged with DEFAULT_REPLAY_SETTINGS, or None when the
+        scenario does not replay a capture
+
+    Raises:
+        ValueError: If the file is missing or the settings are invalid
+    """
+    replay = scenario.get("replay")
+    if replay is None:
+        return None
+    settings = dict(DEFAULT_REPLAY_SETTINGS)
+    settings.update(replay)
+    if scenario.get("arrival") or any("rate" in req for req in scenario.get("requests") or []):
+        raise ValueError("A replay takes its timing from the capture; remove `arrival` and request rates")
+    if not settings["file"] or not os.path.isfile(settings["file"]):
+        raise ValueError(f"Replay capture not found: {settings['file']}")
+    if settings["format"] == "auto":
+        settings["format"] = capture_format(settings["file"])
+    if settings["format"] not in REPLAY_FORMATS:
+        raise ValueError(f"Unknown replay format '{settings['format']}', expected one of {REPLAY_FORMATS}")
+    if not isinstance(settings["speed"], (int, float)) or settings["speed"] <= 0:
+        raise ValueError(f"Invalid replay speed: {settings['speed']}")
+    settings["headers"] = [header.lower() for header in settings["headers"]]
+    return settings
+
+
+def capture_format(path):
+    """
+    Tell the capture format from the file extension.
+
+    Raises:
+        ValueError: If the extension is not a known capture format
+    """
+    stem, extension = os.path.splitext(path.lower())
+    if extension == ".gz":
+        extension = os.path.splitext(stem)[1]
+    if extension not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Cannot tell the format of replay capture {path}; set `replay.format`")
+    return FORMAT_EXTENSIONS[extension]
+
+
+def open_capture(path):
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+class ReplayEntry:
+    """
+    One captured request: when it was sent and what to send again.
+    """
+    __slots__ = ("timestamp", "method", "path", "body", "headers", "name")
+
+    def __init__(self, timestamp, method, path, body=None, headers=None, name=None):
+        self.timestamp = timestamp
+        self.method = method
+        self.path = path
+        self.body = body
+        self.headers = headers or {}
+        self.name = name
+
+
+def parse_timestamp(value):
+    """
+    Return a capture timestamp (Unix seconds or ISO 8601) as Unix seconds.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def request_path(url):
+    # Captures may log absolute URLs; the replay targets the configured host
+    if url.startswith("/"):
+        return url
+    parts = urlsplit(url)
+    return (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+
+def group_name(path):
+    """
+    Collapse ID-like path segments, so the stats get one row per route.
+    """
+    route = path.split("?", 1)[0]
+    return "/".join("{id}" if ID_SEGMENT.match(segment) else segment for segment in route.split("/"))
+
+
+def _kept_headers(pairs, names):
+    return {name: value for name, value in pairs if name.lower() in names}
+
+
+def parse_jsonl(line, settings):
+    record = json.loads(line)
+    body = record.get("body")
+    headers = _kept_headers((record.get("headers") or {}).items(), settings["headers"])
+    if body is not None and not isinstance(body, str):
+        body = json.dumps(body)
+        headers.setdefault("Content-Type", "application/json")
+    return ReplayEntry(
+        parse_timestamp(record["timestamp"]),
+        record.get("method", "GET").upper(),
+        request_path(record.get("path") or record["url"]),
+        body,
+        headers,
+        record.get("name"),
+    )
+
+
+def parse_access_log(line, settings):
+    match = ACCESS_LOG_LINE.search(line)
+    if match is None:
+        raise ValueError("not a common or combined log format line")
+    timestamp = datetime.strptime(match.group("time"), ACCESS_LOG_TIME).timestamp()
+    return ReplayEntry(timestamp, match.group("method"), request_path(match.group("target")))
+
+
+def parse_har_entry(entry, settings):
+    request = entry["request"]
+    post = request.get("postData") or {}
+    headers = _kept_headers(((h["name"], h["value"]) for h in request.get("headers") or []), settings["headers"])
+    return ReplayEntry(
+        parse_timestamp(entry["startedDateTime"]),
+        request["method"].upper(),
+        request_path(request["url"]),
+        post.get("text"),
+        headers,
+    )
+
+
+def har_entries(f, chunk_size=HAR_CHUNK_SIZE):
+    """
+    Yield the objects of a HAR file's `log.entries` array one at a time.
+
+    Only the entry being decoded is held in memory, so captures much larger
+    than RAM can be replayed. The read size doubles while an entry does not
+    fit, which keeps decoding large entries linear.
+
+    Raises:
+        ValueError: If the file ends inside the entries array
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while True:
+        match = HAR_ENTRIES.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        # Keep a tail, in case the key is split between two reads
+        buffer = buffer[-32:] + chunk
+
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+        if not buffer:
+            buffer = f.read(chunk_size)
+            if not buffer:
+                raise ValueError("HAR file ends inside log.entries")
+            continue
+        if buffer[0] == "]":
+            return
+        try:
+            entry, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = f.read(max(chunk_size, len(buffer)))
+            if not chunk:
+                raise ValueError("HAR file ends inside log.entries")
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield entry
+
+
+def read_capture(settings, index=0, count=1):
+    """
+    Lazily read the captured requests of one shard.
+
+    Records are split between shards by their position before they are
+    parsed, so each load generator only decodes its own share.
+
+    Yields:
+        ReplayEntry, or None for a record that could not be parsed
+    """
+    parse = {"jsonl": parse_jsonl, "access_log": parse_access_log, "har": parse_har_entry}[settings["format"]]
+    with open_capture(settings["file"]) as f:
+        if settings["format"] == "har":
+            records = har_entries(f)
+        else:
+            records = (line for line in f if line.strip())
+        for number, record in enumerate(records):
+            if number % count != index:
+                continue
+            try:
+                entry = parse(record, settings)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                yield None
+                continue
+            if entry.name is None:
+                entry.name = group_name(entry.path) if settings["group_ids"] else entry.path.split("?", 1)[0]
+            yield entry
+
+
+def capture_origin(settings):
+    """
+    Timestamp of the first parseable record of the whole capture; every
+    shard schedules relative to it, so shards stay aligned with each other.
+    """
+    for entry in read_capture(settings):
+        if entry is not None:
+            return entry.timestamp
+    raise ValueError(f"Replay capture has no parseable requests: {settings['file']}")
+
+
+class ReplaySchedule:
+    """
+    Send times of one process's share of a capture.
+
+    Entry i is due at `start + (timestamp_i - origin) / speed`. As with the
+    open-loop arrival schedule, users act as a pool of senders: a free user
+    claims the next entry, sleeps until it is due and sends it, so slow
+    responses do not delay later entries; when every user is busy the delay
+    shows up as send lag. The capture is read as entries are claimed.
+    Entries logged out of order are sent right after their predecessor.
+    """
+
+    def __init__(self, settings, index=0, count=1):
+        self.settings = settings
+        self.index, self.count = (index, count) if settings["shard"] else (0, 1)
+        self.speed = float(settings["speed"])
+        self.exhausted = False
+        self._entries = None
+        self._origin = None
+        self._started = None
+        self._pass_start = None
+        self._last_offset = 0.0
+        self._pass_sent = 0
+
+    def _open(self, pass_start):
+        self._entries = read_capture(self.settings, self.index, self.count)
+        self._pass_start = pass_start
+        self._last_offset = 0.0
+        self._pass_sent = 0
+
+    def _claim(self):
+        while True:
+            entry = next(self._entries, StopIteration)
+            if entry is None:
+                tracker.skipped += 1
+            elif entry is not StopIteration:
+                return entry
+            elif self.settings["loop"] and self._pass_sent:
+                # The next pass starts where this one ended
+                self._open(self._pass_start + self._last_offset / self.speed)
+            else:
+                return None
+
+    def next_entry(self):
+        """
+        Claim the next captured request, wait until it is due and return it.
+
+        Returns:
+            Tuple of (ReplayEntry, send lag in milliseconds), or (None, 0.0)
+            once the capture is exhausted
+        """
+        if self.exhausted:
+            return None, 0.0
+        if self._entries is None:
+            self._origin = capture_origin(self.settings)
+            self._started = time.time()
+            self._open(self._started)
+
+        # Claiming never yields to other greenlets, so no lock is needed
+        entry = self._claim()
+        if entry is None:
+            self.exhausted = True
+            return None, 0.0
+        offset = entry.timestamp - self._origin
+        if offset < self._last_offset:
+            tracker.reordered += 1
+            offset = self._last_offset
+        self._last_offset = offset
+        self._pass_sent += 1
+
+        intended = self._pass_start + offset / self.speed
+        delay = intended - time.time()
+        if delay > 0:
+            gevent.sleep(delay)
+        now = time.time()
+        lag_ms = max(now - intended, 0.0) * 1000
+        tracker.record_send(now, lag_ms, intended - self._started)
+        return entry, lag_ms
+
+
+@lru_cache(maxsize=None)
+def load_schedule(index, count):
+    """
+    Open the replay schedule once per process and share it with every user.
+    """
+    return ReplaySchedule(tracker.settings, index, count)
+
+
+class ReplayTracker:
+    """
+    Counts replayed requests and how late they were sent.
+
+    Workers ship interval counts with each stats report, and flag when their
+    share of the capture is done; the master (or a standalone process) ends
+    the test once every load generator finished and writes replay.json on
+    quit.
+    """
+
+    def __init__(self):
+        self.settings = None
+        self.finished = False
+        self.active_users = 0
+        self.reset()
+
+    def configure(self, scenario):
+        self.settings = replay_settings(scenario)
+        return self.settings
+
+    def reset(self):
+        self.sent = 0
+        self.skipped = 0
+        self.reordered = 0
+        self.lag = HdrHistogram()
+        self.scheduled_s = 0.0
+        self.first_send = None
+        self.last_send = None
+        self.final_lag_ms = 0.0
+
+    def record_send(self, now, lag_ms, scheduled_s):
+        self.sent += 1
+        self.lag.record_ms(lag_ms)
+        self.scheduled_s = max(self.scheduled_s, scheduled_s)
+        if self.first_send is None:
+            self.first_send = now
+        self.last_send = now
+        self.final_lag_ms = lag_ms
+
+    def state(self):
+        return {
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "reordered": self.reordered,
+            "lag": self.lag.encode(),
+            "scheduled_s": self.scheduled_s,
+            "first_send": self.first_send,
+            "last_send": self.last_send,
+            "final_lag_ms": self.final_lag_ms,
+            "finished": self.finished,
+        }
+
+    def drain_interval(self):
+        state = self.state()
+        # Counters restart every report; the span and final lag are kept
+        self.sent = self.skipped = self.reordered = 0
+        self.lag = HdrHistogram()
+        return state
+
+    def merge_state(self, state):
+        self.sent += state["sent"]
+        self.skipped += state["skipped"]
+        self.reordered += state["reordered"]
+        self.lag.merge(HdrHistogram.decode(state["lag"]))
+        self.scheduled_s = max(self.scheduled_s, state["scheduled_s"])
+        if state["first_send"] is not None:
+            self.first_send = min(self.first_send or state["first_send"], state["first_send"])
+            self.last_send = max(self.last_send or 0, state["last_send"])
+        if state["sent"]:
+            self.final_lag_ms = max(self.final_lag_ms, state["final_lag_ms"])
+
+    def summary(self, generators=1, finished=None):
+        """
+        Compare the actual send times with the capture's schedule.
+
+        Returns:
+            Dict with counts, the capture time covered, the scheduled vs
+            actual replay span and send lag percentiles
+        """
+        speed = float(self.settings["speed"])
+        actual_s = (self.last_send - self.first_send) if self.first_send is not None else 0.0
+        lag_ms = self.lag.percentiles_ms((50, 99))
+        return {
+            "file": self.settings["file"],
+            "format": self.settings["format"],
+            "speed": speed,
+            "generators": generators,
+            "completed": self.finished if finished is None else finished,
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "reordered": self.reordered,
+            "capture_span_s": self.scheduled_s * speed,
+            "scheduled_span_s": self.scheduled_s,
+            "actual_span_s": actual_s,
+            "span_drift_pct": (actual_s / self.scheduled_s - 1) * 100 if self.scheduled_s else 0.0,
+            "send_lag_p50_ms": lag_ms[50],
+            "send_lag_p99_ms": lag_ms[99],
+            "send_lag_max_ms": self.lag.max_value / 1000,
+            "final_drift_ms": self.final_lag_ms,
+        }
+
+    def save(self, reports_dir, generators=1, finished=None):
+        path = os.path.join(reports_dir, REPLAY_FILE)
+        with open(path, "w") as f:
+            json.dump(self.summary(generators, finished), f, indent=2)
+        return path
+
+
+tracker = ReplayTracker()
+
+logger = logging.getLogger(__name__)
+
+
+def finish(environment):
+    """
+    Mark this process's share of the capture as replayed. Workers report it
+    to the master; a standalone process ends the test itself.
+    """
+    if tracker.finished:
+        return
+    tracker.finished = True
+    if not isinstance(environment.runner, WorkerRunner):
+        logger.info("Replay of %s complete, stopping the test", tracker.settings["file"])
+        # Spawned, as the last user's greenlet is killed while the runner quits
+        gevent.spawn(environment.runner.quit)
+
+
+def replay_user_class(base):
+    """
+    Return a concrete user class that replays the configured capture on top
+    of the resolved client backend.
+    """
+
+    class ReplayUser(base):
+        abstract = False
+        # Pacing comes from the capture's timestamps
+        wait_time = constant(0)
+
+        def on_start(self):
+            super().on_start()
+            self.schedule = load_schedule(*generator_partition(self.environment))
+            self.base_url = self.host.rstrip("/")
+            tracker.active_users += 1
+
+        def on_stop(self):
+            tracker.active_users -= 1
+            schedule = getattr(self, "schedule", None)
+            if schedule is not None and schedule.exhausted and tracker.active_users <= 0:
+                finish(self.environment)
+
+        @task
+        def replay(self):
+            entry, send_lag = self.schedule.next_entry()
+            if entry is None:
+                raise StopUser()
+            self.client.request(
+                method=entry.method,
+                url=self.base_url + entry.path,
+                data=entry.body,
+                headers=self.request_headers(entry.headers),
+                name=entry.name,
+                context={SEND_LAG_KEY: send_lag},
+            )
+
+    return ReplayUser
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    if tracker.settings is None:
+        return
+    runner = environment.runner
+
+    reporting_workers = set()
+    finished_workers = set()
+
+    def on_test_start(**kw):
+        # A new run replays the capture from the start
+        load_schedule.cache_clear()
+        tracker.reset()
+        tracker.finished = False
+        reporting_workers.clear()
+        finished_workers.clear()
+
+    environment.events.test_start.add_listener(on_test_start)
+
+    if isinstance(runner, WorkerRunner):
+        def on_report_to_master(client_id, data, **kw):
+            data[REPORT_KEY] = tracker.drain_interval()
+
+        environment.events.report_to_master.add_listener(on_report_to_master)
+        return
+
+    if isinstance(runner, MasterRunner):
+        def on_worker_report(client_id, data, **kw):
+            state = data.get(REPORT_KEY)
+            if state is None:
+                return
+            tracker.merge_state(state)
+            reporting_workers.add(client_id)
+            if state["finished"]:
+                finished_workers.add(client_id)
+                if len(finished_workers) >= runner.worker_count:
+                    finish(environment)
+
+        environment.events.worker_report.add_listener(on_worker_report)
+
+    def on_quitting(**kw):
+        reports_dir = os.environ.get("API_PERF_REPORTS_DIR")
+        if reports_dir and tracker.first_send is not None:
+            tracker.save(reports_dir, len(reporting_workers) or 1)
+
+    environment.events.quitting.add_listener(on_quitting)
@@ -0,0 +1,255 @@
+import hashlib
+import json
+from json.decoder import scanstring
+
+from flows import compile_jsonpath
+
+# Failure categories, in the order the checks of a request run; the
+# cheapest run first, so a failed status never reads the body
+CHECK_CATEGORIES = ("status", "body_size", "header", "json", "body_hash")
+
+# JSON whitespace skipped between tokens
+_WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+# Returned by find_json() for a path that is not in the document
+MISSING = object()
+
+
+class CheckFailed(Exception):
+    """
+    A response failed one of its request's `checks`.
+
+    The message starts with the check category and never contains values
+    that vary per response (sizes, hashes, field values), so Locust groups
+    the failures of one check into a single row.
+    """
+
+    def __init__(self, category, detail):
+        super().__init__(f"{category}: {detail}")
+        self.category = category
+
+
+def _skip_whitespace(text, pos):
+    while pos < len(text) and text[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _skip_value(text, pos):
+    """
+    Return the position after the JSON value starting at `pos`.
+
+    Raises:
+        ValueError: If no valid value starts there
+    """
+    return _decoder.raw_decode(text, pos)[1]
+
+
+def _enter_object(text, pos, key):
+    """
+    Return the position of the value of `key` in the object at `pos`, or None.
+    """
+    pos = _skip_whitespace(text, pos + 1)
+    if text.startswith("}", pos):
+        return None
+    while True:
+        if not text.startswith('"', pos):
+            raise ValueError(f"Expecting property name at char {pos}")
+        name, pos = scanstring(text, pos + 1)
+        pos = _skip_whitespace(text, pos)
+        if not text.startswith(":", pos):
+            raise ValueError(f"Expecting ':' at char {pos}")
+        pos = _skip_whitespace(text, pos + 1)
+        if name == key:
+            return pos
+        pos = _skip_whitespace(text, _skip_value(text, pos))
+        if text.startswith(",", pos):
+            pos = _skip_whitespace(text, pos + 1)
+        elif text.startswith("}", pos):
+            return None
+        else:
+            raise ValueError(f"Expecting ',' or '}}' at char {pos}")
+
+
+def _enter_array(text, pos, index):
+    """
+    Return the position of item `index` (>= 0) of the array at `pos`, or None.
+    """
+    pos = _skip_whitespace(text, pos + 1)
+    if text.startswith("]", pos):
+        return None
+    for _ in range(index):
+        pos = _skip_whitespace(text, _skip_value(text, pos))
+        if text.startswith(",", pos):
+            pos = _skip_whitespace(text, pos + 1)
+        elif text.startswith("]", pos):
+            return None
+        else:
+            raise ValueError(f"Expecting ',' or ']' at char {pos}")
+    return pos
+
+
+def find_json(text, path):
+    """
+    Return the value at a compiled JSONPath of a JSON document without
+    decoding the whole document.
+
+    The walk scans object keys and skips the values before the target with
+    the C decoder, then decodes only the target value. Nothing after the
+    target is looked at, so `$[0].id` of a 2 MB array costs the first item.
+    Negative indices need the array's length, so the array they index is
+    decoded in full.
+
+    Args:
+        text: JSON document
+        path: Tuple of keys and indices from flows.compile_jsonpath()
+
+    Returns:
+        The decoded value, or MISSING if the path is not in the document
+
+    Raises:
+        ValueError: If the document is not valid JSON up to the target
+    """
+    pos = _skip_whitespace(text, 0)
+    for i, key in enumerate(path):
+        if isinstance(key, int) and key < 0:
+            value = _decoder.raw_decode(text, pos)[0]
+            try:
+                for rest in path[i:]:
+                    value = value[rest]
+            except (LookupError, TypeError):
+                return MISSING
+            return value
+        if isinstance(key, int):
+            pos = _enter_array(text, pos, key) if text.startswith("[", pos) else None
+        else:
+            pos = _enter_object(text, pos, key) if text.startswith("{", pos) else None
+        if pos is None:
+            return MISSING
+    return _decoder.raw_decode(text, pos)[0]
+
+
+class JsonCheck:
+    """
+    One `json` entry: a field that must be present, and optionally equal a value.
+    """
+    __slots__ = ("source", "path", "expected")
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict) or "path" not in spec:
+            raise ValueError(f"JSON checks need a path: {spec}")
+        self.source = spec["path"]
+        self.path = compile_jsonpath(spec["path"])
+        self.expected = spec.get("equals", MISSING)
+
+    def failure(self, text):
+        value = find_json(text, self.path)
+        if value is MISSING:
+            return CheckFailed("json", f"{self.source} missing")
+        # True == 1 and False == 0 in Python, but not in JSON
+        if self.expected is not MISSING and (
+                value != self.expected or isinstance(value, bool) != isinstance(self.expected, bool)):
+            return CheckFailed("json", f"{self.source} is not {self.expected!r}")
+        return None
+
+
+class ResponseChecks:
+    """
+    The compiled `checks` of one scenario request.
+
+    Without a `status` check, responses of 400 and above are left to the
+    client backend to fail as usual, and the other checks only run on
+    successful responses.
+    """
+    __slots__ = ("statuses", "_expected_status", "max_body_bytes", "headers", "json", "body_sha256")
+
+    def __init__(self, statuses=None, max_body_bytes=None, headers=(), json_checks=(), body_sha256=None):
+        self.statuses = frozenset(statuses) if statuses else None
+        self._expected_status = " or ".join(map(str, sorted(self.statuses or ())))
+        self.max_body_bytes = max_body_bytes
+        self.headers = tuple(headers)
+        self.json = tuple(json_checks)
+        self.body_sha256 = body_sha256.lower() if body_sha256 else None
+
+    def evaluate(self, status, headers, content):
+        """
+        Run the checks against one response, cheapest first.
+
+        Args:
+            status: Response status code; 0 if no response arrived
+            headers: Case-insensitive response headers
+            content: Response body bytes
+
+        Returns:
+            CheckFailed for the first failed check, or None
+        """
+        if status == 0:
+            return None
+        if self.statuses is None:
+            if status >= 400:
+                return None
+        elif status not in self.statuses:
+            return CheckFailed("status", f"got {status}, expected {self._expected_status}")
+        content = content or b""
+        if self.max_body_bytes is not None and len(content) > self.max_body_bytes:
+            return CheckFailed("body_size", f"over {self.max_body_bytes} bytes")
+        for name in self.headers:
+            if name not in headers:
+                return CheckFailed("header", f"missing {name}")
+        if self.json:
+            try:
+                text = content.decode("utf-8")
+                for check in self.json:
+                    failure = check.failure(text)
+                    if failure is not None:
+                        return failure
+            except ValueError:
+                return CheckFailed("json", "body is not valid JSON")
+        if self.body_sha256 is not None and hashlib.sha256(content).hexdigest() != self.body_sha256:
+            return CheckFailed("body_hash", "sha256 mismatch")
+        return None
+
+    def apply(self, response):
+        """
+        Mark a response of request(catch_response=True) failed or successful.
+
+        Returns:
+            CheckFailed, or None if the checks passed
+        """
+        failure = self.evaluate(response.status_code, response.headers, response.content)
+        if failure is not None:
+            response.failure(failure)
+        elif self.statuses is not None and response.status_code in self.statuses:
+            # An expected status of 400 or above is a success
+            response.success()
+        return failure
+
+
+def compile_checks(checks):
+    """
+    Compile a request's `checks` mapping into ResponseChecks, or None.
+
+    Raises:
+        ValueError: For an invalid JSONPath or hash
+    """
+    if not checks:
+        return None
+    status = checks.get("status")
+    if isinstance(status, int):
+        status = [status]
+    body_sha256 = checks.get("body_sha256")
+    if body_sha256 is not None:
+        try:
+            if len(bytes.fromhex(body_sha256)) != hashlib.sha256().digest_size:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"body_sha256 must be 64 hex digits: {body_sha256}") from None
+    return ResponseChecks(
+        statuses=status,
+        max_body_bytes=checks.get("max_body_bytes"),
+        headers=checks.get("headers") or (),
+        json_checks=[JsonCheck(spec) for spec in checks.get("json") or ()],
+        body_sha256=body_sha256,
+    )
@@ -0,0 +1,72 @@
+import logging
+import os
+import time
+
+from gevent.threadpool import ThreadPool
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+from base_api_user import load_config
+from metrics.artifacts import SAMPLES_DIR
+from metrics.sample_log import DEFAULT_FLUSH_BYTES, SAMPLE_SUFFIX, SampleLogWriter
+
+logger = logging.getLogger(__name__)
+
+
+def sample_log_settings(config):
+    """
+    Resolve the opt-in `sample_log` settings; $API_PERF_RECORD_SAMPLES=1 enables it.
+    """
+    settings = {"enabled": False, "flush_bytes": DEFAULT_FLUSH_BYTES}
+    settings.update((config or {}).get("sample_log") or {})
+    if os.environ.get("API_PERF_RECORD_SAMPLES") == "1":
+        settings["enabled"] = True
+    return settings
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    # Only processes that generate load have samples to record
+    if isinstance(environment.runner, MasterRunner):
+        return
+
+    settings = sample_log_settings(load_config())
+    if not settings["enabled"]:
+        return
+
+    reports_dir = os.environ.get("API_PERF_REPORTS_DIR")
+    if not reports_dir:
+        logger.warning("sample_log is enabled but API_PERF_REPORTS_DIR is not set; not recording")
+        return
+
+    directory = os.path.join(reports_dir, SAMPLES_DIR)
+    os.makedirs(directory, exist_ok=True)
+    node = f"worker-{os.getpid()}" if isinstance(environment.runner, WorkerRunner) else "local"
+
+    # A single native thread keeps disk writes ordered and off the gevent loop
+    pool = ThreadPool(1)
+    writer = SampleLogWriter(
+        os.path.join(directory, node + SAMPLE_SUFFIX),
+        flush_bytes=settings["flush_bytes"],
+        submit=pool.spawn
+    )
+
+    def on_request(request_type, name, response_time, response_length,
+                   response=None, exception=None, start_time=None, **kw):
+        writer.record(
+            start_time or time.time(),
+            request_type,
+            name,
+            getattr(response, "status_code", 0) or 0,
+            response_time or 0,
+            response_length or 0,
+            exception is not None
+        )
+
+    def on_quitting(**kw):
+        writer.close()
+        pool.kill()
+        logger.info("Wrote %d request samples to %s", writer.count, writer.path)
+
+    environment.events.request.add_listener(on_request)
+    environment.events.quitting.add_listener(on_quitting)
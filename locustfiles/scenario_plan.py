@@ -0,0 +1,230 @@
+import random
+from functools import lru_cache
+
+from config.loader import load_scenario
+from feeders import compile_feeders
+from flows import compile_extractors, compile_think_time
+from response_checks import compile_checks
+from templating import RequestTemplate, compile_payload, compile_url, compile_value
+
+
+class RequestSpec:
+    """
+    A single scenario request, compiled once and shared read-only by all users.
+
+    Static requests carry their final url, body and headers. Templated ones
+    (placeholders or a feeder) also carry a RequestTemplate that is rendered
+    per request by resolve(). `checks` are the compiled response checks,
+    or None.
+    """
+    __slots__ = ("name", "method", "url", "body", "headers", "weight", "template", "checks")
+
+    def __init__(self, name, method, url, body, headers, weight, template=None, checks=None):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.body = body
+        self.headers = headers
+        self.weight = weight
+        self.template = template
+        self.checks = checks
+
+    def resolve(self, variables):
+        """
+        Return (url, body, headers) for one request.
+        """
+        if self.template is None:
+            return self.url, self.body, self.headers
+        return self.template.render(variables)
+
+    def __repr__(self):
+        return f"RequestSpec({self.method} {self.url!r}, name={self.name!r})"
+
+
+class FlowStep:
+    """
+    One request of a flow plus what to extract from its response and how
+    long to think afterwards.
+    """
+    __slots__ = ("request", "extractors", "think_time")
+
+    def __init__(self, request, extractors, think_time):
+        self.request = request
+        self.extractors = extractors
+        self.think_time = think_time
+
+
+class FlowSpec:
+    """
+    An ordered multi-step user journey, selected by weight like a request.
+    """
+    __slots__ = ("name", "steps", "weight")
+
+    def __init__(self, name, steps, weight):
+        self.name = name
+        self.steps = tuple(steps)
+        self.weight = weight
+
+    def __repr__(self):
+        return f"FlowSpec({self.name!r}, steps={len(self.steps)})"
+
+
+class AliasSampler:
+    """
+    Weighted sampler using Vose's alias method: O(n) setup, O(1) per draw.
+    """
+    __slots__ = ("_n", "_prob", "_alias", "_random")
+
+    def __init__(self, weights, rng=None):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("At least one request must have a positive weight")
+
+        scaled = [w * n / total for w in weights]
+        prob = [0.0] * n
+        alias = [0] * n
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        # Leftovers are 1.0 up to floating point error
+        for i in large + small:
+            prob[i] = 1.0
+            alias[i] = i
+
+        self._n = n
+        self._prob = tuple(prob)
+        self._alias = tuple(alias)
+        self._random = (rng or random).random
+
+    def sample(self):
+        """
+        Return the index of a weighted-random entry using a single draw.
+        """
+        u = self._random() * self._n
+        i = int(u)
+        return i if u - i < self._prob[i] else self._alias[i]
+
+
+class ScenarioPlan:
+    """
+    Immutable, pre-compiled form of a scenario YAML file.
+
+    Single requests and multi-step flows share one weighted selection.
+    """
+    __slots__ = ("name", "requests", "flows", "_items", "_sampler")
+
+    def __init__(self, name, requests, flows=()):
+        self.name = name
+        self.requests = tuple(requests)
+        self.flows = tuple(flows)
+        self._items = self.requests + self.flows
+        self._sampler = AliasSampler([item.weight for item in self._items])
+
+    def choose(self):
+        """
+        Pick the next request or flow according to the configured weights.
+        """
+        return self._items[self._sampler.sample()]
+
+
+def compile_request(req, host, feeders=None):
+    """
+    Compile one raw scenario request dict into a RequestSpec.
+
+    Raises:
+        ValueError: If a required key is missing, the weight is invalid,
+            the feeder is not defined or a check is invalid
+    """
+    for key in ["name", "method", "endpoint"]:
+        if key not in req:
+            raise ValueError(f"Scenario request is missing required key: {key}")
+
+    weight = req.get("weight", 1)
+    if not isinstance(weight, (int, float)) or weight < 0:
+        raise ValueError(f"Invalid weight for request '{req['name']}': {weight}")
+
+    feeder = None
+    if req.get("feeder") is not None:
+        feeder = (feeders or {}).get(req["feeder"])
+        if feeder is None:
+            raise ValueError(f"Request '{req['name']}' uses undefined feeder: {req['feeder']}")
+
+    try:
+        checks = compile_checks(req.get("checks"))
+    except ValueError as e:
+        raise ValueError(f"Invalid checks for request '{req['name']}': {e}") from None
+
+    headers = {"Content-Type": "application/json"}
+    headers.update({name: compile_value(str(value)) for name, value in (req.get("headers") or {}).items()})
+    url = compile_url(host.rstrip("/") + req["endpoint"])
+    body = compile_payload(req.get("payload"))
+
+    template = None
+    if feeder is not None or any(not isinstance(v, (str, bytes, type(None))) for v in (url, body, *headers.values())):
+        template = RequestTemplate(url, headers, body, feeder)
+
+    return RequestSpec(
+        name=req["name"],
+        method=req["method"].upper(),
+        url=url,
+        body=body,
+        headers=headers,
+        weight=weight,
+        template=template,
+        checks=checks
+    )
+
+
+def compile_flow(flow, host, feeders=None):
+    """
+    Compile one raw scenario flow dict into a FlowSpec.
+
+    Raises:
+        ValueError: If the flow has no name or steps, or a step is invalid
+    """
+    if "name" not in flow or not flow.get("steps"):
+        raise ValueError("Scenario flows need a name and at least one step")
+
+    weight = flow.get("weight", 1)
+    if not isinstance(weight, (int, float)) or weight < 0:
+        raise ValueError(f"Invalid weight for flow '{flow['name']}': {weight}")
+
+    default_think_time = flow.get("think_time")
+    steps = []
+    for step in flow["steps"]:
+        steps.append(FlowStep(
+            request=compile_request(step, host, feeders),
+            extractors=compile_extractors(step.get("extract")),
+            think_time=compile_think_time(step.get("think_time", default_think_time))
+        ))
+    return FlowSpec(flow["name"], steps, weight)
+
+
+def compile_scenario(scenario, host):
+    """
+    Compile a parsed scenario dict into a ScenarioPlan for the given host.
+    """
+    if not scenario or not (scenario.get("requests") or scenario.get("flows")):
+        raise ValueError("Scenario must define at least one request or flow")
+
+    feeders = compile_feeders(scenario)
+    requests = [compile_request(req, host, feeders) for req in scenario.get("requests") or []]
+    flows = [compile_flow(flow, host, feeders) for flow in scenario.get("flows") or []]
+    return ScenarioPlan(scenario.get("name", ""), requests, flows)
+
+
+@lru_cache(maxsize=None)
+def load_plan(path, host):
+    """
+    Load and compile a scenario file once per process.
+    """
+    return compile_scenario(load_scenario(path), host)
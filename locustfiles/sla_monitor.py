@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+
+import gevent
+from locust import events
+from locust.runners import WorkerRunner
+from locust.stats import StatsEntry, calculate_response_time_percentile, diff_response_time_dicts
+
+from base_api_user import load_config
+from config.loader import load_thresholds
+from metrics.artifacts import FLOW_REQUEST_TYPE
+from metrics.sla_rules import SlaRules, describe, passes, percentile_of, rule_checks
+
+# Process exit code used when the run is aborted for an SLA breach
+SLA_ABORT_EXIT_CODE = 3
+
+# Defaults for the `sla_monitor` section of config/env.yaml
+DEFAULT_MONITOR_SETTINGS = {
+    "enabled": False,
+    "window": 10,
+    "breach_duration": 15,
+    "check_interval": 1,
+    "min_requests": 20,
+}
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointWindow:
+    """
+    Rolling view of one endpoint's stats over the last `window` seconds.
+
+    Keeps periodic snapshots of Locust's cumulative StatsEntry counters and
+    diffs the newest against the oldest to get window-only numbers.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.snapshots = deque()
+
+    def update(self, entry, now):
+        self.snapshots.append((
+            now,
+            entry.num_requests - entry.num_none_requests,
+            entry.num_failures,
+            dict(entry.response_times),
+        ))
+        while len(self.snapshots) > 1 and now - self.snapshots[1][0] >= self.window:
+            self.snapshots.popleft()
+
+    def stats(self, percentiles=(95,)):
+        """
+        Return (requests, failure rate %, {percentile: latency}) for the window.
+        """
+        if len(self.snapshots) < 2:
+            return 0, 0.0, {p: 0 for p in percentiles}
+        _, old_requests, old_failures, old_times = self.snapshots[0]
+        _, requests, failures, times = self.snapshots[-1]
+        count = requests - old_requests
+        if count <= 0:
+            return 0, 0.0, {p: 0 for p in percentiles}
+        window_times = diff_response_time_dicts(times, old_times)
+        latencies = {
+            p: calculate_response_time_percentile(window_times, count, p / 100) for p in percentiles
+        }
+        return count, (failures - old_failures) / count * 100, latencies
+
+
+def request_total(stats):
+    """
+    Return the aggregate StatsEntry of the single requests.
+
+    Locust's stats.total also counts every flow transaction on top of its
+    steps' requests; runner/validate.py judges the aggregate without them,
+    so the rolling checks do too.
+    """
+    total = StatsEntry(stats, "Aggregated", "")
+    for entry in stats.entries.values():
+        if entry.method != FLOW_REQUEST_TYPE:
+            total.extend(entry)
+    return total
+
+
+def endpoint_rule(rules, entry):
+    # Flows only get rules that name or match them, not the request defaults
+    return rules.for_endpoint(entry.name, defaults=entry.method != FLOW_REQUEST_TYPE)
+
+
+def window_breaches(name, rule, error_rate, latencies):
+    """
+    Check a window against the percentile and error-rate rules of an endpoint.
+
+    max_ms, min_rps and apdex describe a whole run and are left to
+    runner/validate.py.
+
+    Returns:
+        Dict mapping metric to breach message
+    """
+    breaches = {}
+    for metric, threshold in rule_checks(rule):
+        percentile = percentile_of(metric)
+        if percentile is not None:
+            actual = latencies[percentile]
+        elif metric == "error_rate":
+            actual = error_rate
+        else:
+            continue
+        if not passes(metric, actual, threshold):
+            breaches[metric] = describe(name, metric, actual, threshold)
+    return breaches
+
+
+def rule_percentiles(rule):
+    return tuple(p for p in map(percentile_of, rule) if p is not None)
+
+
+class SlaMonitor:
+    """
+    Continuously evaluates thresholds/sla.yaml against rolling stats and
+    aborts the run once a breach has persisted for `breach_duration` seconds.
+    """
+
+    def __init__(self, environment, rules, settings):
+        self.environment = environment
+        self.rules = rules
+        self.settings = settings
+        self.windows = {}
+        self.breach_started = {}
+        self.greenlet = None
+
+    def check(self, now):
+        """
+        Update rolling windows and return the currently breached rules.
+
+        Returns:
+            Dict mapping (endpoint, metric) to a human readable description
+        """
+        breaches = {}
+        stats = self.environment.stats
+        targets = [(entry, endpoint_rule(self.rules, entry)) for entry in stats.entries.values()]
+        targets.append((request_total(stats), self.rules.aggregate))
+        for entry, rule in targets:
+            if not rule:
+                continue
+            window = self.windows.setdefault(entry.name, EndpointWindow(self.settings["window"]))
+            window.update(entry, now)
+
+            count, error_rate, latencies = window.stats(rule_percentiles(rule))
+            if count < self.settings["min_requests"]:
+                continue
+            for metric, message in window_breaches(entry.name, rule, error_rate, latencies).items():
+                breaches[(entry.name, metric)] = message
+        return breaches
+
+    def evaluate(self):
+        """
+        Run one check and abort the test if any breach has held long enough.
+        """
+        now = time.time()
+        breaches = self.check(now)
+
+        # Breaches must be continuous; a passing check resets the timer
+        self.breach_started = {key: self.breach_started.get(key, now) for key in breaches}
+
+        sustained = [
+            breaches[key] for key, started in self.breach_started.items()
+            if now - started >= self.settings["breach_duration"]
+        ]
+        if sustained:
+            self.abort(sustained)
+            return True
+        return False
+
+    def abort(self, violations):
+        logger.error("SLA breach held for %ss, aborting run:", self.settings["breach_duration"])
+        for violation in violations:
+            logger.error("  - %s", violation)
+
+        reports_dir = os.environ.get("API_PERF_REPORTS_DIR")
+        if reports_dir:
+            with open(f"{reports_dir}/sla_abort.json", "w") as f:
+                json.dump({
+                    "timestamp": time.time(),
+                    "breach_duration": self.settings["breach_duration"],
+                    "violations": violations,
+                }, f, indent=2)
+
+        # quit() fires test_stop; detach first so stop() doesn't kill this greenlet
+        self.greenlet = None
+        self.environment.process_exit_code = SLA_ABORT_EXIT_CODE
+        self.environment.runner.quit()
+
+    def run(self):
+        while True:
+            gevent.sleep(self.settings["check_interval"])
+            if self.evaluate():
+                return
+
+    def start(self):
+        self.greenlet = gevent.spawn(self.run)
+
+    def stop(self):
+        if self.greenlet is not None:
+            self.greenlet.kill(block=False)
+            self.greenlet = None
+
+
+def monitor_settings(config):
+    settings = dict(DEFAULT_MONITOR_SETTINGS)
+    settings.update((config or {}).get("sla_monitor") or {})
+    return settings
+
+
+@events.init.add_listener
+def on_init(environment, **kwargs):
+    # Stats are aggregated on the master, so workers don't evaluate anything
+    if isinstance(environment.runner, WorkerRunner):
+        return
+
+    settings = monitor_settings(load_config())
+    if not settings["enabled"]:
+        return
+    if getattr(environment.shape_class, "evaluates_sla", False):
+        logger.info("Streaming SLA monitor disabled: the load shape evaluates SLAs itself")
+        return
+
+    monitor = SlaMonitor(environment, SlaRules(load_thresholds()), settings)
+    environment.events.test_start.add_listener(lambda **kw: monitor.start())
+    environment.events.test_stop.add_listener(lambda **kw: monitor.stop())
@@ -0,0 +1,188 @@
+import json
+import re
+from urllib.parse import quote
+
+# `{name}` placeholders; names may contain dots, e.g. `{user.id}`
+PLACEHOLDER = re.compile(r"\{([A-Za-z_][\w.]*)\}")
+
+# A JSON string that is exactly one placeholder, e.g. "{id}": replaced by the
+# JSON encoding of the value so numbers, booleans and objects keep their type
+WHOLE_STRING_PLACEHOLDER = re.compile(r'"\{([A-Za-z_][\w.]*)\}"')
+
+
+def has_placeholders(value):
+    """
+    Return True if a string, or any string nested in a dict/list, is templated.
+    """
+    if isinstance(value, str):
+        return PLACEHOLDER.search(value) is not None
+    if isinstance(value, dict):
+        return any(has_placeholders(k) or has_placeholders(v) for k, v in value.items())
+    if isinstance(value, list):
+        return any(has_placeholders(v) for v in value)
+    return False
+
+
+class Deferred:
+    """
+    A template value computed on first use, e.g. extracted from a response.
+    """
+    __slots__ = ("_value", "_resolved")
+
+    def __init__(self):
+        self._resolved = False
+
+    def compute(self):
+        raise NotImplementedError
+
+    def resolve(self):
+        if not self._resolved:
+            self._value = self.compute()
+            self._resolved = True
+        return self._value
+
+
+def _lookup(values, name):
+    try:
+        value = values[name]
+    except KeyError:
+        raise KeyError(f"Template variable '{name}' is not defined") from None
+    return value.resolve() if isinstance(value, Deferred) else value
+
+
+class Template:
+    """
+    A string template compiled once into literal and placeholder parts.
+
+    Rendering is a single join over precomputed parts; values are passed
+    through `encode` (e.g. URL quoting) before being inserted.
+    """
+    __slots__ = ("source", "fields", "_parts", "_encode")
+
+    def __init__(self, source, encode=str):
+        self.source = source
+        parts = []
+        fields = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source):
+            parts.append(source[position:match.start()])
+            parts.append(None)
+            fields.append(match.group(1))
+            position = match.end()
+        parts.append(source[position:])
+        self._parts = tuple(parts)
+        self.fields = tuple(fields)
+        self._encode = encode
+
+    def render(self, values):
+        encode = self._encode
+        fields = iter(self.fields)
+        return "".join(
+            part if part is not None else encode(_lookup(values, next(fields)))
+            for part in self._parts
+        )
+
+
+def _quote_path_value(value):
+    return quote(str(value), safe="/")
+
+
+def _json_fragment(value):
+    # Value inserted inside an existing JSON string: escape, drop the quotes
+    return json.dumps(str(value))[1:-1]
+
+
+class JsonTemplate:
+    """
+    A JSON payload serialized once with its placeholders left in place.
+
+    The serialized text is split on the placeholders at compile time, so a
+    render only JSON-encodes the substituted values and joins the pieces;
+    the payload structure itself is never re-serialized.
+    """
+    __slots__ = ("fields", "_parts", "_whole")
+
+    def __init__(self, payload):
+        text = json.dumps(payload, separators=(",", ":"))
+        parts = []
+        fields = []
+        whole = []
+        position = 0
+        pattern = re.compile(f"{WHOLE_STRING_PLACEHOLDER.pattern}|{PLACEHOLDER.pattern}")
+        for match in pattern.finditer(text):
+            parts.append(text[position:match.start()])
+            parts.append(None)
+            fields.append(match.group(1) or match.group(2))
+            whole.append(match.group(1) is not None)
+            position = match.end()
+        parts.append(text[position:])
+        self._parts = tuple(parts)
+        self.fields = tuple(fields)
+        self._whole = tuple(whole)
+
+    def render(self, values):
+        """
+        Return the rendered payload as UTF-8 bytes.
+        """
+        out = []
+        index = 0
+        for part in self._parts:
+            if part is not None:
+                out.append(part)
+                continue
+            value = _lookup(values, self.fields[index])
+            out.append(json.dumps(value, separators=(",", ":")) if self._whole[index] else _json_fragment(value))
+            index += 1
+        return "".join(out).encode("utf-8")
+
+
+class RequestTemplate:
+    """
+    Compiled URL, header and body templates of one scenario request.
+    """
+    __slots__ = ("url", "headers", "body", "feeder")
+
+    def __init__(self, url, headers, body, feeder=None):
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.feeder = feeder
+
+    def render(self, variables):
+        """
+        Fill the templates from the next feeder row and the user's variables.
+
+        Returns:
+            Tuple of (url, body bytes or None, headers dict)
+        """
+        values = variables
+        if self.feeder is not None:
+            row = self.feeder.row_for(variables)
+            values = {**row, **variables} if variables else row
+        headers = {name: value.render(values) if isinstance(value, Template) else value
+                   for name, value in self.headers.items()}
+        url = self.url.render(values) if isinstance(self.url, Template) else self.url
+        body = self.body.render(values) if isinstance(self.body, JsonTemplate) else self.body
+        return url, body, headers
+
+
+def compile_url(url):
+    """
+    Compile a URL template; substituted values are percent-encoded.
+    """
+    return Template(url, encode=_quote_path_value) if has_placeholders(url) else url
+
+
+def compile_value(value):
+    return Template(value) if has_placeholders(value) else value
+
+
+def compile_payload(payload):
+    """
+    Compile a JSON payload, or serialize it once if it has no placeholders.
+    """
+    if payload is None:
+        return None
+    if has_placeholders(payload):
+        return JsonTemplate(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,37 @@
+# Names shared by the locustfiles that write run artifacts to the report
+# folder and the runner scripts that read them back
+
+# Per-endpoint latency histograms (locustfiles/latency_recorder.py)
+HISTOGRAM_FILE = "latency_histograms.hdr"
+
+# Latency measured from the intended send time in open-loop (arrival rate) mode
+INTENDED_HISTOGRAM_FILE = "latency_histograms_intended.hdr"
+
+# Response times of failed requests only; their counts are the failure counts
+FAILED_HISTOGRAM_FILE = "latency_histograms_failed.hdr"
+
+# Closed-loop latency with the samples hidden by coordinated omission back-filled
+CORRECTED_HISTOGRAM_FILE = "latency_histograms_corrected.hdr"
+
+# Phases timed per request by locustfiles/connection_policy.py, with one
+# histogram file each
+CONNECTION_PHASES = ("connect", "tls", "tls_resumed", "ttfb")
+PHASE_HISTOGRAM_FILES = {phase: f"latency_histograms_{phase}.hdr" for phase in CONNECTION_PHASES}
+
+# Open-loop arrival summary (locustfiles/arrival_rate.py)
+ARRIVAL_FILE = "arrival_rate.json"
+
+# Replayed requests and drift from the capture's schedule (locustfiles/replay.py)
+REPLAY_FILE = "replay.json"
+
+# Knee-search result (locustfiles/load_shapes.py)
+CAPACITY_FILE = "capacity.json"
+
+# Load generator CPU, memory and loop lag (locustfiles/generator_monitor.py)
+GENERATOR_HEALTH_FILE = "generator_health.json"
+
+# Sub-folder holding the opt-in per-request sample logs (locustfiles/sample_recorder.py)
+SAMPLES_DIR = "samples"
+
+# Request type under which whole-flow transaction timings are reported
+FLOW_REQUEST_TYPE = "FLOW"
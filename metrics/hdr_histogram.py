@@ -0,0 +1,348 @@
+import math
+import struct
+import zlib
+
+# Values are recorded as integer microseconds
+MICROS_PER_MS = 1000
+
+# Defaults: 1us resolution up to one hour, 3 significant digits (0.1% error)
+DEFAULT_HIGHEST_TRACKABLE = 3_600_000_000
+DEFAULT_SIGNIFICANT_FIGURES = 3
+
+_ENCODING_MAGIC = b"HDR1"
+_ENCODING_HEADER = struct.Struct("<4sBQQQQ")
+
+_FILE_MAGIC = b"APHGRAM1"
+_RECORD_HEADER = struct.Struct("<HI")
+
+
+def _encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varints(data):
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = 0
+            shift = 0
+
+
+class HdrHistogram:
+    """
+    High Dynamic Range histogram of latencies with fixed relative precision.
+
+    Follows the HdrHistogram bucket layout: each power-of-two range is split
+    into the same number of linear sub-buckets, so every recorded value is
+    kept to `significant_figures` digits while memory stays constant no
+    matter how many samples are recorded. Histograms with the same settings
+    merge losslessly, which is how per-worker and per-interval histograms
+    are combined into run totals.
+    """
+
+    def __init__(self, highest_trackable=DEFAULT_HIGHEST_TRACKABLE,
+                 significant_figures=DEFAULT_SIGNIFICANT_FIGURES):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+
+        self.highest_trackable = highest_trackable
+        self.significant_figures = significant_figures
+
+        largest_single_unit = 2 * 10 ** significant_figures
+        sub_bucket_count_magnitude = math.ceil(math.log2(largest_single_unit))
+        self._sub_bucket_half_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self._sub_bucket_count = 1 << (self._sub_bucket_half_magnitude + 1)
+        self._sub_bucket_half_count = self._sub_bucket_count // 2
+        self._sub_bucket_mask = self._sub_bucket_count - 1
+
+        bucket_count = 1
+        smallest_untrackable = self._sub_bucket_count
+        while smallest_untrackable <= highest_trackable:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self._counts_len = (bucket_count + 1) * self._sub_bucket_half_count
+
+        self.counts = [0] * self._counts_len
+        self.total_count = 0
+        self.min_value = 0
+        self.max_value = 0
+        self._total_value = 0
+
+    def _index_for(self, value):
+        bucket_index = (value | self._sub_bucket_mask).bit_length() - (self._sub_bucket_half_magnitude + 1)
+        sub_bucket_index = value >> bucket_index
+        return ((bucket_index + 1) << self._sub_bucket_half_magnitude) + sub_bucket_index - self._sub_bucket_half_count
+
+    def _value_range_for(self, index):
+        """
+        Return (lowest, highest) values that map to a counts index.
+        """
+        bucket_index = (index >> self._sub_bucket_half_magnitude) - 1
+        sub_bucket_index = (index & (self._sub_bucket_half_count - 1)) + self._sub_bucket_half_count
+        if bucket_index < 0:
+            sub_bucket_index -= self._sub_bucket_half_count
+            bucket_index = 0
+        lowest = sub_bucket_index << bucket_index
+        return lowest, lowest + (1 << bucket_index) - 1
+
+    def record_value(self, value, count=1):
+        """
+        Record an integer value (microseconds) `count` times.
+
+        Values above highest_trackable are clamped to it.
+        """
+        if value < 0:
+            raise ValueError(f"Cannot record negative value: {value}")
+        if value > self.highest_trackable:
+            value = self.highest_trackable
+
+        self.counts[self._index_for(value)] += count
+        if self.total_count == 0 or value < self.min_value:
+            self.min_value = value
+        if value > self.max_value:
+            self.max_value = value
+        self.total_count += count
+        self._total_value += value * count
+
+    def record_ms(self, response_time):
+        """
+        Record a Locust response time given in (possibly fractional) milliseconds.
+        """
+        self.record_value(int(response_time * MICROS_PER_MS))
+
+    def record_corrected_value(self, value, expected_interval):
+        """
+        Record an integer value (microseconds) and back-fill the values
+        coordinated omission hid, like HdrHistogram's
+        recordValueWithExpectedInterval.
+
+        A value longer than the expected interval between samples means
+        the samples due meanwhile were never taken; they are recorded as
+        value - interval, value - 2 * interval, ... down to the interval.
+
+        Returns:
+            Number of back-filled values
+        """
+        self.record_value(value)
+        if expected_interval <= 0:
+            return 0
+        value = min(value, self.highest_trackable)
+        backfilled = 0
+        missing = value - expected_interval
+        while missing >= expected_interval:
+            self.record_value(missing)
+            missing -= expected_interval
+            backfilled += 1
+        return backfilled
+
+    def merge(self, other):
+        """
+        Add all counts from another histogram with the same settings.
+        """
+        if (other.highest_trackable, other.significant_figures) != (
+                self.highest_trackable, self.significant_figures):
+            raise ValueError("Cannot merge histograms with different settings")
+        if other.total_count == 0:
+            return self
+
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        if self.total_count == 0 or other.min_value < self.min_value:
+            self.min_value = other.min_value
+        self.max_value = max(self.max_value, other.max_value)
+        self.total_count += other.total_count
+        self._total_value += other._total_value
+        return self
+
+    def copy(self):
+        clone = HdrHistogram(self.highest_trackable, self.significant_figures)
+        return clone.merge(self)
+
+    def reset(self):
+        self.counts = [0] * self._counts_len
+        self.total_count = 0
+        self.min_value = 0
+        self.max_value = 0
+        self._total_value = 0
+
+    @property
+    def mean(self):
+        return self._total_value / self.total_count if self.total_count else 0.0
+
+    def value_at_percentile(self, percentile):
+        """
+        Return the value (microseconds) at or below which `percentile` percent
+        of recorded values fall.
+        """
+        if self.total_count == 0:
+            return 0
+        percentile = min(max(percentile, 0.0), 100.0)
+        target = max(math.ceil(percentile / 100.0 * self.total_count), 1)
+
+        running = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                running += count
+                if running >= target:
+                    highest = self._value_range_for(index)[1]
+                    return min(highest, self.max_value)
+        return self.max_value
+
+    def values_at_percentiles(self, percentiles):
+        """
+        Return {percentile: value in microseconds} in a single pass over counts.
+        """
+        result = {}
+        if self.total_count == 0:
+            return {p: 0 for p in percentiles}
+
+        targets = sorted(
+            (max(math.ceil(min(max(p, 0.0), 100.0) / 100.0 * self.total_count), 1), p)
+            for p in percentiles
+        )
+        running = 0
+        pending = iter(targets)
+        target, percentile = next(pending)
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            running += count
+            while running >= target:
+                result[percentile] = min(self._value_range_for(index)[1], self.max_value)
+                try:
+                    target, percentile = next(pending)
+                except StopIteration:
+                    return result
+        for _, percentile in targets:
+            result.setdefault(percentile, self.max_value)
+        return result
+
+    def count_at_or_below(self, value):
+        """
+        Return how many recorded values are at or below `value` (microseconds),
+        to the histogram's precision.
+        """
+        if self.total_count == 0 or value < self.min_value:
+            return 0
+        if value >= self.max_value:
+            return self.total_count
+        return sum(self.counts[:self._index_for(value) + 1])
+
+    def percentiles_ms(self, percentiles=(50, 95, 99, 99.9)):
+        """
+        Return {percentile: value in milliseconds} for reporting.
+        """
+        return {p: v / MICROS_PER_MS for p, v in self.values_at_percentiles(percentiles).items()}
+
+    def encode(self):
+        """
+        Serialize to a compact binary form (sparse, varint, zlib-compressed).
+        """
+        payload = bytearray()
+        previous = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                _encode_varint(index - previous, payload)
+                _encode_varint(count, payload)
+                previous = index
+        header = _ENCODING_HEADER.pack(
+            _ENCODING_MAGIC, self.significant_figures, self.highest_trackable,
+            self.min_value, self.max_value, self._total_value
+        )
+        return header + zlib.compress(bytes(payload))
+
+    @classmethod
+    def decode(cls, data):
+        """
+        Rebuild a histogram from bytes produced by encode().
+        """
+        magic, significant_figures, highest, min_value, max_value, total_value = \
+            _ENCODING_HEADER.unpack_from(data)
+        if magic != _ENCODING_MAGIC:
+            raise ValueError("Not an encoded HdrHistogram")
+
+        histogram = cls(highest, significant_figures)
+        values = _decode_varints(zlib.decompress(data[_ENCODING_HEADER.size:]))
+        index = 0
+        total = 0
+        for delta, count in zip(values, values):
+            index += delta
+            histogram.counts[index] = count
+            total += count
+        histogram.total_count = total
+        histogram.min_value = min_value
+        histogram.max_value = max_value
+        histogram._total_value = total_value
+        return histogram
+
+
+def histogram_key(method, name):
+    """
+    Key used for per-endpoint histograms, matching Locust's (Type, Name) pair.
+    """
+    return f"{method}\t{name}"
+
+
+def split_histogram_key(key):
+    method, _, name = key.partition("\t")
+    return method, name
+
+
+def save_histograms(path, histograms):
+    """
+    Write a {key: HdrHistogram} mapping to a single binary file.
+    """
+    with open(path, "wb") as f:
+        f.write(_FILE_MAGIC)
+        for key, histogram in sorted(histograms.items()):
+            name = key.encode("utf-8")
+            blob = histogram.encode()
+            f.write(_RECORD_HEADER.pack(len(name), len(blob)))
+            f.write(name)
+            f.write(blob)
+
+
+def load_histograms(path):
+    """
+    Read a file written by save_histograms().
+
+    Returns:
+        Dict mapping histogram key to HdrHistogram
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(_FILE_MAGIC):
+        raise ValueError(f"Not a histogram file: {path}")
+
+    histograms = {}
+    offset = len(_FILE_MAGIC)
+    while offset < len(data):
+        name_len, blob_len = _RECORD_HEADER.unpack_from(data, offset)
+        offset += _RECORD_HEADER.size
+        key = data[offset:offset + name_len].decode("utf-8")
+        offset += name_len
+        histograms[key] = HdrHistogram.decode(data[offset:offset + blob_len])
+        offset += blob_len
+    return histograms
+
+
+def merge_all(histograms):
+    """
+    Merge an iterable of histograms into a new aggregate histogram.
+    """
+    total = None
+    for histogram in histograms:
+        if total is None:
+            total = HdrHistogram(histogram.highest_trackable, histogram.significant_figures)
+        total.merge(histogram)
+    return total if total is not None else HdrHistogram()
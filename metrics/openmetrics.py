@@ -0,0 +1,264 @@
+import os
+import re
+from bisect import bisect_left
+from collections import deque
+
+# Upper bounds (ms) of the pre-aggregated latency buckets; +Inf is implied
+DEFAULT_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Seconds of history behind the requests-per-second gauges
+DEFAULT_RPS_WINDOW = 10
+
+# Prefix of every exported metric family
+PREFIX = "apiperf"
+
+# The `le` label of histogram buckets, stripped to find a bucket's series
+BUCKET_LABEL = re.compile(r',le="[^"]*"')
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Request type and name of the all-endpoints series, like Locust's Aggregated row
+AGGREGATE_KEY = ("", "Aggregated")
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def labels(**values):
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in values.items()) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class EndpointSeries:
+    """
+    Cumulative counters and latency bucket counts of one endpoint.
+
+    Bucket counts are per bucket, not cumulative; they are summed up only
+    when rendered, so recording touches a single slot.
+    """
+    __slots__ = ("count", "failures", "sum_ms", "buckets")
+
+    def __init__(self, bucket_count):
+        self.count = 0
+        self.failures = 0
+        self.sum_ms = 0.0
+        self.buckets = [0] * (bucket_count + 1)
+
+
+class LiveMetrics:
+    """
+    Pre-aggregated request metrics of a running load generator.
+
+    Every request increments a fixed set of counters, so the recording cost
+    does not depend on the request rate, and rendering costs the same no
+    matter how many requests were recorded. Workers ship state() with their
+    stats reports; the master rebuilds the run totals with load_states().
+
+    Args:
+        buckets_ms: Upper bounds of the latency buckets in milliseconds
+        rps_window: Seconds of history used for the request rate gauges
+    """
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS, rps_window=DEFAULT_RPS_WINDOW):
+        self.bounds = tuple(sorted(buckets_ms))
+        self.rps_window = rps_window
+        self.series = {}
+        self.rps = {}
+        self._history = deque()
+
+    def record(self, request_type, name, response_time, failed=False):
+        key = (request_type, name)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = EndpointSeries(len(self.bounds))
+        series.count += 1
+        series.sum_ms += response_time
+        series.buckets[bisect_left(self.bounds, response_time)] += 1
+        if failed:
+            series.failures += 1
+
+    def state(self):
+        """
+        Return the counters as plain lists, keyed "METHOD\\tName", for shipping.
+        """
+        return {
+            f"{method}\t{name}": [series.count, series.failures, series.sum_ms, series.buckets]
+            for (method, name), series in self.series.items()
+        }
+
+    def load_states(self, states):
+        """
+        Replace the counters with the sum of several state() dicts.
+
+        Raises:
+            ValueError: If a state was recorded with different buckets
+        """
+        self.series = {}
+        for state in states:
+            for key, (count, failures, sum_ms, buckets) in state.items():
+                if len(buckets) != len(self.bounds) + 1:
+                    raise ValueError("Cannot merge live metrics recorded with different buckets")
+                method, _, name = key.partition("\t")
+                series = self.series.get((method, name))
+                if series is None:
+                    series = self.series[(method, name)] = EndpointSeries(len(self.bounds))
+                series.count += count
+                series.failures += failures
+                series.sum_ms += sum_ms
+                series.buckets = [a + b for a, b in zip(series.buckets, buckets)]
+
+    def tick(self, now):
+        """
+        Snapshot the request counts and update the request rate gauges.
+
+        Rates are differences between snapshots, so they cost nothing per request.
+        """
+        counts = {key: series.count for key, series in self.series.items()}
+        counts[AGGREGATE_KEY] = sum(counts.values())
+        self._history.append((now, counts))
+        while len(self._history) > 1 and now - self._history[0][0] > self.rps_window:
+            self._history.popleft()
+
+        started, oldest = self._history[0]
+        elapsed = now - started
+        self.rps = {
+            key: (count - oldest.get(key, 0)) / elapsed if elapsed > 0 else 0.0
+            for key, count in counts.items()
+        }
+
+    def families(self, node):
+        """
+        Yield (name, type, unit, help, samples) for the request metrics, where
+        samples are (metric name, label string, value) tuples.
+        """
+        base = f"{PREFIX}_request_duration_seconds"
+        les = [_number(bound / 1000) for bound in self.bounds] + ["+Inf"]
+        histogram = []
+        requests = []
+        failures = []
+        for (method, name), series in sorted(self.series.items()):
+            running = 0
+            for le, count in zip(les, series.buckets):
+                running += count
+                histogram.append((f"{base}_bucket", labels(node=node, method=method, name=name, le=le), running))
+            endpoint = labels(node=node, method=method, name=name)
+            histogram.append((f"{base}_count", endpoint, series.count))
+            histogram.append((f"{base}_sum", endpoint, series.sum_ms / 1000))
+            requests.append((f"{PREFIX}_requests_total", endpoint, series.count))
+            failures.append((f"{PREFIX}_request_failures_total", endpoint, series.failures))
+
+        rps = [
+            (f"{PREFIX}_requests_per_second", labels(node=node, method=method, name=name), value)
+            for (method, name), value in sorted(self.rps.items())
+        ]
+        yield base, "histogram", "seconds", "Response time per endpoint.", histogram
+        yield f"{PREFIX}_requests", "counter", None, "Completed requests per endpoint.", requests
+        yield f"{PREFIX}_request_failures", "counter", None, "Failed requests per endpoint.", failures
+        yield (f"{PREFIX}_requests_per_second", "gauge", None,
+               f"Request rate over the last {self.rps_window}s.", rps)
+
+
+def render(families, timestamp=None):
+    """
+    Render metric families as OpenMetrics text, without the `# EOF` line.
+
+    Args:
+        families: Iterable of (name, type, unit, help, samples)
+        timestamp: Unix time appended to every sample, for file sinks
+
+    Returns:
+        List of lines
+    """
+    suffix = f" {timestamp:.3f}" if timestamp is not None else ""
+    lines = []
+    for name, metric_type, unit, help_text, samples in families:
+        lines.append(f"# TYPE {name} {metric_type}")
+        if unit:
+            lines.append(f"# UNIT {name} {unit}")
+        lines.append(f"# HELP {name} {help_text}")
+        lines.extend(f"{metric}{label_string} {_number(value)}{suffix}" for metric, label_string, value in samples)
+    return lines
+
+
+def exposition(families):
+    """
+    Return a complete OpenMetrics exposition for a scrape.
+    """
+    lines = render(families)
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def _split_sample(line):
+    # Metric names contain neither spaces nor braces; label values may contain both
+    brace = line.find("{")
+    space = line.find(" ")
+    if brace < 0 or space < brace:
+        return line[:space], ""
+    return line[:brace], line[brace:line.rfind("}") + 1]
+
+
+class FileSink:
+    """
+    Appends timestamped snapshots to `<path>.part` during the run.
+
+    OpenMetrics requires each metric family, and each series within it, to
+    be contiguous, so close() rewrites the snapshots grouped by family and
+    series into `path`, which Prometheus can import with
+    `promtool tsdb create-blocks-from openmetrics`. The snapshot file is read
+    once per family, so only one family is held in memory at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.part_path = f"{path}.part"
+        self.headers = {}
+        self.file = open(self.part_path, "w", encoding="utf-8")
+
+    def write(self, families, timestamp):
+        for line in render(families, timestamp):
+            if not line.startswith("# "):
+                self.file.write(line + "\n")
+                continue
+            header = self.headers.setdefault(line.split(" ", 3)[2], [])
+            if line not in header:
+                header.append(line)
+        self.file.flush()
+
+    def _family_of(self, metric):
+        if metric in self.headers:
+            return metric
+        for suffix in ("_bucket", "_count", "_sum", "_total"):
+            if metric.endswith(suffix) and metric[:-len(suffix)] in self.headers:
+                return metric[:-len(suffix)]
+        return None
+
+    def close(self):
+        """
+        Write the grouped OpenMetrics file and remove the snapshot file.
+
+        Returns:
+            Path of the OpenMetrics file
+        """
+        self.file.close()
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as out:
+            for family, header in self.headers.items():
+                out.writelines(line + "\n" for line in header)
+                series = {}
+                with open(self.part_path, encoding="utf-8") as snapshots:
+                    for line in snapshots:
+                        metric, label_string = _split_sample(line)
+                        if self._family_of(metric) == family:
+                            # A histogram's buckets, count and sum form one series
+                            series.setdefault(BUCKET_LABEL.sub("", label_string), []).append(line)
+                for lines in series.values():
+                    out.writelines(lines)
+            out.write("# EOF\n")
+        os.replace(temporary, self.path)
+        os.remove(self.part_path)
+        return self.path
@@ -0,0 +1,60 @@
+# Request context key carrying the sending user's UserPacing
+PACING_KEY = "pacing"
+
+# Weight of the newest sample in the moving averages of UserPacing; the usual
+# response time falls faster than it rises, so a slow first response (e.g. a
+# connection retry) is forgotten within a few requests
+PACING_SMOOTHING = 0.1
+PACING_RECOVERY = 0.5
+
+# A response counts towards the usual response time up to this multiple of it
+# (and at least up to 1 ms), so a stall barely stretches the interval it is
+# corrected against
+MAX_SERVICE_GROWTH = 2
+
+
+class UserPacing:
+    """
+    Expected interval between the requests of one closed-loop user.
+
+    A closed-loop user sends its next request only after the previous
+    response, so a stalled server is sampled once per user instead of at
+    the rate the user would have kept up. The expected interval is the
+    user's think time, measured as the gap between a response and its next
+    request (wait_time, flow think times and all), plus its usual response
+    time. Both are moving averages, so they follow gradual changes.
+    """
+    __slots__ = ("think_ms", "service_ms", "last_end")
+
+    def __init__(self):
+        self.think_ms = None
+        self.service_ms = None
+        self.last_end = None
+
+    def expected_interval(self, start_time, response_time):
+        """
+        Return the user's expected interval before a request, then learn from it.
+
+        Args:
+            start_time: When the request was sent (seconds since the epoch)
+            response_time: Response time in milliseconds
+
+        Returns:
+            Expected interval in milliseconds, or None until the user has
+            sent two requests
+        """
+        expected = None
+        if self.last_end is not None:
+            gap = max((start_time - self.last_end) * 1000, 0.0)
+            self.think_ms = gap if self.think_ms is None else \
+                self.think_ms + (gap - self.think_ms) * PACING_SMOOTHING
+            expected = self.think_ms + self.service_ms
+
+        if self.service_ms is None:
+            self.service_ms = response_time
+        else:
+            sample = min(response_time, max(self.service_ms * MAX_SERVICE_GROWTH, 1.0))
+            weight = PACING_RECOVERY if sample < self.service_ms else PACING_SMOOTHING
+            self.service_ms += (sample - self.service_ms) * weight
+        self.last_end = start_time + response_time / 1000
+        return expected
@@ -0,0 +1,198 @@
+import csv
+import time
+from datetime import datetime, timezone
+
+from metrics.hdr_histogram import MICROS_PER_MS, HdrHistogram, histogram_key
+
+# Percentile columns of Locust's stats CSVs, in Locust's order
+CSV_PERCENTILES = (50, 66, 75, 80, 90, 95, 98, 99, 99.9, 99.99, 100)
+
+# Name and (empty) request type of the all-requests row
+AGGREGATE_NAME = "Aggregated"
+
+STATS_COLUMNS = [
+    "Type", "Name", "Request Count", "Failure Count", "Median Response Time", "Average Response Time",
+    "Min Response Time", "Max Response Time", "Average Content Size", "Requests/s", "Failures/s",
+    *(f"{p:g}%" for p in CSV_PERCENTILES),
+]
+
+HISTORY_COLUMNS = [
+    "Timestamp", "User Count", "Type", "Name", "Requests/s", "Failures/s",
+    *(f"{p:g}%" for p in CSV_PERCENTILES),
+    "Total Request Count", "Total Failure Count", "Total Median Response Time", "Total Average Response Time",
+    "Total Min Response Time", "Total Max Response Time", "Total Average Content Size",
+]
+
+FAILURES_COLUMNS = ["Method", "Name", "Error", "Occurrences", "First Seen", "Last Seen"]
+
+EXCEPTIONS_COLUMNS = ["Count", "Message", "Traceback", "Nodes"]
+
+
+def utc_timestamp(unix_time):
+    return datetime.fromtimestamp(int(unix_time), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class EndpointStats:
+    """
+    Run totals and the current interval of one endpoint.
+
+    Latencies go into HDR histograms, so percentiles are exact to the
+    histogram's precision and memory does not grow with the request count.
+    """
+    __slots__ = ("count", "failures", "total_ms", "min_ms", "max_ms", "content_bytes", "histogram",
+                 "interval", "interval_failures")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+        self.content_bytes = 0
+        self.histogram = HdrHistogram()
+        self.interval = HdrHistogram()
+        self.interval_failures = 0
+
+    def record(self, response_time, content_length, failed):
+        self.count += 1
+        self.total_ms += response_time
+        if self.min_ms is None or response_time < self.min_ms:
+            self.min_ms = response_time
+        if response_time > self.max_ms:
+            self.max_ms = response_time
+        self.content_bytes += content_length
+        value = int(response_time * MICROS_PER_MS)
+        self.histogram.record_value(value)
+        self.interval.record_value(value)
+        if failed:
+            self.failures += 1
+            self.interval_failures += 1
+
+    def percentiles(self, histogram):
+        if not histogram.total_count:
+            return ["N/A"] * len(CSV_PERCENTILES)
+        values = histogram.values_at_percentiles(CSV_PERCENTILES)
+        # Whole milliseconds, truncated like Locust's columns
+        return [int(values[p] / MICROS_PER_MS) for p in CSV_PERCENTILES]
+
+    def median(self):
+        return round(self.histogram.value_at_percentile(50) / MICROS_PER_MS) if self.count else 0
+
+    def average(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def average_content(self):
+        return self.content_bytes / self.count if self.count else 0.0
+
+
+class RequestStats:
+    """
+    Request statistics of a load generator that does not run Locust,
+    written in the CSV schema of Locust's --csv and --csv-full-history
+    output, so reporting and SLA validation work unchanged.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.total = EndpointStats()
+        self.errors = {}
+        # Response times of failed requests, keyed like histograms()
+        self.failed = {}
+        self.started_at = time.time()
+        self._interval_started = time.time()
+
+    def record(self, method, name, response_time, content_length=0, error=None):
+        """
+        Record one finished request.
+
+        Args:
+            method: Request type, e.g. GET
+            name: Name the request is reported under
+            response_time: Milliseconds
+            content_length: Response body bytes
+            error: Failure description, or None for a successful request
+        """
+        key = (method, name)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = EndpointStats()
+        failed = error is not None
+        entry.record(response_time, content_length, failed)
+        self.total.record(response_time, content_length, failed)
+        if failed:
+            hkey = histogram_key(method, name)
+            histogram = self.failed.get(hkey)
+            if histogram is None:
+                histogram = self.failed[hkey] = HdrHistogram()
+            histogram.record_value(int(response_time * MICROS_PER_MS))
+            now = time.time()
+            seen = self.errors.get((method, name, error))
+            if seen is None:
+                self.errors[(method, name, error)] = [1, now, now]
+            else:
+                seen[0] += 1
+                seen[2] = now
+
+    def _rows(self):
+        for (method, name), entry in sorted(self.entries.items(), key=lambda item: (item[0][1], item[0][0])):
+            yield method, name, entry
+        yield "", AGGREGATE_NAME, self.total
+
+    def history_rows(self, user_count, now=None):
+        """
+        Return one stats history row per endpoint and the aggregate for the
+        interval since the previous call, and start a new interval.
+
+        Rates and percentiles cover the interval; the Total columns cover the run.
+        """
+        now = now or time.time()
+        elapsed = max(now - self._interval_started, 1e-9)
+        self._interval_started = now
+        rows = []
+        for method, name, entry in self._rows():
+            interval = entry.interval
+            rows.append([
+                int(now), user_count, method, name,
+                f"{interval.total_count / elapsed:.6f}", f"{entry.interval_failures / elapsed:.6f}",
+                *entry.percentiles(interval),
+                entry.count, entry.failures, entry.median(), round(entry.average(), 1),
+                round(entry.min_ms or 0), round(entry.max_ms), round(entry.average_content()),
+            ])
+            interval.reset()
+            entry.interval_failures = 0
+        return rows
+
+    def histograms(self):
+        """
+        Per-endpoint histograms keyed like locustfiles/latency_recorder.py writes them.
+        """
+        return {histogram_key(method, name): entry.histogram for (method, name), entry in self.entries.items()}
+
+    def write_csv(self, prefix, duration):
+        """
+        Write <prefix>_stats.csv, <prefix>_failures.csv and <prefix>_exceptions.csv.
+
+        Args:
+            prefix: Path prefix, like Locust's --csv
+            duration: Seconds the load ran, for the request rates
+        """
+        duration = max(duration, 1e-9)
+        with open(f"{prefix}_stats.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(STATS_COLUMNS)
+            for method, name, entry in self._rows():
+                writer.writerow([
+                    method, name, entry.count, entry.failures, entry.median(), entry.average(),
+                    entry.min_ms or 0, entry.max_ms, entry.average_content(),
+                    entry.count / duration, entry.failures / duration, *entry.percentiles(entry.histogram),
+                ])
+
+        with open(f"{prefix}_failures.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FAILURES_COLUMNS)
+            for (method, name, error), (count, first, last) in sorted(
+                    self.errors.items(), key=lambda item: -item[1][0]):
+                writer.writerow([method, name, error, count, utc_timestamp(first), utc_timestamp(last)])
+
+        with open(f"{prefix}_exceptions.csv", "w", newline="") as f:
+            csv.writer(f).writerow(EXCEPTIONS_COLUMNS)
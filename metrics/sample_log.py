@@ -0,0 +1,338 @@
+import glob
+import json
+import logging
+import os
+import struct
+
+# One fixed-width, little-endian record per request (24 bytes):
+# start timestamp (s), latency (ms), response bytes, endpoint id, HTTP status,
+# failed flag, padding. Endpoint ids are 32-bit, so runs with very many
+# distinct request names (e.g. unnamed URLs with ids in them) still fit
+SAMPLE_RECORD = struct.Struct("<dfIIHBx")
+
+SAMPLE_FIELDS = (
+    ("timestamp", "<f8"),
+    ("latency_ms", "<f4"),
+    ("bytes", "<u4"),
+    ("endpoint", "<u4"),
+    ("status", "<u2"),
+    ("failed", "u1"),
+    ("_pad", "V1"),
+)
+
+SAMPLE_SUFFIX = ".samples"
+ENDPOINTS_SUFFIX = ".endpoints.json"
+
+# Buffered bytes that trigger a batch write (about 43k records)
+DEFAULT_FLUSH_BYTES = 1 << 20
+
+# Records reduced at a time by summarize_samples() (about 100 MB of them)
+SUMMARY_CHUNK = 1 << 22
+
+# Mantissa bits kept when bucketing latencies for percentiles: 10 bits keep
+# every value within 0.1%, i.e. three significant digits
+LATENCY_BUCKET_BITS = 10
+_BUCKET_SHIFT = 23 - LATENCY_BUCKET_BITS
+# Bits of a bucket number (float32 sign bit unset), below the group in a sort key
+_GROUP_SHIFT = 31 - _BUCKET_SHIFT
+
+logger = logging.getLogger(__name__)
+
+
+def _write_chunk(f, chunk):
+    f.write(chunk)
+
+
+def _write_endpoints(path, endpoints):
+    # Write and rename, so a reader never sees a partial sidecar
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(endpoints, f)
+    os.replace(temporary, path)
+
+
+class SampleLogWriter:
+    """
+    Appends per-request samples to a fixed-width binary file.
+
+    Records are packed into an in-memory buffer on the hot path; full
+    buffers are handed to `submit(fn, *args)` for writing, so the caller
+    decides where disk I/O happens (e.g. a native thread under gevent).
+    Endpoint names are interned to small integer ids and kept in a JSON
+    sidecar. The sidecar is rewritten ahead of every batch that uses a new
+    id, so the records on disk can be read even if the process is killed
+    before close().
+    """
+
+    def __init__(self, path, flush_bytes=DEFAULT_FLUSH_BYTES, submit=None):
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self._submit = submit
+        self._file = open(path, "wb")
+        self._buffer = bytearray()
+        self._endpoint_ids = {}
+        self._endpoints_path = path[:-len(SAMPLE_SUFFIX)] + ENDPOINTS_SUFFIX
+        self._endpoints_written = 0
+        self._pending = []
+        self.count = 0
+
+    def endpoint_id(self, method, name):
+        key = (method, name)
+        endpoint_id = self._endpoint_ids.get(key)
+        if endpoint_id is None:
+            endpoint_id = self._endpoint_ids[key] = len(self._endpoint_ids)
+        return endpoint_id
+
+    def record(self, timestamp, method, name, status, latency_ms, nbytes, failed):
+        self._buffer += SAMPLE_RECORD.pack(
+            timestamp, latency_ms, nbytes, self.endpoint_id(method, name), status, failed
+        )
+        self.count += 1
+        if len(self._buffer) >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        """
+        Hand the current buffer off for writing and start a new one.
+        """
+        if not self._buffer:
+            return
+        chunk = bytes(self._buffer)
+        self._buffer = bytearray()
+        if len(self._endpoint_ids) > self._endpoints_written:
+            self._endpoints_written = len(self._endpoint_ids)
+            # Ids are assigned in order, so the keys are the id -> endpoint list
+            endpoints = [list(key) for key in self._endpoint_ids]
+            self._write(_write_endpoints, self._endpoints_path, endpoints)
+        self._write(_write_chunk, self._file, chunk)
+
+    def _write(self, fn, *args):
+        if self._submit is None:
+            fn(*args)
+        else:
+            self._pending.append(self._submit(fn, *args))
+
+    def close(self):
+        self.flush()
+        for pending in self._pending:
+            if hasattr(pending, "get"):
+                pending.get()
+            elif hasattr(pending, "result"):
+                pending.result()
+        self._pending = []
+        self._file.close()
+        if len(self._endpoint_ids) > self._endpoints_written or not self._endpoints_written:
+            self._endpoints_written = len(self._endpoint_ids)
+            _write_endpoints(self._endpoints_path, [list(key) for key in self._endpoint_ids])
+
+
+def sample_dtype():
+    import numpy as np
+    return np.dtype(list(SAMPLE_FIELDS))
+
+
+def read_sample_file(path):
+    """
+    Memory-map one sample file as a NumPy structured array.
+
+    A record cut short by a killed process is ignored.
+
+    Returns:
+        Tuple of (endpoints list of [method, name], structured array)
+
+    Raises:
+        FileNotFoundError: If the file has no endpoints sidecar
+    """
+    import numpy as np
+
+    with open(path[:-len(SAMPLE_SUFFIX)] + ENDPOINTS_SUFFIX) as f:
+        endpoints = json.load(f)
+    dtype = sample_dtype()
+    count = os.path.getsize(path) // dtype.itemsize
+    if not count:
+        return endpoints, np.zeros(0, dtype=dtype)
+    return endpoints, np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def load_sample_logs(directory):
+    """
+    Load every sample file in a directory, unifying endpoint ids across files.
+
+    Files without an endpoints sidecar (a process killed before its first
+    batch was written) are skipped with a warning.
+
+    Returns:
+        Tuple of (endpoints list of (method, name), list of (array, global id map))
+        where `global id map[array["endpoint"]]` gives indices into endpoints
+    """
+    import numpy as np
+
+    endpoints = []
+    index = {}
+    parts = []
+    for path in sorted(glob.glob(os.path.join(directory, f"*{SAMPLE_SUFFIX}"))):
+        try:
+            local_endpoints, samples = read_sample_file(path)
+        except FileNotFoundError:
+            logger.warning("Skipping %s: its endpoints sidecar is missing", path)
+            continue
+        mapping = []
+        for method, name in local_endpoints:
+            key = (method, name)
+            if key not in index:
+                index[key] = len(endpoints)
+                endpoints.append(key)
+            mapping.append(index[key])
+        parts.append((samples, np.asarray(mapping or [0], dtype=np.int32)))
+    return endpoints, parts
+
+
+def iter_sample_chunks(parts, size=SUMMARY_CHUNK):
+    """
+    Yield the records of loaded sample logs `size` at a time.
+
+    Args:
+        parts: Second item returned by load_sample_logs()
+
+    Yields:
+        Tuple of (global endpoint ids as int64, structured array slice)
+    """
+    import numpy as np
+
+    for samples, mapping in parts:
+        for offset in range(0, len(samples), size):
+            chunk = samples[offset:offset + size]
+            yield mapping[chunk["endpoint"]].astype(np.int64), chunk
+
+
+class GroupedLatencies:
+    """
+    Latency distribution per group (an endpoint, or an endpoint and time
+    bucket), accumulated chunk by chunk without keeping the samples.
+
+    Latencies are counted in log-linear buckets: non-negative float32 bit
+    patterns order like the floats, and dropping the low mantissa bits
+    leaves LATENCY_BUCKET_BITS of precision. Counts are kept sparse, one
+    (group, bucket) key per pair that occurred, so memory grows with the
+    distinct latencies per group rather than with the number of samples.
+    """
+
+    def __init__(self, group_count):
+        import numpy as np
+
+        self.group_count = group_count
+        self.requests = np.zeros(group_count, dtype=np.int64)
+        self.maximum = np.zeros(group_count, dtype=np.float32)
+        self._keys = []
+        self._counts = []
+
+    def add(self, groups, latency):
+        """
+        Count one chunk of samples.
+
+        Args:
+            groups: Group index of each sample (int64 array)
+            latency: Latency of each sample in milliseconds (float32 array)
+        """
+        import numpy as np
+
+        latency = np.abs(latency)
+        self.requests += np.bincount(groups, minlength=self.group_count)
+        np.maximum.at(self.maximum, groups, latency)
+        buckets = (latency.view(np.uint32) >> np.uint32(_BUCKET_SHIFT)).astype(np.uint64)
+        keys, counts = np.unique((groups.astype(np.uint64) << np.uint64(_GROUP_SHIFT)) | buckets,
+                                 return_counts=True)
+        self._keys.append(keys)
+        self._counts.append(counts)
+        if len(self._keys) >= 64:
+            self._merge()
+
+    def _merge(self):
+        import numpy as np
+
+        keys, inverse = np.unique(np.concatenate(self._keys), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate(self._counts)).astype(np.int64)
+        self._keys, self._counts = [keys], [counts]
+        return keys, counts
+
+    def percentiles(self, percentiles):
+        """
+        Return {percentile: float array over groups}; NaN for empty groups.
+
+        A percentile is the highest latency of the bucket holding its rank,
+        capped at the group's maximum, like HdrHistogram reports it.
+        """
+        import numpy as np
+
+        has_data = self.requests > 0
+        if not self._keys:
+            return {p: np.full(self.group_count, np.nan) for p in percentiles}
+        keys, counts = self._merge()
+        # Sorted keys make each group a contiguous run of ascending buckets
+        cumulative = np.cumsum(counts)
+        first = np.searchsorted(keys >> np.uint64(_GROUP_SHIFT), np.arange(self.group_count, dtype=np.uint64))
+        before = np.concatenate(([0], cumulative))[first]
+        bucket_mask = np.uint64((1 << _GROUP_SHIFT) - 1)
+        upper = (((keys & bucket_mask) + np.uint64(1) << np.uint64(_BUCKET_SHIFT)) - np.uint64(1))
+        upper = upper.astype(np.uint32).view(np.float32)
+
+        result = {}
+        for p in percentiles:
+            rank = np.maximum(np.ceil(p / 100 * self.requests).astype(np.int64), 1)
+            index = np.minimum(np.searchsorted(cumulative, before + rank), len(keys) - 1)
+            result[p] = np.where(has_data, np.minimum(upper[index], self.maximum), np.nan)
+        return result
+
+
+def summarize_samples(directory, percentiles=(50, 95, 99)):
+    """
+    Compute per-endpoint counts and latency percentiles from the sample logs
+    with vectorized NumPy operations over the memory-mapped files.
+
+    The files are reduced SUMMARY_CHUNK records at a time into per-endpoint
+    totals and GroupedLatencies, so memory stays flat however long the run
+    was. Percentiles are kept to within 0.1%, like the HDR histograms.
+
+    Returns:
+        Summary dict, or None if the directory holds no samples
+    """
+    import numpy as np
+
+    endpoints, parts = load_sample_logs(directory)
+    if not parts or not sum(len(samples) for samples, _ in parts):
+        return None
+
+    size = len(endpoints)
+    latencies = GroupedLatencies(size)
+    failures = np.zeros(size)
+    total_bytes = np.zeros(size)
+    start, end = np.inf, -np.inf
+    for ids, chunk in iter_sample_chunks(parts):
+        latencies.add(ids, chunk["latency_ms"])
+        failures += np.bincount(ids, weights=chunk["failed"], minlength=size)
+        total_bytes += np.bincount(ids, weights=chunk["bytes"], minlength=size)
+        start = min(start, float(chunk["timestamp"].min()))
+        end = max(end, float(chunk["timestamp"].max()))
+
+    values = latencies.percentiles(percentiles)
+    summary = {}
+    for endpoint_id, (method, name) in enumerate(endpoints):
+        count = int(latencies.requests[endpoint_id])
+        if not count:
+            continue
+        summary[f"{method} {name}"] = {
+            "method": method,
+            "name": name,
+            "requests": count,
+            "failures": int(failures[endpoint_id]),
+            "bytes": int(total_bytes[endpoint_id]),
+            "max": float(latencies.maximum[endpoint_id]),
+            **{f"p{p}": float(values[p][endpoint_id]) for p in percentiles},
+        }
+
+    return {
+        "total_samples": int(latencies.requests.sum()),
+        "start": start,
+        "end": end,
+        "endpoints": summary,
+    }
@@ -0,0 +1,263 @@
+import fnmatch
+import re
+
+from metrics.hdr_histogram import MICROS_PER_MS
+
+# `pNN_ms` rule keys: latency at any percentile, e.g. p50_ms, p99_ms, p99.9_ms
+PERCENTILE_METRIC = re.compile(r"^p(\d+(?:\.\d+)?)_ms$")
+
+# Rule keys other than percentiles
+RULE_METRICS = ("max_ms", "error_rate", "min_rps", "apdex")
+
+# Values of a rule's `latency` key: which histogram its latency metrics
+# (percentiles, max_ms and apdex) are measured on
+LATENCY_SOURCES = ("raw", "corrected")
+
+# Metrics that must reach their threshold rather than stay at or below it
+LOWER_BOUND_METRICS = ("min_rps", "apdex")
+
+# Endpoint patterns with this prefix are regular expressions; names with *, ? or [ are globs
+REGEX_PREFIX = "re:"
+GLOB_CHARACTERS = frozenset("*?[")
+
+# Top-level sections of thresholds/sla.yaml; any other top-level key is an
+# endpoint name, as in the original flat layout
+RULE_SECTIONS = ("defaults", "endpoints", "aggregate")
+
+# Target name of the aggregate rule, like Locust's all-requests row
+AGGREGATE_TARGET = "Aggregated"
+
+# Apdex: responses within T are satisfied, within 4T tolerating
+APDEX_TOLERATING_FACTOR = 4
+
+
+def percentile_of(metric):
+    """
+    Return the percentile of a `pNN_ms` metric, or None for other metrics.
+    """
+    match = PERCENTILE_METRIC.match(metric) if isinstance(metric, str) else None
+    return float(match.group(1)) if match else None
+
+
+def compile_pattern(pattern):
+    """
+    Compile an endpoint pattern into a match function.
+
+    `re:` patterns are searched anywhere in the name unless anchored; globs
+    must match the whole name.
+
+    Returns:
+        Callable(name) returning a truthy value on a match, or None when the
+        pattern is a plain endpoint name
+
+    Raises:
+        re.error: If a `re:` pattern is not a valid regular expression
+    """
+    if pattern.startswith(REGEX_PREFIX):
+        return re.compile(pattern[len(REGEX_PREFIX):]).search
+    if GLOB_CHARACTERS.intersection(pattern):
+        return re.compile(fnmatch.translate(pattern)).match
+    return None
+
+
+def rule_checks(rule):
+    """
+    Yield (metric, threshold) for every check of a rule, percentiles first
+    in ascending order.
+    """
+    percentiles = sorted((percentile_of(metric), metric) for metric in rule if percentile_of(metric) is not None)
+    for _, metric in percentiles:
+        yield metric, rule[metric]
+    for metric in RULE_METRICS:
+        if metric in rule:
+            yield metric, rule[metric]["min"] if metric == "apdex" else rule[metric]
+
+
+def passes(metric, actual, threshold):
+    if metric in LOWER_BOUND_METRICS:
+        return actual >= threshold
+    return actual <= threshold
+
+
+def _number(value):
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def describe(target, metric, actual, threshold):
+    """
+    Return the breach message for a failed check.
+    """
+    percentile = percentile_of(metric)
+    if percentile is not None:
+        return f"P{percentile:g} breach: {target} ({_number(actual)}ms > {threshold}ms)"
+    if metric == "max_ms":
+        return f"Max latency breach: {target} ({_number(actual)}ms > {threshold}ms)"
+    if metric == "error_rate":
+        return f"Error rate breach: {target} ({actual:.2f}% > {threshold}%)"
+    if metric == "min_rps":
+        return f"Throughput breach: {target} ({actual:.2f} req/s < {threshold} req/s)"
+    return f"Apdex breach: {target} ({actual:.3f} < {threshold})"
+
+
+class SlaRules:
+    """
+    Resolved view of thresholds/sla.yaml.
+
+    An endpoint's rule is merged metric by metric from `defaults`, then every
+    glob or `re:` pattern under `endpoints` that matches it (in file order),
+    then the entry with its exact name. The `aggregate` rule applies to all
+    requests together.
+    """
+
+    def __init__(self, thresholds):
+        thresholds = thresholds or {}
+        self.defaults = thresholds.get("defaults") or {}
+        self.aggregate = thresholds.get("aggregate") or {}
+        endpoints = {key: rule for key, rule in thresholds.items() if key not in RULE_SECTIONS}
+        endpoints.update(thresholds.get("endpoints") or {})
+
+        self.exact = {}
+        self.patterns = []
+        for pattern, rule in endpoints.items():
+            matcher = compile_pattern(pattern)
+            if matcher is None:
+                self.exact[pattern] = rule or {}
+            else:
+                self.patterns.append((matcher, rule or {}))
+        self._resolved = {}
+
+    def for_endpoint(self, name, defaults=True):
+        """
+        Return the merged rule of an endpoint; empty when nothing applies.
+
+        Args:
+            name: Endpoint (or flow) name as reported by Locust
+            defaults: Start from the `defaults` section. Flows pass False:
+                their timings span several requests, so only rules that
+                name or match them apply.
+        """
+        key = (name, defaults)
+        rule = self._resolved.get(key)
+        if rule is None:
+            rule = dict(self.defaults) if defaults else {}
+            for matcher, pattern_rule in self.patterns:
+                if matcher(name):
+                    rule.update(pattern_rule)
+            rule.update(self.exact.get(name, {}))
+            self._resolved[key] = rule
+        return rule
+
+
+class TargetStats:
+    """
+    What was measured for one endpoint, flow or the aggregate over a run.
+
+    Latency metrics come from the HDR histogram when one was recorded, and
+    from Locust's CSV percentile columns (rounded to two significant digits)
+    otherwise.
+
+    Args:
+        requests: Completed requests
+        failures: Failed requests
+        rps: Request rate over the run
+        histogram: HdrHistogram of latencies, or None
+        csv_percentiles: {percentile: ms} from Locust's CSV
+        csv_max_ms: Max response time from Locust's CSV
+        corrected_histogram: HdrHistogram of latencies corrected for
+            coordinated omission, or None; rules with `latency: corrected`
+            are measured on it
+    """
+    __slots__ = ("requests", "failures", "rps", "histogram", "csv_percentiles", "csv_max_ms",
+                 "corrected_histogram")
+
+    def __init__(self, requests, failures, rps, histogram=None, csv_percentiles=None, csv_max_ms=None,
+                 corrected_histogram=None):
+        self.requests = requests
+        self.failures = failures
+        self.rps = rps
+        self.histogram = histogram if histogram is not None and histogram.total_count else None
+        self.csv_percentiles = csv_percentiles or {}
+        self.csv_max_ms = csv_max_ms
+        self.corrected_histogram = corrected_histogram \
+            if corrected_histogram is not None and corrected_histogram.total_count else None
+
+    def measure(self, metric, rule, histogram_source="hdr", corrected_source="hdr_corrected"):
+        """
+        Measure one metric.
+
+        Returns:
+            Tuple of (value, source), or (None, reason) when it can't be measured
+        """
+        if not self.requests:
+            return None, "no requests recorded"
+        if metric == "error_rate":
+            return self.failures / self.requests * 100, "counts"
+        if metric == "min_rps":
+            return self.rps, "counts"
+
+        histogram = self.histogram
+        if rule.get("latency") == "corrected":
+            # No CSV fallback: Locust's percentiles are not corrected
+            if self.corrected_histogram is None:
+                return None, "no coordinated-omission-corrected latency histogram"
+            histogram, histogram_source = self.corrected_histogram, corrected_source
+        percentile = percentile_of(metric)
+        if percentile is not None:
+            if histogram is not None:
+                return histogram.value_at_percentile(percentile) / MICROS_PER_MS, histogram_source
+            if percentile in self.csv_percentiles:
+                return self.csv_percentiles[percentile], "csv"
+            return None, f"no latency histogram and no {percentile:g}% column in the CSV"
+        if metric == "max_ms":
+            if histogram is not None:
+                return histogram.max_value / MICROS_PER_MS, histogram_source
+            if self.csv_max_ms is not None:
+                return self.csv_max_ms, "csv"
+            return None, "no latency data"
+
+        # apdex: failed requests count as frustrated. Histograms don't tell
+        # failures apart, so the latency-based score is scaled by the success ratio
+        if histogram is None:
+            return None, "apdex needs a latency histogram"
+        target = rule["apdex"]["t_ms"] * MICROS_PER_MS
+        satisfied = histogram.count_at_or_below(target)
+        tolerating = histogram.count_at_or_below(target * APDEX_TOLERATING_FACTOR) - satisfied
+        score = (satisfied + tolerating / 2) / histogram.total_count
+        return score * (self.requests - self.failures) / self.requests, histogram_source
+
+
+def evaluate(target, rule, stats, histogram_source="hdr", corrected_source="hdr_corrected"):
+    """
+    Check one target against its rule.
+
+    Args:
+        target: Endpoint, flow or aggregate name used in the verdicts
+        rule: Merged rule from SlaRules
+        stats: TargetStats of the target
+        histogram_source: Source label for histogram-based values
+        corrected_source: Source label for values of `latency: corrected` rules
+
+    Returns:
+        Tuple of (checks, skipped): dicts with target, metric and threshold,
+        plus actual, passed, source (and message when failed) for checks or
+        reason for skipped ones
+    """
+    checks = []
+    skipped = []
+    for metric, threshold in rule_checks(rule):
+        actual, source = stats.measure(metric, rule, histogram_source, corrected_source)
+        if actual is None:
+            skipped.append({"target": target, "metric": metric, "threshold": threshold, "reason": source})
+            continue
+        check = {
+            "target": target,
+            "metric": metric,
+            "threshold": threshold,
+            "actual": round(actual, 4),
+            "passed": passes(metric, actual, threshold),
+            "source": source,
+        }
+        if not check["passed"]:
+            check["message"] = describe(target, metric, actual, threshold)
+        checks.append(check)
+    return checks, skipped
@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import csv
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+# The compiled scenario modules import Locust, which monkey-patches the
+# standard library for gevent on import; this process runs on asyncio instead
+os.environ.setdefault("LOCUST_SKIP_MONKEY_PATCH", "1")
+
+# Make top-level packages (config/, metrics/) and the scenario compiler importable
+ROOT_DIR = str(Path(__file__).resolve().parent.parent)
+LOCUSTFILES_DIR = os.path.join(ROOT_DIR, "locustfiles")
+for path in (ROOT_DIR, LOCUSTFILES_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import aiohttp
+from locust.exception import StopUser
+from locust.util.timespan import parse_timespan
+
+from auth.jwt import get_shared_token
+from config.loader import load_config, load_scenario, scenario_path
+from connection_policy import DEFAULT_CONNECTION_POLICY, status_error
+from flows import CapturedResponse, ExtractedValue, ExtractionError, FlowStepFailed, response_failed
+from metrics.artifacts import CORRECTED_HISTOGRAM_FILE, FAILED_HISTOGRAM_FILE, FLOW_REQUEST_TYPE, HISTOGRAM_FILE
+from metrics.hdr_histogram import MICROS_PER_MS, HdrHistogram, histogram_key, save_histograms
+from metrics.pacing import UserPacing
+from metrics.request_stats import HISTORY_COLUMNS, RequestStats
+from scenario_plan import FlowSpec, load_plan
+
+# Defaults for the `async_engine` section of config/env.yaml
+DEFAULT_ASYNC_ENGINE_SETTINGS = {
+    "connection_limit": 1000,     # Connections shared by all virtual users; 0 = unlimited
+    "request_timeout": 60,        # Seconds per request, including the response body
+    "uvloop": True,               # Use uvloop when it is installed
+}
+
+# Default think time between tasks, as for the Locust users
+DEFAULT_WAIT_TIME = {"min": 1, "max": 2}
+
+# Scenario sections that only the Locust engine runs
+LOCUST_ONLY_SECTIONS = ("arrival", "replay", "load_shape")
+
+# Connection policies of the `client` section that aiohttp cannot apply
+LOCUST_ONLY_POLICIES = ("http2", "tls_session_resumption")
+
+# Seconds between stats history rows
+HISTORY_INTERVAL = 1
+
+
+def engine_settings(config):
+    """
+    Resolve the `async_engine` settings of env.yaml.
+    """
+    settings = dict(DEFAULT_ASYNC_ENGINE_SETTINGS)
+    settings.update((config or {}).get("async_engine") or {})
+    return settings
+
+
+def connection_policy(config, scenario):
+    """
+    Resolve the connection policy of the `client` sections; the scenario's wins.
+    """
+    policy = dict(DEFAULT_CONNECTION_POLICY)
+    for section in ((config or {}).get("client"), scenario.get("client")):
+        policy.update((key, value) for key, value in (section or {}).items() if key in policy)
+    return policy
+
+
+def check_scenario(scenario, config=None):
+    """
+    Raise ValueError for scenario features the asyncio engine does not run.
+    """
+    unsupported = [section for section in LOCUST_ONLY_SECTIONS if scenario.get(section)]
+    if (config or {}).get("load_shape") and "load_shape" not in unsupported:
+        unsupported.append("load_shape")
+    if any("rate" in req for req in scenario.get("requests") or []):
+        unsupported.append("request rates")
+    policy = connection_policy(config, scenario)
+    unsupported += [f"client.{key}" for key in LOCUST_ONLY_POLICIES if policy[key]]
+    if unsupported:
+        raise ValueError(f"The asyncio engine does not support {', '.join(unsupported)}; use the Locust engine")
+
+
+class Response:
+    """
+    The parts of a response that flows read: status, headers and body.
+    """
+    __slots__ = ("status_code", "headers", "content")
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+class AsyncEngine:
+    """
+    Runs a compiled scenario with virtual users that are asyncio tasks
+    sharing one aiohttp connection pool.
+
+    A virtual user costs a coroutine frame and a dict of variables instead
+    of a greenlet with its own HTTP session, so one process can hold tens
+    of thousands of them. Requests and flows are picked by weight from the
+    same compiled plan the Locust users run, and stats are written in
+    Locust's CSV schema.
+    """
+
+    def __init__(self, plan, config, scenario, settings):
+        self.plan = plan
+        self.config = config
+        self.settings = settings
+        self.keep_alive = connection_policy(config, scenario)["keep_alive"]
+        wait_time = scenario.get("wait_time") or DEFAULT_WAIT_TIME
+        self.wait_min, self.wait_max = wait_time["min"], wait_time["max"]
+        self.stats = RequestStats()
+        # Response times corrected for coordinated omission, per endpoint
+        self.corrected = {}
+        self.session = None
+        self.user_count = 0
+
+    def record_corrected(self, method, name, response_time, pacing=None, start_time=None):
+        """
+        Record a response time with the samples its user's stall hid, like
+        locustfiles/latency_recorder.py does for Locust users; without a
+        pacing (flow transactions) it is recorded as is.
+        """
+        key = histogram_key(method, name)
+        histogram = self.corrected.get(key)
+        if histogram is None:
+            histogram = self.corrected[key] = HdrHistogram()
+        expected = pacing.expected_interval(start_time, response_time) if pacing is not None else None
+        histogram.record_corrected_value(int(response_time * MICROS_PER_MS),
+                                         int(expected * MICROS_PER_MS) if expected is not None else 0)
+
+    async def send(self, request, url, body, headers, token, pacing):
+        """
+        Send one resolved scenario request and record it.
+
+        Returns:
+            Tuple of (Response, or None if the request failed before a
+            response arrived; CheckFailed or None)
+        """
+        if token:
+            headers = {**headers, **token.headers}
+        start_time = time.time()
+        started = time.perf_counter()
+        try:
+            async with self.session.request(request.method, url, data=body, headers=headers) as response:
+                content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            response_time = (time.perf_counter() - started) * 1000
+            self.stats.record(request.method, request.name, response_time, 0, repr(e))
+            self.record_corrected(request.method, request.name, response_time, pacing, start_time)
+            return None, None
+        response_time = (time.perf_counter() - started) * 1000
+        self.record_corrected(request.method, request.name, response_time, pacing, start_time)
+        failure = None
+        if request.checks is not None:
+            failure = request.checks.evaluate(response.status, response.headers, content)
+        error = None
+        if failure is not None:
+            error = repr(failure)
+        elif response_failed(response.status, request.checks):
+            error = repr(status_error(response.status, response.reason, request.name))
+        self.stats.record(request.method, request.name, response_time, len(content), error)
+        return Response(response.status, response.headers, content), failure
+
+    async def run_flow(self, flow, variables, token, pacing):
+        """
+        Run a flow's steps in order and record the transaction, like
+        locustfiles/flows.py does for Locust users.
+        """
+        active = 0.0
+        error = None
+        for step in flow.steps:
+            request = step.request
+            started = time.perf_counter()
+            try:
+                url, body, headers = request.resolve(variables)
+            except (KeyError, ExtractionError) as e:
+                error = repr(e)
+                break
+            response, check_failure = await self.send(request, url, body, headers, token, pacing)
+            active += time.perf_counter() - started
+
+            status = response.status_code if response is not None else 0
+            if response_failed(status, request.checks):
+                error = repr(FlowStepFailed(f"Step '{request.name}' failed with status {status}"))
+                break
+            if check_failure is not None:
+                error = repr(FlowStepFailed(f"Step '{request.name}' failed its {check_failure.category} check"))
+                break
+            if step.extractors:
+                captured = CapturedResponse(response)
+                for name, extractor in step.extractors:
+                    variables[name] = ExtractedValue(captured, extractor)
+            if step.think_time is not None:
+                await asyncio.sleep(step.think_time())
+
+        self.stats.record(FLOW_REQUEST_TYPE, flow.name, active * 1000, 0, error)
+        self.record_corrected(FLOW_REQUEST_TYPE, flow.name, active * 1000)
+
+    async def virtual_user(self):
+        # Template variables of this user: extracted values, rows of user-bound feeders
+        variables = {}
+        pacing = UserPacing()
+        # Tokens are cached per credential and refreshed by a background
+        # thread, so after the first fetch this only picks the next credential
+        token = get_shared_token(self.config)
+        self.user_count += 1
+        try:
+            while True:
+                item = self.plan.choose()
+                is_flow = isinstance(item, FlowSpec)
+                try:
+                    if is_flow:
+                        await self.run_flow(item, variables, token, pacing)
+                    else:
+                        await self.send(item, *item.resolve(variables), token, pacing)
+                except StopUser:
+                    raise
+                except Exception as e:
+                    # E.g. a template variable the user has not extracted yet: record
+                    # a failed request and carry on, as a failing Locust task does
+                    self.stats.record(FLOW_REQUEST_TYPE if is_flow else item.method, item.name, 0, 0, repr(e))
+                await asyncio.sleep(random.uniform(self.wait_min, self.wait_max))
+        except StopUser:
+            # A `unique` feeder ran out of rows
+            pass
+        finally:
+            self.user_count -= 1
+
+    async def spawn(self, users, spawn_rate, tasks):
+        started = time.monotonic()
+        while len(tasks) < users:
+            due = min(users, max(int((time.monotonic() - started) * spawn_rate), 1))
+            while len(tasks) < due:
+                tasks.append(asyncio.create_task(self.virtual_user()))
+            await asyncio.sleep(min(0.1, 1 / spawn_rate))
+
+    async def write_history(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HISTORY_COLUMNS)
+            while True:
+                await asyncio.sleep(HISTORY_INTERVAL)
+                writer.writerows(self.stats.history_rows(self.user_count))
+                f.flush()
+
+    async def run(self, users, spawn_rate, run_time, csv_prefix):
+        """
+        Spawn the virtual users, let them run for `run_time` seconds and stop them.
+
+        Returns:
+            Seconds the load ran
+        """
+        connector = aiohttp.TCPConnector(limit=self.settings["connection_limit"], limit_per_host=0,
+                                         ttl_dns_cache=300, force_close=not self.keep_alive)
+        timeout = aiohttp.ClientTimeout(total=self.settings["request_timeout"])
+        tasks = []
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         cookie_jar=aiohttp.DummyCookieJar()) as self.session:
+            history = asyncio.create_task(self.write_history(f"{csv_prefix}_stats_history.csv"))
+            spawner = asyncio.create_task(self.spawn(users, spawn_rate, tasks))
+            started = time.time()
+            self.stats.started_at = started
+            await asyncio.sleep(run_time)
+            duration = time.time() - started
+
+            # Stop the history first, so it gets no rows for a draining user count
+            history.cancel()
+            spawner.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(history, spawner, *tasks, return_exceptions=True)
+        return duration
+
+
+def parse_args(argv=None):
+    """
+    Parse command line options; they mirror the Locust options runner/run.py passes.
+    """
+    parser = argparse.ArgumentParser(description="Run a scenario on the asyncio load engine")
+    parser.add_argument("-u", "--users", type=int, required=True)
+    parser.add_argument("-r", "--spawn-rate", type=float, required=True)
+    parser.add_argument("-t", "--run-time", required=True)
+    parser.add_argument("--host", required=True)
+    parser.add_argument("--csv", dest="csv_prefix", required=True, help="Path prefix of the CSV files")
+    return parser.parse_args(argv)
+
+
+def print_summary(stats, duration):
+    print(f"{'Type':<8} {'Name':<40} {'# reqs':>9} {'# fails':>9} {'Avg':>7} {'Min':>7} {'Max':>7} "
+          f"{'Med':>7} {'req/s':>9}")
+    print("-" * 111)
+    for method, name, entry in stats._rows():
+        print(f"{method:<8} {name[:40]:<40} {entry.count:>9,} {entry.failures:>9,} {entry.average():>7.0f} "
+              f"{entry.min_ms or 0:>7.0f} {entry.max_ms:>7.0f} {entry.median():>7} "
+              f"{entry.count / max(duration, 1e-9):>9.1f}")
+
+
+def main(argv=None):
+    """
+    Run the configured scenario and write Locust-compatible CSVs.
+
+    Exits with 1 if any request failed, like Locust's --exit-code-on-error 1.
+    """
+    args = parse_args(argv)
+    config = load_config()
+    scenario = load_scenario(scenario_path())
+    settings = engine_settings(config)
+    try:
+        check_scenario(scenario, config)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if settings["uvloop"]:
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
+    plan = load_plan(scenario_path(), args.host)
+    # Fail before spawning anyone if the credentials are wrong
+    get_shared_token(config)
+    engine = AsyncEngine(plan, config, scenario, settings)
+    duration = asyncio.run(engine.run(args.users, args.spawn_rate, parse_timespan(args.run_time), args.csv_prefix))
+
+    engine.stats.write_csv(args.csv_prefix, duration)
+    reports_dir = os.path.dirname(args.csv_prefix)
+    save_histograms(os.path.join(reports_dir, HISTOGRAM_FILE), engine.stats.histograms())
+    save_histograms(os.path.join(reports_dir, FAILED_HISTOGRAM_FILE), engine.stats.failed)
+    save_histograms(os.path.join(reports_dir, CORRECTED_HISTOGRAM_FILE), engine.corrected)
+    print_summary(engine.stats, duration)
+    sys.exit(1 if engine.stats.total.failures else 0)
+
+
+if __name__ == "__main__":
+    main()
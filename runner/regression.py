@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+
+REPORT_FILE = "performance_report.json"
+INDEX_FILE = ".perf_index.sqlite"
+
+# Metrics compared between runs and the direction that counts as worse
+COMPARED_METRICS = {
+    "p50": "higher",
+    "p95": "higher",
+    "p99": "higher",
+    "error_rate": "higher",
+    "rps": "lower",
+}
+
+# Minimum absolute change for metrics where relative change is misleading
+# (an error rate moving from 0% to 0.01% is an infinite relative change)
+ABSOLUTE_FLOORS = {
+    "error_rate": 1.0,
+}
+
+# Defaults for the regression gate
+DEFAULT_WINDOW = 5
+DEFAULT_MIN_CHANGE_PCT = 10.0
+DEFAULT_Z_THRESHOLD = 3.0
+DEFAULT_MIN_REQUESTS = 100
+
+# Scale factor making the median absolute deviation comparable to a std dev
+MAD_SCALE = 1.4826
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    report_mtime REAL NOT NULL,
+    total_requests INTEGER,
+    requests_per_second REAL,
+    p95 REAL
+);
+CREATE TABLE IF NOT EXISTS endpoint_metrics (
+    run_id TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    endpoint TEXT NOT NULL,
+    requests INTEGER,
+    failures INTEGER,
+    rps REAL,
+    p50 REAL,
+    p95 REAL,
+    p99 REAL,
+    error_rate REAL,
+    PRIMARY KEY (run_id, endpoint)
+);
+"""
+
+
+def open_index(reports_root="reports"):
+    """
+    Open (creating if needed) the SQLite index of all runs under reports_root.
+    """
+    connection = sqlite3.connect(os.path.join(reports_root, INDEX_FILE))
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _endpoint_rows(run_id, report):
+    for metric in report.get("metrics", []):
+        requests = metric["requests"]
+        yield (
+            run_id,
+            f"{metric['method']} {metric['name']}",
+            requests,
+            metric["failures"],
+            metric.get("rps"),
+            metric.get("p50", metric.get("median")),
+            metric["p95"],
+            metric["p99"],
+            metric["failures"] / requests * 100 if requests else 0.0,
+        )
+
+
+def update_index(connection, reports_root="reports"):
+    """
+    Bring the index up to date with the reports folder.
+
+    Only runs whose performance_report.json is new or has changed since it
+    was last indexed are parsed; runs whose folder was deleted are dropped.
+
+    Returns:
+        Number of runs (re)indexed
+    """
+    known = dict(connection.execute("SELECT run_id, report_mtime FROM runs"))
+    seen = set()
+    updated = 0
+
+    for entry in sorted(os.scandir(reports_root), key=lambda e: e.name):
+        report_path = os.path.join(entry.path, REPORT_FILE)
+        if not entry.is_dir() or not os.path.exists(report_path):
+            continue
+        seen.add(entry.name)
+        mtime = os.path.getmtime(report_path)
+        if known.get(entry.name) == mtime:
+            continue
+
+        try:
+            with open(report_path) as f:
+                report = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Skipping unreadable report {report_path}: {e}")
+            continue
+
+        summary = report.get("summary", {})
+        with connection:
+            connection.execute("DELETE FROM runs WHERE run_id = ?", (entry.name,))
+            connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+                (entry.name, mtime, summary.get("total_requests"),
+                 summary.get("requests_per_second"), summary.get("p95_response_time"))
+            )
+            connection.executemany(
+                "INSERT INTO endpoint_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                _endpoint_rows(entry.name, report)
+            )
+        updated += 1
+
+    removed = set(known) - seen
+    if removed:
+        with connection:
+            connection.executemany("DELETE FROM runs WHERE run_id = ?", [(r,) for r in removed])
+    return updated
+
+
+def run_ids(connection):
+    return [row[0] for row in connection.execute("SELECT run_id FROM runs ORDER BY run_id")]
+
+
+def endpoint_metrics(connection, run_id):
+    """
+    Return {endpoint: {metric: value}} for one indexed run.
+    """
+    cursor = connection.execute(
+        "SELECT endpoint, requests, rps, p50, p95, p99, error_rate "
+        "FROM endpoint_metrics WHERE run_id = ?", (run_id,)
+    )
+    columns = [d[0] for d in cursor.description]
+    return {row[0]: dict(zip(columns[1:], row[1:])) for row in cursor}
+
+
+def _is_worse(direction, current, reference):
+    return current > reference if direction == "higher" else current < reference
+
+
+def _change_pct(current, reference):
+    if reference == 0:
+        return float("inf") if current else 0.0
+    return (current - reference) / reference * 100
+
+
+def compare_runs(current, history, min_change_pct=DEFAULT_MIN_CHANGE_PCT,
+                 z_threshold=DEFAULT_Z_THRESHOLD, min_requests=DEFAULT_MIN_REQUESTS):
+    """
+    Compare one run's endpoint metrics against one or more reference runs.
+
+    With a single reference run, a regression is any move in the bad
+    direction larger than min_change_pct. With several, the reference is
+    their median and the move must also be statistically significant: its
+    robust z-score (distance from the median in units of scaled MAD) must
+    exceed z_threshold.
+
+    Returns:
+        List of regression dicts
+    """
+    regressions = []
+    for endpoint, values in sorted(current.items()):
+        if (values["requests"] or 0) < min_requests:
+            continue
+        for metric, direction in COMPARED_METRICS.items():
+            value = values.get(metric)
+            samples = [run[endpoint][metric] for run in history
+                       if endpoint in run and run[endpoint].get(metric) is not None]
+            if value is None or not samples:
+                continue
+
+            reference = statistics.median(samples)
+            change = _change_pct(value, reference)
+            if not _is_worse(direction, value, reference) or abs(change) < min_change_pct:
+                continue
+            if abs(value - reference) < ABSOLUTE_FLOORS.get(metric, 0):
+                continue
+
+            z_score = None
+            if len(samples) >= 3:
+                mad = statistics.median(abs(s - reference) for s in samples) * MAD_SCALE
+                z_score = abs(value - reference) / mad if mad else float("inf")
+                if z_score < z_threshold:
+                    continue
+
+            regressions.append({
+                "endpoint": endpoint,
+                "metric": metric,
+                "current": value,
+                "reference": reference,
+                "change_pct": change,
+                "z_score": z_score,
+                "reference_runs": len(samples),
+            })
+    return regressions
+
+
+def check_regressions(reports_dir=None, baseline=None, window=DEFAULT_WINDOW, reports_root="reports",
+                      min_change_pct=DEFAULT_MIN_CHANGE_PCT, z_threshold=DEFAULT_Z_THRESHOLD):
+    """
+    Compare a run against a baseline run or the median of the previous runs.
+
+    Args:
+        reports_dir: Run folder to check (default: the most recent run)
+        baseline: Run id (folder name) to compare against instead of history
+        window: Number of previous runs whose median forms the reference
+
+    Returns:
+        True if no regressions were found
+    """
+    connection = open_index(reports_root)
+    updated = update_index(connection, reports_root)
+    runs = run_ids(connection)
+    print(f"📚 Indexed {len(runs)} run(s) ({updated} new or changed)")
+
+    current_id = os.path.basename(os.path.normpath(reports_dir)) if reports_dir else (runs[-1] if runs else None)
+    if current_id not in runs:
+        print(f"Error: Run {current_id} has no {REPORT_FILE} to compare")
+        return False
+
+    if baseline:
+        if baseline not in runs:
+            print(f"Error: Baseline run {baseline} not found under {reports_root}/")
+            return False
+        reference_ids = [baseline]
+    else:
+        previous = [r for r in runs if r < current_id]
+        reference_ids = previous[-window:]
+    if not reference_ids:
+        print("ℹ️  No earlier runs to compare against, skipping regression check")
+        return True
+
+    label = f"baseline {baseline}" if baseline else f"median of last {len(reference_ids)} run(s)"
+    print(f"🔍 Comparing {current_id} against {label}")
+
+    regressions = compare_runs(
+        endpoint_metrics(connection, current_id),
+        [endpoint_metrics(connection, r) for r in reference_ids],
+        min_change_pct=min_change_pct,
+        z_threshold=z_threshold,
+    )
+    connection.close()
+
+    if regressions:
+        print("❌ Performance Regressions Found:")
+        for r in regressions:
+            z = f", z={r['z_score']:.1f}" if r["z_score"] is not None else ""
+            print(f"  - {r['endpoint']} {r['metric']}: {r['current']:.2f} vs {r['reference']:.2f} "
+                  f"({r['change_pct']:+.1f}%{z})")
+        return False
+
+    print("✅ No performance regressions detected")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect performance regressions across runs in reports/")
+    parser.add_argument("--run", help="Run folder to check (default: most recent run)")
+    parser.add_argument("--baseline", help="Run id (folder name) to compare against")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help="Number of previous runs whose median is the reference")
+    parser.add_argument("--min-change", type=float, default=DEFAULT_MIN_CHANGE_PCT,
+                        help="Minimum change in percent to count as a regression")
+    parser.add_argument("--z", type=float, default=DEFAULT_Z_THRESHOLD,
+                        help="Robust z-score required when comparing against several runs")
+    parser.add_argument("--reports-root", default="reports")
+    args = parser.parse_args()
+
+    ok = check_regressions(
+        reports_dir=args.run,
+        baseline=args.baseline,
+        window=args.window,
+        reports_root=args.reports_root,
+        min_change_pct=args.min_change,
+        z_threshold=args.z,
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
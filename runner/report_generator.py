@@ -1,9 +1,87 @@
 import csv
+import html
 import json
 import os
+import re
+import sys
 from datetime import datetime
 from pathlib import Path
 
+# Make top-level packages (config/, metrics/) importable when run as `python runner/...`
+ROOT_DIR = str(Path(__file__).resolve().parent.parent)
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from config.loader import config_path as default_config_path, load_config
+from metrics.artifacts import (ARRIVAL_FILE, CAPACITY_FILE, CONNECTION_PHASES, CORRECTED_HISTOGRAM_FILE,
+                               FAILED_HISTOGRAM_FILE, FLOW_REQUEST_TYPE, GENERATOR_HEALTH_FILE, HISTOGRAM_FILE,
+                               INTENDED_HISTOGRAM_FILE, PHASE_HISTOGRAM_FILES, REPLAY_FILE, SAMPLES_DIR)
+from metrics.hdr_histogram import MICROS_PER_MS, load_histograms, merge_all
+from report_template import chart_script, data_script, render_to_file
+
+# Failures of scenario response checks (locustfiles/response_checks.py), as Locust records them
+CHECK_FAILURE = re.compile(r"""^CheckFailed\((['"])(\w+): (.*)\1\)$""")
+
+# Percentiles reported from HDR histograms
+REPORT_PERCENTILES = (50, 95, 99, 99.9)
+
+# Upper bound on points per time-series chart; longer runs are downsampled
+MAX_CHART_POINTS = 1000
+
+# Endpoints drawn in the time-series charts, busiest first
+MAX_TIMESERIES_ENDPOINTS = 8
+
+# Page template in runner/templates
+HTML_TEMPLATE = "performance_report.html"
+
+# Columns of the endpoint table embedded in the HTML report data
+ENDPOINT_COLUMNS = ("name", "method", "requests", "failures", "average", "min", "max", "p95", "p99", "failure_rate")
+
+# Defaults for the `report` section of config/env.yaml
+DEFAULT_REPORT_SETTINGS = {
+    # true, false, or auto: gzip the embedded data once it exceeds COMPRESS_DATA_BYTES
+    "compress_data": "auto",
+    # inline: embed the chart script in each report; shared: link one content-hashed copy in reports/_assets
+    "chart_assets": "inline",
+}
+
+# Closing markup of the server-side section tables, yielded after their rows
+TABLE_END = """
+                        </tbody>
+                    </table>"""
+SECTION_END = """
+                </div>
+"""
+
+# Estimated embedded data size above which `compress_data: auto` gzips it
+COMPRESS_DATA_BYTES = 512 * 1024
+
+def load_report_settings(config_path=None):
+    """
+    Load the `report` section of the environment config.
+    """
+    settings = dict(DEFAULT_REPORT_SETTINGS)
+    config_path = config_path or default_config_path()
+    if os.path.exists(config_path):
+        settings.update(load_config(config_path).get("report") or {})
+    return settings
+
+def should_compress_data(settings, metrics, timeseries=None):
+    """
+    Decide whether to gzip the data embedded in the HTML report.
+
+    `auto` compresses once the estimated blob size passes COMPRESS_DATA_BYTES:
+    roughly 100 bytes per endpoint row plus 10 bytes per charted value.
+    """
+    compress = settings["compress_data"]
+    if compress != "auto":
+        return bool(compress)
+    estimate = 100 * len(metrics)
+    if timeseries:
+        points = min(len(timeseries['offsets']), MAX_CHART_POINTS)
+        estimate += 10 * points * 5 * (min(len(timeseries['endpoints']), MAX_TIMESERIES_ENDPOINTS + 1))
+    return estimate > COMPRESS_DATA_BYTES
+
 def parse_csv_reports(reports_dir="reports"):
     """
     Parse Locust CSV reports and extract metrics.
@@ -18,613 +96,957 @@ def parse_csv_reports(reports_dir="reports"):
         reader = csv.DictReader(f)
         for row in reader:
             if row['Name'] != 'Aggregated':
+                requests = int(row['Request Count'])
+                failures = int(row['Failure Count'])
                 metrics.append({
                     'name': row['Name'],
                     'method': row['Type'],
-                    'requests': int(row['Request Count']),
-                    'failures': int(row['Failure Count']),
+                    'requests': requests,
+                    'failures': failures,
                     'median': float(row['Median Response Time']),
                     'average': float(row['Average Response Time']),
                     'min': float(row['Min Response Time']),
                     'max': float(row['Max Response Time']),
                     'p95': float(row['95%']),
                     'p99': float(row['99%']),
-                    'failure_rate': float(row['Failures/s'])
+                    'rps': float(row['Requests/s']),
+                    'failure_rate': failures / requests * 100 if requests else 0.0
                 })
     
     return metrics
 
-def calculate_statistics(metrics):
+def parse_aggregated_row(reports_dir="reports"):
     """
-    Calculate aggregate statistics across all requests.
+    Return the Aggregated row of the Locust stats CSV, or None if absent.
     """
-    total_requests = sum(m['requests'] for m in metrics)
-    total_failures = sum(m['failures'] for m in metrics)
-    
-    return {
-        'total_requests': total_requests,
-        'total_failures': total_failures,
-        'success_rate': ((total_requests - total_failures) / total_requests * 100) if total_requests > 0 else 0,
-        'avg_response_time': sum(m['average'] * m['requests'] for m in metrics) / total_requests if total_requests > 0 else 0,
-        'max_response_time': max(m['max'] for m in metrics) if metrics else 0,
-        'min_response_time': min(m['min'] for m in metrics) if metrics else 0,
-        'p95_response_time': max(m['p95'] for m in metrics) if metrics else 0,
-        'p99_response_time': max(m['p99'] for m in metrics) if metrics else 0,
-    }
+    stats_file = f"{reports_dir}/results_stats.csv"
+    if not os.path.exists(stats_file):
+        return None
+    with open(stats_file) as f:
+        for row in csv.DictReader(f):
+            if row['Name'] == 'Aggregated':
+                return row
+    return None
 
-def generate_html_report(metrics, stats):
+def load_latency_histograms(reports_dir="reports"):
     """
-    Generate a comprehensive HTML report with interactive charts.
+    Load the per-endpoint HDR histograms written during the run.
+
+    Returns:
+        Dict mapping "METHOD\tName" to HdrHistogram, or None if not recorded
     """
-    now = datetime.now()
-    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
-    date_display = now.strftime("%B %d, %Y")
-    time_display = now.strftime("%I:%M:%S %p")
-    
-    # Prepare data for charts
-    endpoint_names = [m['name'] for m in metrics]
-    endpoint_requests = [m['requests'] for m in metrics]
-    endpoint_avg_times = [round(m['average'], 0) for m in metrics]
-    endpoint_p95_times = [round(m['p95'], 0) for m in metrics]
-    endpoint_failures = [round(m['failure_rate'], 2) for m in metrics]
-    
-    # Convert to JSON for JavaScript
-    import json as json_module
-    names_json = json_module.dumps(endpoint_names)
-    requests_json = json_module.dumps(endpoint_requests)
-    avg_times_json = json_module.dumps(endpoint_avg_times)
-    p95_times_json = json_module.dumps(endpoint_p95_times)
-    failures_json = json_module.dumps(endpoint_failures)
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>API Performance Test Report</title>
-        <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-        <style>
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-            
-            body {{
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-            }}
-            
-            .container {{
-                max-width: 1600px;
-                margin: 0 auto;
-                background: white;
-                border-radius: 12px;
-                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                overflow: hidden;
-            }}
-            
-            .header {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 40px 30px;
-                text-align: center;
-            }}
-            
-            .header h1 {{
-                font-size: 2.5em;
-                margin-bottom: 10px;
-            }}
-            
-            .header p {{
-                opacity: 0.9;
-                font-size: 1.1em;
-            }}
-            
-            .content {{
-                padding: 40px 30px;
-            }}
-            
-            .timestamp {{
-                text-align: center;
-                color: #666;
-                margin-bottom: 30px;
-                font-size: 0.95em;
-                padding: 15px;
-                background: #f9fafb;
-                border-left: 4px solid #667eea;
-                border-radius: 4px;
-            }}
-            
-            .timestamp strong {{
-                color: #333;
-                font-weight: 600;
-            }}
-            
-            .timestamp small {{
-                color: #999;
-                font-family: monospace;
-            }}
-            
-            .summary-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(280px, 1fr));
-                gap: 20px;
-                margin-bottom: 40px;
-            }}
-            
-            .summary-card {{
-                background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-                padding: 25px;
-                border-radius: 10px;
-                border-left: 5px solid #667eea;
-                box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-            }}
-            
-            .charts-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(500px, 1fr));
-                gap: 30px;
-                margin-bottom: 40px;
-            }}
-            
-            .chart-container {{
-                background: #f9fafb;
-                padding: 25px;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-                border: 1px solid #e5e7eb;
-            }}
-            
-            .chart-container h3 {{
-                color: #333;
-                margin-bottom: 15px;
-                font-size: 1.1em;
-            }}
-            
-            .chart-canvas {{
-                position: relative;
-                height: 350px;
-            }}
-            
-            .summary-card.success {{
-                border-left-color: #10b981;
-            }}
-            
-            .summary-card.warning {{
-                border-left-color: #f59e0b;
-            }}
-            
-            .summary-card.error {{
-                border-left-color: #ef4444;
-            }}
-            
-            .summary-card h3 {{
-                color: #333;
-                font-size: 0.9em;
-                font-weight: 600;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-                margin-bottom: 10px;
-                opacity: 0.7;
-            }}
-            
-            .summary-card .value {{
-                font-size: 2.5em;
-                font-weight: bold;
-                color: #667eea;
-            }}
-            
-            .summary-card.success .value {{
-                color: #10b981;
-            }}
-            
-            .summary-card.error .value {{
-                color: #ef4444;
-            }}
-            
-            .summary-card .unit {{
-                font-size: 0.4em;
-                opacity: 0.7;
-                margin-left: 5px;
-            }}
-            
-            .section {{
-                margin-bottom: 40px;
-            }}
-            
-            .section-title {{
-                font-size: 1.5em;
-                color: #333;
-                margin-bottom: 20px;
-                padding-bottom: 10px;
-                border-bottom: 3px solid #667eea;
-            }}
-            
-            .metrics-table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-top: 20px;
-                overflow-x: auto;
-            }}
-            
-            .metrics-table th {{
-                background: #f3f4f6;
-                padding: 15px;
-                text-align: left;
-                font-weight: 600;
-                color: #333;
-                border-bottom: 2px solid #e5e7eb;
-            }}
-            
-            .metrics-table td {{
-                padding: 15px;
-                border-bottom: 1px solid #e5e7eb;
-            }}
-            
-            .metrics-table tr:hover {{
-                background: #f9fafb;
-            }}
-            
-            .method-badge {{
-                display: inline-block;
-                padding: 5px 12px;
-                border-radius: 20px;
-                font-size: 0.85em;
-                font-weight: 600;
-            }}
-            
-            .method-badge.get {{
-                background: #dbeafe;
-                color: #1e40af;
-            }}
-            
-            .method-badge.post {{
-                background: #dcfce7;
-                color: #15803d;
-            }}
-            
-            .method-badge.put {{
-                background: #fef3c7;
-                color: #92400e;
-            }}
-            
-            .method-badge.delete {{
-                background: #fee2e2;
-                color: #b91c1c;
-            }}
-            
-            .status-badge {{
-                display: inline-block;
-                padding: 5px 12px;
-                border-radius: 20px;
-                font-size: 0.85em;
-                font-weight: 600;
-            }}
-            
-            .status-badge.success {{
-                background: #dcfce7;
-                color: #15803d;
-            }}
-            
-            .status-badge.warning {{
-                background: #fef3c7;
-                color: #92400e;
-            }}
-            
-            .status-badge.error {{
-                background: #fee2e2;
-                color: #b91c1c;
-            }}
-            
-            .footer {{
-                background: #f9fafb;
-                padding: 20px 30px;
-                text-align: center;
-                color: #666;
-                border-top: 1px solid #e5e7eb;
-                font-size: 0.9em;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🚀 API Performance Test Report</h1>
-                <p>Load Testing Analysis & Metrics</p>
-            </div>
-            
-            <div class="content">
-                <div class="timestamp">
-                    <strong>Generated on:</strong> {date_display} at {time_display}
-                    <br><small>({timestamp})</small>
-                </div>
-                
-                <div class="summary-grid">
-                    <div class="summary-card success">
-                        <h3>Total Requests</h3>
-                        <div class="value">{stats['total_requests']:,.0f}</div>
-                    </div>
-                    
-                    <div class="summary-card {'success' if stats['success_rate'] >= 99 else 'warning' if stats['success_rate'] >= 95 else 'error'}">
-                        <h3>Success Rate</h3>
-                        <div class="value">{stats['success_rate']:.2f}<span class="unit">%</span></div>
-                    </div>
-                    
-                    <div class="summary-card error">
-                        <h3>Failed Requests</h3>
-                        <div class="value">{stats['total_failures']:,.0f}</div>
-                    </div>
-                    
-                    <div class="summary-card">
-                        <h3>Average Response Time</h3>
-                        <div class="value">{stats['avg_response_time']:.0f}<span class="unit">ms</span></div>
-                    </div>
-                    
-                    <div class="summary-card">
-                        <h3>P95 Response Time</h3>
-                        <div class="value">{stats['p95_response_time']:.0f}<span class="unit">ms</span></div>
-                    </div>
-                    
-                    <div class="summary-card">
-                        <h3>Max Response Time</h3>
-                        <div class="value">{stats['max_response_time']:.0f}<span class="unit">ms</span></div>
-                    </div>
-                </div>
-                
-                <div class="section">
-                    <h2 class="section-title">📈 Performance Visualizations</h2>
-                    <div class="charts-grid">
-                        <div class="chart-container">
-                            <h3>📊 Request Distribution by Endpoint</h3>
-                            <div class="chart-canvas">
-                                <canvas id="requestChart"></canvas>
-                            </div>
-                        </div>
-                        
-                        <div class="chart-container">
-                            <h3>⏱️ Average Response Time by Endpoint</h3>
-                            <div class="chart-canvas">
-                                <canvas id="avgTimeChart"></canvas>
-                            </div>
-                        </div>
-                        
-                        <div class="chart-container">
-                            <h3>🚀 P95 Response Time Comparison</h3>
-                            <div class="chart-canvas">
-                                <canvas id="p95Chart"></canvas>
-                            </div>
-                        </div>
-                        
-                        <div class="chart-container">
-                            <h3>❌ Failure Rate by Endpoint</h3>
-                            <div class="chart-canvas">
-                                <canvas id="failureChart"></canvas>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                
+    path = f"{reports_dir}/{HISTOGRAM_FILE}"
+    if not os.path.exists(path):
+        return None
+    return load_histograms(path)
+
+def load_failed_histograms(reports_dir="reports"):
+    """
+    Load the per-endpoint histograms of failed requests.
+
+    Returns:
+        Dict mapping "METHOD\tName" to HdrHistogram, or None for runs
+        recorded before failures were kept in histograms
+    """
+    path = f"{reports_dir}/{FAILED_HISTOGRAM_FILE}"
+    if not os.path.exists(path):
+        return None
+    return load_histograms(path)
+
+def split_flows(metrics, histograms=None):
+    """
+    Separate flow transactions from single requests.
+
+    Flow timings already contain their steps' requests, so they are kept
+    out of request totals and aggregate percentiles.
+
+    Returns:
+        Tuple of (request metrics, flow metrics, request-only histograms)
+    """
+    requests = [m for m in metrics if m['method'] != FLOW_REQUEST_TYPE]
+    flows = [m for m in metrics if m['method'] == FLOW_REQUEST_TYPE]
+    if histograms:
+        histograms = {key: h for key, h in histograms.items()
+                      if not key.startswith(f"{FLOW_REQUEST_TYPE}\t")}
+    return requests, flows, histograms
+
+def flows_section(flows):
+    """
+    Yield the "Flow Transactions" section, one row at a time.
+    """
+    yield """
                 <div class="section">
-                    <h2 class="section-title">📊 Detailed Metrics by Endpoint</h2>
+                    <h2 class="section-title">🔗 Flow Transactions</h2>
                     <table class="metrics-table">
                         <thead>
                             <tr>
-                                <th>Endpoint</th>
-                                <th>Method</th>
-                                <th>Requests</th>
-                                <th>Failures</th>
+                                <th>Flow</th>
+                                <th>Completed</th>
+                                <th>Failed</th>
                                 <th>Avg (ms)</th>
-                                <th>Min (ms)</th>
-                                <th>Max (ms)</th>
                                 <th>P95 (ms)</th>
                                 <th>P99 (ms)</th>
                                 <th>Failure Rate</th>
                             </tr>
                         </thead>
-                        <tbody>
-"""
-    
-    for metric in metrics:
-        method_class = metric['method'].lower()
-        failure_rate = metric['failure_rate']
+                        <tbody>"""
+    for flow in flows:
+        failure_rate = flow['failures'] / flow['requests'] * 100 if flow['requests'] else 0
         status_class = 'success' if failure_rate == 0 else 'warning' if failure_rate < 5 else 'error'
-        
-        html_content += f"""
+        yield f"""
                             <tr>
-                                <td><strong>{metric['name']}</strong></td>
-                                <td><span class="method-badge {method_class}">{metric['method']}</span></td>
-                                <td>{metric['requests']:,}</td>
-                                <td>{metric['failures']}</td>
-                                <td>{metric['average']:.0f}</td>
-                                <td>{metric['min']:.0f}</td>
-                                <td>{metric['max']:.0f}</td>
-                                <td>{metric['p95']:.0f}</td>
-                                <td>{metric['p99']:.0f}</td>
+                                <td><strong>{html.escape(flow['name'])}</strong></td>
+                                <td>{flow['requests']:,}</td>
+                                <td>{flow['failures']}</td>
+                                <td>{flow['average']:.0f}</td>
+                                <td>{flow['p95']:.0f}</td>
+                                <td>{flow['p99']:.0f}</td>
                                 <td><span class="status-badge {status_class}">{failure_rate:.2f}%</span></td>
-                            </tr>
-"""
-    
-    html_content += """
-                        </tbody>
-                    </table>
+                            </tr>"""
+    yield TABLE_END + SECTION_END
+
+def load_generator_health(reports_dir="reports"):
+    """
+    Load the load generator health summary, if it was recorded.
+
+    Returns:
+        Health dict (see locustfiles/generator_monitor.py) without the raw
+        samples, or None
+    """
+    path = f"{reports_dir}/{GENERATOR_HEALTH_FILE}"
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        health = json.load(f)
+    # Per-second samples are kept in generator_health.json only
+    for generator in health['generators'].values():
+        generator.pop('samples', None)
+    return health
+
+def saturation_banner(health):
+    """
+    Render the warning shown above the summary when a generator was saturated.
+    """
+    if not health or not health['saturated']:
+        return ""
+    items = "".join(f"<li>{html.escape(warning)}</li>" for warning in health['warnings'])
+    return f"""
+                <div class="saturation-warning">
+                    <strong>⚠️ Load generator saturated: latencies below may measure the generator, not the target.</strong>
+                    <ul>{items}</ul>
+                    Add workers or lower the load per worker and rerun.
                 </div>
-                
+"""
+
+def generator_health_section(health):
+    """
+    Yield the "Load Generator Health" section, one row at a time.
+    """
+    thresholds = health['thresholds']
+    yield f"""
                 <div class="section">
-                    <h2 class="section-title">📈 Response Time Summary</h2>
+                    <h2 class="section-title">🖥️ Load Generator Health</h2>
+                    <p>A sample is saturated at CPU ≥ {thresholds['cpu_percent']}% or event loop lag ≥ {thresholds['loop_lag_ms']}ms;
+                    a generator is flagged when {thresholds['saturated_share'] * 100:.0f}% of its samples after the spawn phase are.</p>
                     <table class="metrics-table">
-                        <tbody>
-"""
-    
-    html_content += f"""
+                        <thead>
                             <tr>
-                                <td><strong>Min Response Time</strong></td>
-                                <td>{stats['min_response_time']:.0f} ms</td>
+                                <th>Generator</th>
+                                <th>CPU Avg</th>
+                                <th>CPU Max</th>
+                                <th>RSS Max (MB)</th>
+                                <th>Loop Lag P99 (ms)</th>
+                                <th>Loop Lag Max (ms)</th>
+                                <th>Max Users</th>
+                                <th>Saturated</th>
                             </tr>
+                        </thead>
+                        <tbody>"""
+    for name, generator in health['generators'].items():
+        summary = generator['summary']
+        status_class = 'error' if summary['saturated'] else 'success'
+        yield f"""
+                            <tr>
+                                <td><strong>{html.escape(name)}</strong></td>
+                                <td>{summary['cpu_avg_percent']:.0f}%</td>
+                                <td>{summary['cpu_max_percent']:.0f}%</td>
+                                <td>{summary['rss_max_mb']:.0f}</td>
+                                <td>{summary['loop_lag_p99_ms']:.1f}</td>
+                                <td>{summary['loop_lag_max_ms']:.1f}</td>
+                                <td>{summary['greenlets_max']:,}</td>
+                                <td><span class="status-badge {status_class}">{summary['saturated_share'] * 100:.0f}%</span></td>
+                            </tr>"""
+    yield TABLE_END + SECTION_END
+
+def load_arrival_rate(reports_dir="reports"):
+    """
+    Load the open-loop arrival summary and intended-time latency percentiles.
+
+    Returns:
+        Arrival dict (see locustfiles/arrival_rate.py) with an added
+        'intended_latency' section, or None for closed-loop runs
+    """
+    path = f"{reports_dir}/{ARRIVAL_FILE}"
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        arrival = json.load(f)
+
+    intended = load_intended_latency(reports_dir)
+    if intended:
+        arrival['intended_latency'] = intended
+    return arrival
+
+def percentile_values(histogram):
+    values = histogram.percentiles_ms(REPORT_PERCENTILES)
+    return {f"p{p}".replace('.', ''): v for p, v in values.items()}
+
+def load_intended_latency(reports_dir="reports"):
+    """
+    Latency percentiles measured from the intended send times, per endpoint
+    and aggregated; None when no intended-time histograms were recorded.
+    """
+    histogram_path = f"{reports_dir}/{INTENDED_HISTOGRAM_FILE}"
+    if not os.path.exists(histogram_path):
+        return None
+    histograms = load_histograms(histogram_path)
+    intended = {}
+    for key, histogram in sorted(histograms.items()):
+        intended[key.replace('\t', ' ')] = percentile_values(histogram)
+    intended['Aggregated'] = percentile_values(merge_all(histograms.values()))
+    return intended
+
+def intended_latency_table(intended):
+    """
+    Yield the "Latency from Intended Send Time" table, one row at a time;
+    nothing without intended-time latencies.
+    """
+    if not intended:
+        return
+    yield """
+                    <h3>Latency from Intended Send Time</h3>
+                    <table class="metrics-table">
+                        <thead>
+                            <tr>
+                                <th>Endpoint</th>
+                                <th>P50 (ms)</th>
+                                <th>P95 (ms)</th>
+                                <th>P99 (ms)</th>
+                                <th>P99.9 (ms)</th>
+                            </tr>
+                        </thead>
+                        <tbody>"""
+    for name, values in intended.items():
+        yield f"""
+                            <tr>
+                                <td><strong>{html.escape(name)}</strong></td>
+                                <td>{values['p50']:.0f}</td>
+                                <td>{values['p95']:.0f}</td>
+                                <td>{values['p99']:.0f}</td>
+                                <td>{values['p999']:.0f}</td>
+                            </tr>"""
+    yield TABLE_END
+
+def arrival_rate_section(arrival):
+    """
+    Yield the open-loop "Arrival Rate" section, one row at a time.
+    """
+    yield f"""
+                <div class="section">
+                    <h2 class="section-title">🚦 Open-Loop Arrival Rate ({html.escape(arrival['process'])})</h2>
+                    <table class="metrics-table">
+                        <thead>
+                            <tr>
+                                <th>Stream</th>
+                                <th>Target (req/s)</th>
+                                <th>Achieved (req/s)</th>
+                                <th>Dispatched</th>
+                                <th>Shortfall</th>
+                                <th>Send Lag P99 (ms)</th>
+                                <th>Send Lag Max (ms)</th>
+                            </tr>
+                        </thead>
+                        <tbody>"""
+    for name, stream in list(arrival['streams'].items()) + [('Total', arrival['total'])]:
+        shortfall = stream['shortfall_pct']
+        status_class = 'success' if shortfall < 1 else 'warning' if shortfall < 5 else 'error'
+        yield f"""
+                            <tr>
+                                <td><strong>{html.escape(name)}</strong></td>
+                                <td>{stream['target_rps']:.1f}</td>
+                                <td>{stream['achieved_rps']:.1f}</td>
+                                <td>{stream['dispatched']:,}</td>
+                                <td><span class="status-badge {status_class}">{shortfall:.1f}%</span></td>
+                                <td>{stream['send_lag_p99_ms']:.0f}</td>
+                                <td>{stream['send_lag_max_ms']:.0f}</td>
+                            </tr>"""
+    yield TABLE_END
+    yield from intended_latency_table(arrival.get('intended_latency'))
+    yield SECTION_END
+
+def load_corrected_latency(reports_dir="reports"):
+    """
+    Compare raw latency with latency corrected for coordinated omission.
+
+    Returns:
+        Dict of endpoint ("METHOD Name", plus 'Aggregated' over requests) to
+        'raw' and 'corrected' percentiles and the number of 'backfilled'
+        samples, or None if no corrected histograms were recorded
+    """
+    raw_path = f"{reports_dir}/{HISTOGRAM_FILE}"
+    corrected_path = f"{reports_dir}/{CORRECTED_HISTOGRAM_FILE}"
+    if not os.path.exists(raw_path) or not os.path.exists(corrected_path):
+        return None
+    raw = load_histograms(raw_path)
+    corrected = {key: h for key, h in load_histograms(corrected_path).items()
+                 if key in raw and not key.startswith(f"{FLOW_REQUEST_TYPE}\t")}
+    if not corrected:
+        return None
+
+    latency = {}
+    pairs = [(key.replace('\t', ' '), raw[key], histogram) for key, histogram in sorted(corrected.items())]
+    pairs.append(('Aggregated', merge_all(raw[key] for key in corrected), merge_all(corrected.values())))
+    for name, raw_histogram, corrected_histogram in pairs:
+        latency[name] = {
+            'raw': percentile_values(raw_histogram),
+            'corrected': percentile_values(corrected_histogram),
+            'backfilled': max(corrected_histogram.total_count - raw_histogram.total_count, 0),
+        }
+    return latency
+
+def corrected_latency_section(latency):
+    """
+    Yield the "Coordinated Omission" section, one row at a time: raw next
+    to corrected percentiles.
+    """
+    yield """
+                <div class="section">
+                    <h2 class="section-title">⏳ Coordinated Omission</h2>
+                    <p>Users wait for each response, so a stall is sampled once per user. Corrected
+                    latency back-fills the requests each user would have sent meanwhile.</p>
+                    <table class="metrics-table">
+                        <thead>
+                            <tr>
+                                <th>Endpoint</th>
+                                <th>Back-filled Samples</th>
+                                <th>P50 Raw / Corrected (ms)</th>
+                                <th>P95 Raw / Corrected (ms)</th>
+                                <th>P99 Raw / Corrected (ms)</th>
+                                <th>P99.9 Raw / Corrected (ms)</th>
+                            </tr>
+                        </thead>
+                        <tbody>"""
+    for name, entry in latency.items():
+        raw, corrected = entry['raw'], entry['corrected']
+        cells = "".join(f"""
+                                <td>{raw[key]:.0f} / <strong>{corrected[key]:.0f}</strong></td>"""
+                        for key in ('p50', 'p95', 'p99', 'p999'))
+        yield f"""
+                            <tr>
+                                <td><strong>{html.escape(name)}</strong></td>
+                                <td>{entry['backfilled']:,}</td>{cells}
+                            </tr>"""
+    yield TABLE_END + SECTION_END
+
+def load_replay(reports_dir="reports"):
+    """
+    Load the traffic replay summary and intended-time latency percentiles.
+
+    Returns:
+        Replay dict (see locustfiles/replay.py) with an added
+        'intended_latency' section, or None if no capture was replayed
+    """
+    path = f"{reports_dir}/{REPLAY_FILE}"
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        replay = json.load(f)
+
+    intended = load_intended_latency(reports_dir)
+    if intended:
+        replay['intended_latency'] = intended
+    return replay
+
+def replay_section(replay):
+    """
+    Yield the "Traffic Replay" section: how closely the sends followed the capture.
+    """
+    lag = replay['send_lag_p99_ms']
+    status_class = 'success' if lag < 100 else 'warning' if lag < 1000 else 'error'
+    items = [
+        ("Capture", f"{html.escape(replay['file'])} ({replay['format'].replace('_', ' ')}, {replay['speed']:g}x speed)"),
+        ("Load Generators", f"{replay['generators']}"),
+        ("Replayed Requests", f"{replay['sent']:,}" + ("" if replay['completed'] else " (stopped before the end)")),
+        ("Skipped / Reordered Records", f"{replay['skipped']:,} / {replay['reordered']:,}"),
+        ("Capture Time Covered", f"{replay['capture_span_s']:.1f} s"),
+        ("Scheduled / Actual Span", f"{replay['scheduled_span_s']:.1f} s / {replay['actual_span_s']:.1f} s "
+                                    f"({replay['span_drift_pct']:+.1f}%)"),
+        ("Send Lag P50 / P99 / Max", f"{replay['send_lag_p50_ms']:.0f} / "
+                                     f"<span class=\"status-badge {status_class}\">{lag:.0f}</span> / "
+                                     f"{replay['send_lag_max_ms']:.0f} ms"),
+        ("Final Drift", f"{replay['final_drift_ms']:.0f} ms"),
+    ]
+    yield """
+                <div class="section">
+                    <h2 class="section-title">📼 Traffic Replay</h2>
+                    <table class="metrics-table">
+                        <tbody>"""
+    for label, value in items:
+        yield f"""
                             <tr>
-                                <td><strong>Average Response Time</strong></td>
-                                <td>{stats['avg_response_time']:.0f} ms</td>
+                                <td><strong>{label}</strong></td>
+                                <td>{value}</td>
+                            </tr>"""
+    yield TABLE_END
+    yield from intended_latency_table(replay.get('intended_latency'))
+    yield SECTION_END
+
+def phase_summary(histograms):
+    """
+    Counts and percentiles of one endpoint's connection phases.
+
+    Args:
+        histograms: Dict of phase to HdrHistogram, or None if the phase never happened
+    """
+    entry = {}
+    for phase, histogram in histograms.items():
+        count = histogram.total_count if histogram else 0
+        entry[f"{phase}_count"] = count
+        values = histogram.percentiles_ms(REPORT_PERCENTILES) if count else {}
+        for p in REPORT_PERCENTILES:
+            entry[f"{phase}_p{p}".replace('.', '')] = values.get(p, 0.0)
+    return entry
+
+def load_connection_timing(reports_dir="reports"):
+    """
+    Load the connection phase histograms: how often each endpoint opened a
+    connection, and the connect, TLS handshake and TTFB percentiles.
+
+    Returns:
+        Dict of endpoint ("METHOD Name", plus 'Aggregated') to phase
+        counts and percentiles, or None if no phases were recorded
+    """
+    phases = {}
+    for phase, file_name in PHASE_HISTOGRAM_FILES.items():
+        path = f"{reports_dir}/{file_name}"
+        phases[phase] = load_histograms(path) if os.path.exists(path) else {}
+    if not phases['ttfb']:
+        return None
+
+    timing = {}
+    for key in sorted(phases['ttfb']):
+        timing[key.replace('\t', ' ')] = phase_summary({phase: phases[phase].get(key) for phase in CONNECTION_PHASES})
+    timing['Aggregated'] = phase_summary({phase: merge_all(phases[phase].values()) for phase in CONNECTION_PHASES})
+    return timing
+
+def connection_timing_section(timing):
+    """
+    Yield the "Connection Timing" section, one row at a time: new
+    connections and where the time before the response headers went.
+    """
+    yield """
+                <div class="section">
+                    <h2 class="section-title">🔌 Connection Timing</h2>
+                    <table class="metrics-table">
+                        <thead>
+                            <tr>
+                                <th>Endpoint</th>
+                                <th>Requests</th>
+                                <th>New Connections</th>
+                                <th>Connect P50 / P95 (ms)</th>
+                                <th>TLS P50 / P95 (ms)</th>
+                                <th>TLS Resumed</th>
+                                <th>TTFB P50 / P95 / P99 (ms)</th>
                             </tr>
+                        </thead>
+                        <tbody>"""
+    for name, entry in timing.items():
+        requests = entry['ttfb_count']
+        new_share = entry['connect_count'] / requests * 100 if requests else 0
+        resumed_share = entry['tls_resumed_count'] / entry['tls_count'] * 100 if entry['tls_count'] else 0
+        connect = f"{entry['connect_p50']:.1f} / {entry['connect_p95']:.1f}" if entry['connect_count'] else "—"
+        tls = f"{entry['tls_p50']:.0f} / {entry['tls_p95']:.0f}" if entry['tls_count'] else "—"
+        yield f"""
+                            <tr>
+                                <td><strong>{html.escape(name)}</strong></td>
+                                <td>{requests:,}</td>
+                                <td>{new_share:.1f}%</td>
+                                <td>{connect}</td>
+                                <td>{tls}</td>
+                                <td>{resumed_share:.0f}%</td>
+                                <td>{entry['ttfb_p50']:.0f} / {entry['ttfb_p95']:.0f} / {entry['ttfb_p99']:.0f}</td>
+                            </tr>"""
+    yield TABLE_END + SECTION_END
+
+def load_check_failures(reports_dir="reports"):
+    """
+    Collect the response check failures from Locust's failures CSV.
+
+    Returns:
+        Dict with the 'total' failed checks, occurrences per 'categories'
+        and the failed 'checks' per endpoint, most frequent first; None if
+        no check failed
+    """
+    path = f"{reports_dir}/results_failures.csv"
+    if not os.path.exists(path):
+        return None
+    checks = []
+    with open(path) as f:
+        for row in csv.DictReader(f):
+            match = CHECK_FAILURE.match(row['Error'])
+            if match:
+                checks.append({
+                    'name': row['Name'],
+                    'method': row['Method'],
+                    'category': match.group(2),
+                    'check': match.group(3),
+                    'occurrences': int(row['Occurrences']),
+                })
+    if not checks:
+        return None
+
+    checks.sort(key=lambda check: -check['occurrences'])
+    categories = {}
+    for check in checks:
+        categories[check['category']] = categories.get(check['category'], 0) + check['occurrences']
+    return {
+        'total': sum(categories.values()),
+        'categories': dict(sorted(categories.items(), key=lambda item: -item[1])),
+        'checks': checks,
+    }
+
+def check_failures_section(check_failures):
+    """
+    Yield the "Response Check Failures" section, one row at a time: which
+    checks failed, per endpoint.
+    """
+    summary = ", ".join(f"{html.escape(category)} {count:,}"
+                        for category, count in check_failures['categories'].items())
+    yield f"""
+                <div class="section">
+                    <h2 class="section-title">🧪 Response Check Failures</h2>
+                    <p>{check_failures['total']:,} responses failed their checks: {summary}</p>
+                    <table class="metrics-table">
+                        <thead>
                             <tr>
-                                <td><strong>P95 Response Time</strong></td>
-                                <td>{stats['p95_response_time']:.0f} ms</td>
+                                <th>Endpoint</th>
+                                <th>Category</th>
+                                <th>Check</th>
+                                <th>Occurrences</th>
                             </tr>
+                        </thead>
+                        <tbody>"""
+    for check in check_failures['checks']:
+        # Check details quote the expected `equals` values from the scenario
+        yield f"""
+                            <tr>
+                                <td><strong>{html.escape(check['method'])} {html.escape(check['name'])}</strong></td>
+                                <td><span class="status-badge error">{html.escape(check['category'])}</span></td>
+                                <td>{html.escape(check['check'])}</td>
+                                <td>{check['occurrences']:,}</td>
+                            </tr>"""
+    yield TABLE_END + SECTION_END
+
+def load_capacity(reports_dir="reports"):
+    """
+    Load the knee-search result, if the run used `load_shape.type: knee`.
+
+    Returns:
+        Capacity dict (see locustfiles/load_shapes.py), or None
+    """
+    path = f"{reports_dir}/{CAPACITY_FILE}"
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def capacity_section(capacity):
+    """
+    Yield the "Capacity" section: max sustainable throughput per endpoint
+    and the outcome of every load step, one row at a time.
+    """
+    if capacity['knee_users'] is None:
+        verdict = "SLAs were already breached at the first step"
+    elif capacity['saturated']:
+        verdict = f"SLAs held up to {capacity['knee_users']} users"
+    else:
+        verdict = f"No SLA breach up to {capacity['knee_users']} users (max_users reached)"
+
+    yield f"""
+                <div class="section">
+                    <h2 class="section-title">🏔️ Capacity</h2>
+                    <p>{verdict}. Maximum sustainable throughput:</p>
+                    <table class="metrics-table">
+                        <thead>
                             <tr>
-                                <td><strong>P99 Response Time</strong></td>
-                                <td>{stats['p99_response_time']:.0f} ms</td>
+                                <th>Endpoint</th>
+                                <th>Max Sustainable (req/s)</th>
                             </tr>
+                        </thead>
+                        <tbody>"""
+    for name, rps in capacity['max_sustainable_rps'].items():
+        yield f"""
+                            <tr>
+                                <td><strong>{html.escape(name)}</strong></td>
+                                <td>{rps:.1f}</td>
+                            </tr>"""
+    yield TABLE_END + """
+                    <h3>Load Steps</h3>
+                    <table class="metrics-table">
+                        <thead>
                             <tr>
-                                <td><strong>Max Response Time</strong></td>
-                                <td>{stats['max_response_time']:.0f} ms</td>
+                                <th>Users</th>
+                                <th>Throughput (req/s)</th>
+                                <th>P95 (ms)</th>
+                                <th>Error Rate</th>
+                                <th>SLA</th>
                             </tr>
-"""
-    
-    html_content += """
-                        </tbody>
-                    </table>
+                        </thead>
+                        <tbody>"""
+    for step in capacity['steps']:
+        aggregated = step['endpoints'].get('Aggregated', {})
+        status_class = 'success' if step['passed'] else 'error'
+        yield f"""
+                            <tr>
+                                <td>{step['users']}</td>
+                                <td>{aggregated.get('rps', 0):.1f}</td>
+                                <td>{aggregated.get('p95_ms', 0):.0f}</td>
+                                <td>{aggregated.get('error_rate', 0):.2f}%</td>
+                                <td><span class="status-badge {status_class}">{'pass' if step['passed'] else html.escape('; '.join(step['breaches']))}</span></td>
+                            </tr>"""
+    yield TABLE_END + SECTION_END
+
+def load_sample_summary(reports_dir="reports"):
+    """
+    Summarize the per-request sample logs, if the run recorded any.
+
+    The logs are memory-mapped and processed with NumPy, so even very large
+    soak tests never materialize per-request Python objects.
+
+    Returns:
+        Summary dict, or None if no samples were recorded
+    """
+    directory = f"{reports_dir}/{SAMPLES_DIR}"
+    if not os.path.isdir(directory):
+        return None
+    try:
+        from metrics.sample_log import summarize_samples
+        return summarize_samples(directory)
+    except ImportError:
+        print("⚠️  numpy is required to analyse sample logs (pip install numpy)")
+        return None
+    except (OSError, ValueError) as e:
+        # A damaged sample log must not cost the rest of the report
+        print(f"⚠️  Could not analyse sample logs: {e}")
+        return None
+
+def load_timeseries(reports_dir="reports"):
+    """
+    Build per-second throughput, error rate and latency series for the run.
+
+    Returns:
+        Time-series dict (see runner/timeseries.py), or None if unavailable
+    """
+    try:
+        from timeseries import build_timeseries
+    except ImportError:
+        print("⚠️  numpy is required for time-series reports (pip install numpy)")
+        return None
+    return build_timeseries(reports_dir)
+
+def timeseries_chart_data(timeseries):
+    """
+    Downsampled series of the busiest endpoints and the aggregate for the charts.
+
+    Every endpoint stays in performance_report.json; the charts only draw
+    the MAX_TIMESERIES_ENDPOINTS endpoints with the most requests.
+    """
+    from timeseries import downsample
+
+    volume = {
+        name: sum(value or 0 for value in entry['rps'])
+        for name, entry in timeseries['endpoints'].items() if name != 'Aggregated'
+    }
+    shown = sorted(volume, key=volume.get, reverse=True)[:MAX_TIMESERIES_ENDPOINTS]
+    if 'Aggregated' in timeseries['endpoints']:
+        shown.append('Aggregated')
+    # Only the charted series are downsampled
+    chart = downsample(dict(timeseries, endpoints={name: timeseries['endpoints'][name] for name in shown}),
+                       MAX_CHART_POINTS)
+    return {
+        'labels': [f"{offset // 60}:{offset % 60:02d}" for offset in chart['offsets']],
+        'series': {
+            name: {key: chart['endpoints'][name][key] for key in ('rps', 'error_rate', 'p50', 'p95', 'p99')}
+            for name in shown
+        },
+        'interval': chart['interval'],
+        'endpoint_count': len(volume),
+    }
+
+def timeseries_section(timeseries, chart_data):
+    """
+    Render the "Performance Over Time" section; the charts are drawn from
+    the report data blob.
+    """
+    shown = len(chart_data['series']) - ('Aggregated' in chart_data['series'])
+    note = ""
+    if shown < chart_data['endpoint_count']:
+        note = f", busiest {shown} of {chart_data['endpoint_count']} endpoints (all in performance_report.json)"
+    return f"""
+                <div class="section">
+                    <h2 class="section-title">⏱️ Performance Over Time</h2>
+                    <p style="color: #666; margin-bottom: 20px;">
+                        {chart_data['interval']}s buckets from {timeseries['source'].replace('_', ' ')}{note}
+                    </p>
+                    <div class="charts-grid">
+                        <div class="chart-container">
+                            <h3>🚀 Throughput (requests/s)</h3>
+                            <div class="chart-canvas" id="rpsOverTimeChart"></div>
+                        </div>
+                        
+                        <div class="chart-container">
+                            <h3>❌ Error Rate (%)</h3>
+                            <div class="chart-canvas" id="errorsOverTimeChart"></div>
+                        </div>
+                        
+                        <div class="chart-container">
+                            <h3>📈 P95 Response Time (ms)</h3>
+                            <div class="chart-canvas" id="p95OverTimeChart"></div>
+                        </div>
+                        
+                        <div class="chart-container">
+                            <h3>📊 Aggregated P50 / P95 / P99 (ms)</h3>
+                            <div class="chart-canvas" id="percentilesOverTimeChart"></div>
+                        </div>
+                    </div>
                 </div>
-            </div>
-            
-            <div class="footer">
-                <p>Generated by API Performance Framework | Powered by Locust</p>
-            </div>
-        </div>
-        
-        <script>
-            // Chart colors
-            const colors = ['#667eea', '#764ba2', '#f093fb', '#4facfe'];
-            const rgbColors = colors.map(c => c + '40'); // Add transparency
-            
-            // Request Distribution Chart
-            const requestCtx = document.getElementById('requestChart').getContext('2d');
-            new Chart(requestCtx, {
-                type: 'doughnut',
-                data: {
-                    labels: """ + names_json + """,
-                    datasets: [{
-                        data: """ + requests_json + """,
-                        backgroundColor: colors,
-                        borderColor: colors,
-                        borderWidth: 2
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    plugins: {
-                        legend: {
-                            position: 'bottom'
-                        }
-                    }
-                }
-            });
-            
-            // Average Response Time Chart
-            const avgTimeCtx = document.getElementById('avgTimeChart').getContext('2d');
-            new Chart(avgTimeCtx, {
-                type: 'bar',
-                data: {
-                    labels: """ + names_json + """,
-                    datasets: [{
-                        label: 'Avg Response Time (ms)',
-                        data: """ + avg_times_json + """,
-                        backgroundColor: colors[0],
-                        borderColor: colors[0],
-                        borderWidth: 2
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    scales: {
-                        y: {
-                            beginAtZero: true,
-                            title: {
-                                display: true,
-                                text: 'Response Time (ms)'
-                            }
-                        }
-                    }
-                }
-            });
-            
-            // P95 Response Time Chart
-            const p95Ctx = document.getElementById('p95Chart').getContext('2d');
-            new Chart(p95Ctx, {
-                type: 'bar',
-                data: {
-                    labels: """ + names_json + """,
-                    datasets: [{
-                        label: 'P95 Response Time (ms)',
-                        data: """ + p95_times_json + """,
-                        backgroundColor: colors[1],
-                        borderColor: colors[1],
-                        borderWidth: 2
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    scales: {
-                        y: {
-                            beginAtZero: true,
-                            title: {
-                                display: true,
-                                text: 'Response Time (ms)'
-                            }
-                        }
-                    }
-                }
-            });
-            
-            // Failure Rate Chart
-            const failureCtx = document.getElementById('failureChart').getContext('2d');
-            new Chart(failureCtx, {
-                type: 'bar',
-                data: {
-                    labels: """ + names_json + """,
-                    datasets: [{
-                        label: 'Failure Rate (%)',
-                        data: """ + failures_json + """,
-                        backgroundColor: colors[2],
-                        borderColor: colors[2],
-                        borderWidth: 2
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    scales: {
-                        y: {
-                            beginAtZero: true,
-                            max: 100,
-                            title: {
-                                display: true,
-                                text: 'Failure Rate (%)'
-                            }
-                        }
-                    }
-                }
-            });
-        </script>
-    </body>
-    </html>
 """
+
+def apply_histograms(metrics, histograms, failed=None):
+    """
+    Replace the Locust CSV figures of each endpoint with its HDR histogram's.
+
+    Locust's final CSV is written before the last worker reports arrive, so
+    every figure of a row is taken from the histogram: request count,
+    average, min, max and percentiles (adding 'p50' and 'p999'), with the
+    request rate rescaled to that count. Failures come from the failed
+    request histograms; runs recorded without them keep the CSV count and
+    get 'failure_source' set to 'locust_csv'.
+    """
+    for metric in metrics:
+        key = f"{metric['method']}\t{metric['name']}"
+        histogram = histograms.get(key)
+        if histogram is None or histogram.total_count == 0:
+            continue
+        count = histogram.total_count
+        if metric['requests']:
+            metric['rps'] = metric['rps'] * count / metric['requests']
+        metric['requests'] = count
+        metric['average'] = histogram.mean / MICROS_PER_MS
+        metric['min'] = histogram.min_value / MICROS_PER_MS
+        metric['max'] = histogram.max_value / MICROS_PER_MS
+        values = histogram.percentiles_ms(REPORT_PERCENTILES)
+        metric['median'] = metric['p50'] = values[50]
+        metric['p95'] = values[95]
+        metric['p99'] = values[99]
+        metric['p999'] = values[99.9]
+        if failed is None:
+            metric['failure_source'] = 'locust_csv'
+        else:
+            failures = failed.get(key)
+            metric['failures'] = failures.total_count if failures is not None else 0
+        metric['failure_rate'] = min(metric['failures'], count) / count * 100
+    return metrics
+
+def calculate_statistics(metrics, histograms=None, aggregated=None):
+    """
+    Calculate aggregate statistics across all requests.
+
+    Counts, average, min and max are summed up from the endpoint rows, so
+    they have the rows' source (see apply_histograms). Aggregate percentiles
+    come from the merged HDR histograms when available, otherwise from
+    Locust's Aggregated CSV row. Taking the maximum of the per-endpoint
+    percentiles is only used as a last resort.
+    """
+    total_requests = sum(m['requests'] for m in metrics)
+    total_failures = sum(m['failures'] for m in metrics)
     
-    return html_content
+    stats = {
+        'total_requests': total_requests,
+        'total_failures': total_failures,
+        'success_rate': (max(total_requests - total_failures, 0) / total_requests * 100) if total_requests > 0 else 0,
+        'requests_per_second': sum(m['rps'] for m in metrics),
+        'avg_response_time': sum(m['average'] * m['requests'] for m in metrics) / total_requests if total_requests > 0 else 0,
+        'max_response_time': max(m['max'] for m in metrics) if metrics else 0,
+        'min_response_time': min(m['min'] for m in metrics) if metrics else 0,
+        'p95_response_time': max(m['p95'] for m in metrics) if metrics else 0,
+        'p99_response_time': max(m['p99'] for m in metrics) if metrics else 0,
+        'percentile_source': 'endpoint_max',
+    }
+
+    if histograms:
+        values = merge_all(histograms.values()).percentiles_ms(REPORT_PERCENTILES)
+        stats.update({
+            'p50_response_time': values[50],
+            'p95_response_time': values[95],
+            'p99_response_time': values[99],
+            'p999_response_time': values[99.9],
+            'percentile_source': 'hdr_histogram',
+        })
+        if any(m.get('failure_source') for m in metrics):
+            stats['failure_source'] = 'locust_csv'
+    elif aggregated:
+        stats.update({
+            'p50_response_time': float(aggregated['50%']),
+            'p95_response_time': float(aggregated['95%']),
+            'p99_response_time': float(aggregated['99%']),
+            'p999_response_time': float(aggregated['99.9%']),
+            'percentile_source': 'locust_csv',
+        })
+
+    return stats
 
-def generate_json_report(metrics, stats):
+def endpoint_table(metrics):
     """
-    Generate a JSON report for programmatic access.
+    Columnar endpoint data for the paginated table and overview charts.
     """
     return {
+        'columns': list(ENDPOINT_COLUMNS),
+        'rows': [
+            [metric['name'], metric['method'], metric['requests'], metric['failures']]
+            + [round(metric[key], 1) for key in ('average', 'min', 'max', 'p95', 'p99')]
+            + [round(metric['failure_rate'], 2)]
+            for metric in metrics
+        ],
+    }
+
+def response_time_rows(stats):
+    """
+    Yield the rows of the "Response Time Summary" table.
+    """
+    rows = [
+        ("Min Response Time", f"{stats['min_response_time']:.0f} ms"),
+        ("Average Response Time", f"{stats['avg_response_time']:.0f} ms"),
+        ("P95 Response Time", f"{stats['p95_response_time']:.0f} ms"),
+        ("P99 Response Time", f"{stats['p99_response_time']:.0f} ms"),
+    ]
+    if 'p999_response_time' in stats:
+        rows.append(("P99.9 Response Time", f"{stats['p999_response_time']:.0f} ms"))
+    rows += [
+        ("Max Response Time", f"{stats['max_response_time']:.0f} ms"),
+        ("Percentile Source", stats['percentile_source'].replace('_', ' ')),
+    ]
+    if 'failure_source' in stats:
+        rows.append(("Failure Count Source", stats['failure_source'].replace('_', ' ')))
+    for label, value in rows:
+        yield f"""
+                            <tr>
+                                <td><strong>{label}</strong></td>
+                                <td>{value}</td>
+                            </tr>"""
+
+def report_sections(timeseries=None, arrival=None, capacity=None, flows=None, generator_health=None,
+                    timeseries_data=None, replay=None, connection_timing=None, check_failures=None,
+                    corrected_latency=None):
+    """
+    Yield the optional sections below the response time summary.
+    """
+    if corrected_latency:
+        yield from corrected_latency_section(corrected_latency)
+    if check_failures:
+        yield from check_failures_section(check_failures)
+    if flows:
+        yield from flows_section(flows)
+    if capacity:
+        yield from capacity_section(capacity)
+    if generator_health:
+        yield from generator_health_section(generator_health)
+    if arrival:
+        yield from arrival_rate_section(arrival)
+    if replay:
+        yield from replay_section(replay)
+    if connection_timing:
+        yield from connection_timing_section(connection_timing)
+    if timeseries_data:
+        yield timeseries_section(timeseries, timeseries_data)
+
+def write_html_report(path, metrics, stats, timeseries=None, arrival=None, capacity=None, flows=None,
+                      generator_health=None, compress_data=False, chart_assets="inline", replay=None,
+                      connection_timing=None, check_failures=None, corrected_latency=None):
+    """
+    Write the HTML report by streaming runner/templates/performance_report.html.
+
+    Server-side rendering is limited to the summary and the optional
+    sections, which yield their rows one at a time into the template, so
+    the page is never built as one string. Endpoint rows and chart series go into one compact JSON blob
+    (gzip-compressed with `compress_data`) that the page renders from, with
+    the endpoint table paginated in the browser. Charts are drawn by the
+    bundled runner/templates/report_charts.js, inlined or linked from the
+    shared assets folder per `chart_assets`, so reports render offline.
+
+    Returns:
+        Size of the written file in bytes
+    """
+    now = datetime.now()
+    timeseries_data = timeseries_chart_data(timeseries) if timeseries else None
+    data = {
+        'endpoints': endpoint_table(metrics),
+        'timeseries': timeseries_data,
+    }
+    slots = {
+        'chart_script': chart_script(os.path.dirname(path), chart_assets),
+        'date_display': now.strftime("%B %d, %Y"),
+        'time_display': now.strftime("%I:%M:%S %p"),
+        'timestamp': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'saturation_banner': saturation_banner(generator_health),
+        'total_requests': f"{stats['total_requests']:,.0f}",
+        'success_class': 'success' if stats['success_rate'] >= 99 else 'warning' if stats['success_rate'] >= 95 else 'error',
+        'success_rate': f"{stats['success_rate']:.2f}",
+        'total_failures': f"{stats['total_failures']:,.0f}",
+        'avg_response_time': f"{stats['avg_response_time']:.0f}",
+        'p95_response_time': f"{stats['p95_response_time']:.0f}",
+        'max_response_time': f"{stats['max_response_time']:.0f}",
+        'response_time_rows': response_time_rows(stats),
+        'sections': report_sections(timeseries, arrival, capacity, flows, generator_health, timeseries_data,
+                                    replay, connection_timing, check_failures, corrected_latency),
+        'data': data_script(data, compress=compress_data),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        render_to_file(HTML_TEMPLATE, slots, f)
+        return f.tell()
+
+def generate_json_report(metrics, stats, samples=None, timeseries=None, arrival=None, capacity=None, flows=None,
+                         generator_health=None, replay=None, connection_timing=None, check_failures=None,
+                         corrected_latency=None):
+    """
+    Generate a JSON report for programmatic access.
+    """
+    report = {
         'timestamp': datetime.now().isoformat(),
         'summary': stats,
         'metrics': metrics
     }
+    if samples:
+        report['samples'] = samples
+    if timeseries:
+        report['timeseries'] = timeseries
+    if arrival:
+        report['arrival_rate'] = arrival
+    if replay:
+        report['replay'] = replay
+    if connection_timing:
+        report['connection_timing'] = connection_timing
+    if corrected_latency:
+        report['corrected_latency'] = corrected_latency
+    if check_failures:
+        report['check_failures'] = check_failures
+    if capacity:
+        report['capacity'] = capacity
+    if flows:
+        report['flows'] = flows
+    if generator_health:
+        report['generator_health'] = generator_health
+    return report
 
 def create_comprehensive_report(reports_dir="reports"):
     """
@@ -634,17 +1056,72 @@ def create_comprehensive_report(reports_dir="reports"):
         now = datetime.now()
         print("📊 Parsing test results...")
         metrics = parse_csv_reports(reports_dir)
-        stats = calculate_statistics(metrics)
+        histograms = load_latency_histograms(reports_dir)
+        if histograms:
+            print("📐 Using HDR histograms for exact percentiles...")
+            apply_histograms(metrics, histograms, load_failed_histograms(reports_dir))
+        metrics, flows, histograms = split_flows(metrics, histograms)
+        # Locust's Aggregated row also counts flow transactions
+        aggregated = parse_aggregated_row(reports_dir) if not flows else None
+        stats = calculate_statistics(metrics, histograms, aggregated)
+        if flows:
+            print(f"🔗 {len(flows)} flow(s) reported as transactions")
+        samples = load_sample_summary(reports_dir)
+        if samples:
+            print(f"🧮 Analysed {samples['total_samples']:,} request samples")
         
-        print("📝 Generating HTML report...")
-        html_report = generate_html_report(metrics, stats)
+        arrival = load_arrival_rate(reports_dir)
+        if arrival:
+            print(f"🚦 Open-loop run: {arrival['total']['achieved_rps']:.1f} of {arrival['total']['target_rps']:.1f} req/s target dispatched")
+        
+        replay = load_replay(reports_dir)
+        if replay:
+            print(f"📼 Replayed {replay['sent']:,} captured requests at {replay['speed']:g}x, "
+                  f"send lag p99 {replay['send_lag_p99_ms']:.0f} ms")
+        
+        connection_timing = load_connection_timing(reports_dir)
+        if connection_timing:
+            total = connection_timing['Aggregated']
+            print(f"🔌 {total['connect_count']:,} new connection(s) for {total['ttfb_count']:,} timed requests, "
+                  f"TTFB p95 {total['ttfb_p95']:.0f} ms")
+        
+        corrected_latency = load_corrected_latency(reports_dir)
+        if corrected_latency and corrected_latency['Aggregated']['backfilled']:
+            print(f"⏳ Back-filled {corrected_latency['Aggregated']['backfilled']:,} samples hidden by "
+                  f"coordinated omission")
+        
+        check_failures = load_check_failures(reports_dir)
+        if check_failures:
+            print(f"🧪 {check_failures['total']:,} response(s) failed their checks")
         
-        with open(f"{reports_dir}/performance_report.html", "w") as f:
-            f.write(html_report)
-        print(f"✅ HTML report saved: {reports_dir}/performance_report.html")
+        capacity = load_capacity(reports_dir)
+        if capacity:
+            print(f"🏔️  Knee search finished at {capacity['knee_users']} users")
+        
+        generator_health = load_generator_health(reports_dir)
+        if generator_health and generator_health['saturated']:
+            print("⚠️  Load generator saturated, latencies may not be trustworthy:")
+            for warning in generator_health['warnings']:
+                print(f"   - {warning}")
+        
+        timeseries = load_timeseries(reports_dir)
+        if timeseries:
+            print(f"⏱️  Built {len(timeseries['offsets']):,} time-series buckets from {timeseries['source'].replace('_', ' ')}")
+        
+        print("📝 Generating HTML report...")
+        report_settings = load_report_settings()
+        compress_data = should_compress_data(report_settings, metrics, timeseries)
+        size = write_html_report(f"{reports_dir}/performance_report.html", metrics, stats, timeseries,
+                                 arrival, capacity, flows, generator_health, compress_data,
+                                 report_settings["chart_assets"], replay, connection_timing, check_failures,
+                                 corrected_latency)
+        print(f"✅ HTML report saved: {reports_dir}/performance_report.html "
+              f"({size / 1024:,.0f} KB{', gzip-compressed data' if compress_data else ''})")
         
         print("📝 Generating JSON report...")
-        json_report = generate_json_report(metrics, stats)
+        json_report = generate_json_report(metrics, stats, samples, timeseries, arrival, capacity, flows,
+                                           generator_health, replay, connection_timing, check_failures,
+                                           corrected_latency)
         
         with open(f"{reports_dir}/performance_report.json", "w") as f:
             json.dump(json_report, f, indent=2)
@@ -663,7 +1140,27 @@ def create_comprehensive_report(reports_dir="reports"):
         print(f"Failed Requests: {stats['total_failures']:,.0f}")
         print(f"Avg Response Time: {stats['avg_response_time']:.0f} ms")
         print(f"P95 Response Time: {stats['p95_response_time']:.0f} ms")
+        if 'p999_response_time' in stats:
+            print(f"P99 Response Time: {stats['p99_response_time']:.0f} ms")
+            print(f"P99.9 Response Time: {stats['p999_response_time']:.0f} ms")
         print(f"Max Response Time: {stats['max_response_time']:.0f} ms")
+        if corrected_latency:
+            total = corrected_latency['Aggregated']
+            print(f"Corrected P95 / P99 Response Time: {total['corrected']['p95']:.0f} / "
+                  f"{total['corrected']['p99']:.0f} ms (raw {total['raw']['p95']:.0f} / {total['raw']['p99']:.0f} ms)")
+        if arrival:
+            print(f"Arrival Rate Shortfall: {arrival['total']['shortfall_pct']:.1f}%")
+        if replay:
+            print(f"Replay Span Drift: {replay['span_drift_pct']:+.1f}% (final drift {replay['final_drift_ms']:.0f} ms)")
+        if connection_timing:
+            total = connection_timing['Aggregated']
+            tls = f"{total['tls_p95']:.1f}" if total['tls_count'] else "—"
+            print(f"Connect / TLS / TTFB P95: {total['connect_p95']:.1f} / {tls} / {total['ttfb_p95']:.0f} ms")
+        if check_failures:
+            categories = ", ".join(f"{category} {count:,}" for category, count in check_failures['categories'].items())
+            print(f"Failed Checks: {categories}")
+        if capacity and capacity['max_sustainable_rps']:
+            print(f"Max Sustainable Throughput: {capacity['max_sustainable_rps'].get('Aggregated', 0):.1f} req/s")
         print("="*60)
         
         return True
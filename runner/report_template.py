@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import html
+import json
+import os
+import re
+import zlib
+from functools import lru_cache
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# `{{ name }}` slots; single braces (CSS, JavaScript) are left alone
+SLOT = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Element id of the embedded report data
+DATA_ELEMENT_ID = "report-data"
+
+# Charting script of the HTML report, in runner/templates
+CHART_SCRIPT = "report_charts.js"
+
+# Folder next to the report folders holding content-hashed shared assets
+ASSETS_DIR = "_assets"
+
+# `report.chart_assets` modes: inlined into each report, or one shared asset file
+CHART_ASSET_MODES = ("inline", "shared")
+
+
+@lru_cache(maxsize=None)
+def compile_template(name):
+    """
+    Load a template from runner/templates once and split it into literal
+    text and slot names.
+
+    Returns:
+        Tuple of parts: str for literal text, (slot name,) for a slot
+    """
+    with open(os.path.join(TEMPLATE_DIR, name), encoding="utf-8") as f:
+        source = f.read()
+    parts = []
+    position = 0
+    for match in SLOT.finditer(source):
+        parts.append(source[position:match.start()])
+        parts.append((match.group(1),))
+        position = match.end()
+    parts.append(source[position:])
+    return tuple(parts)
+
+
+def render_to_file(name, slots, f):
+    """
+    Stream a compiled template into an open text file.
+
+    Slot values are strings or iterables of string chunks; chunks are
+    written as they are produced, so large sections are never joined
+    into one string.
+
+    Raises:
+        KeyError: If the template uses a slot that was not provided
+    """
+    for part in compile_template(name):
+        if isinstance(part, str):
+            f.write(part)
+            continue
+        value = slots[part[0]]
+        if isinstance(value, str):
+            f.write(value)
+        else:
+            for chunk in value:
+                f.write(chunk)
+
+
+def _script_safe(chunk):
+    # Keep "</script>" and HTML comments inside the data from ending the element
+    return chunk.replace("</", "<\\/").replace("<!--", "\\u003c!--")
+
+
+def _encode_chunks(data):
+    separator = "{"
+    for key, value in data.items():
+        yield f"{separator}{json.dumps(key)}:"
+        yield json.dumps(value, separators=(",", ":"), allow_nan=False)
+        separator = ","
+    yield "}" if data else "{}"
+
+
+def data_script(data, compress=False):
+    """
+    Yield a <script> element carrying `data` as one compact JSON blob.
+
+    The JSON is encoded one top-level key at a time, so the output is
+    produced in chunks by the C encoder. With `compress` it is gzipped and
+    base64-encoded instead; the page inflates it with DecompressionStream.
+    """
+    chunks = _encode_chunks(data)
+    if not compress:
+        yield f'<script id="{DATA_ELEMENT_ID}" type="application/json">'
+        for chunk in chunks:
+            yield _script_safe(chunk)
+        yield "</script>"
+        return
+
+    # wbits=31 writes a gzip container, which DecompressionStream("gzip") reads
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    compressed = [compressor.compress(chunk.encode("utf-8")) for chunk in chunks]
+    compressed.append(compressor.flush())
+    yield f'<script id="{DATA_ELEMENT_ID}" type="application/gzip;base64">'
+    yield base64.b64encode(b"".join(compressed)).decode("ascii")
+    yield "</script>"
+
+
+@lru_cache(maxsize=None)
+def minified_asset(name):
+    """
+    Load a script from runner/templates with indentation, blank lines and
+    whole-line `//` comments stripped.
+
+    Returns:
+        Tuple of (script text, first 12 hex digits of its SHA-256)
+    """
+    with open(os.path.join(TEMPLATE_DIR, name), encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        source = "\n".join(line for line in lines if line and not line.startswith("//"))
+    return source, hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+
+
+def publish_asset(name, reports_dir):
+    """
+    Copy a minified asset into the ASSETS_DIR folder next to `reports_dir`
+    under a content-hashed name, unless that version is already there.
+
+    Reports built with the same script link the same file; a changed
+    script gets a new name, so older reports keep the version they were
+    generated with.
+
+    Returns:
+        Path of the asset relative to `reports_dir`, with forward slashes
+    """
+    source, digest = minified_asset(name)
+    stem, extension = os.path.splitext(name)
+    assets_dir = os.path.join(os.path.dirname(os.path.abspath(reports_dir)), ASSETS_DIR)
+    path = os.path.join(assets_dir, f"{stem}.{digest}{extension}")
+    if not os.path.exists(path):
+        os.makedirs(assets_dir, exist_ok=True)
+        # Write and rename, so a report generated concurrently never links a partial file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(source)
+        os.replace(temporary, path)
+    return os.path.relpath(path, os.path.abspath(reports_dir)).replace(os.sep, "/")
+
+
+def chart_script(reports_dir, mode="inline"):
+    """
+    Return the <script> element that loads the report charts.
+
+    `inline` embeds the script so the HTML file stands alone; `shared` links
+    the content-hashed copy in the assets folder next to the report folder,
+    which must then be archived along with it.
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode not in CHART_ASSET_MODES:
+        raise ValueError(f"Unknown report.chart_assets '{mode}', expected one of {CHART_ASSET_MODES}")
+    if mode == "inline":
+        return f"<script>{_script_safe(minified_asset(CHART_SCRIPT)[0])}</script>"
+    return f'<script src="{html.escape(publish_asset(CHART_SCRIPT, reports_dir))}"></script>'
@@ -1,53 +1,397 @@
+import argparse
+import os
 import subprocess
 import sys
-import os
+import time
 from datetime import datetime
+from pathlib import Path
+
+# Make top-level packages (config/) importable when run as `python runner/...`
+ROOT_DIR = str(Path(__file__).resolve().parent.parent)
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from config.loader import (
+    config_path as default_config_path, load_config, load_scenario, scenario_path, validate_files
+)
+
+LOCUSTFILE = "locustfiles/dynamic_tasks.py"
+
+# Load engines: Locust's gevent users, or runner/async_engine.py
+ENGINES = ("locust", "asyncio")
+ASYNC_ENGINE = "runner/async_engine.py"
+
+# Defaults for the `run` section of config/env.yaml
+DEFAULT_RUN_SETTINGS = {
+    "users": 50,
+    "spawn_rate": 5,
+    "run_time": "60s",
+    "workers": "auto",
+    "remote_workers": 0,
+    "master_bind_host": "127.0.0.1",
+    "master_bind_port": 5557,
+    "worker_connect_timeout": 60,
+    "engine": "locust",
+}
+
+# Exit code Locust uses when locustfiles/sla_monitor.py aborts a run
+SLA_ABORT_EXIT_CODE = 3
+
+# Exit code of a completed run in which some requests failed (--exit-code-on-error);
+# the report is still generated and the SLA validation decides the outcome
+REQUEST_ERROR_EXIT_CODE = 1
+
+# Seconds to let workers exit on their own after the master has finished
+WORKER_SHUTDOWN_TIMEOUT = 15
+
+def load_run_settings(config_path=None):
+    """
+    Load run settings from the `run` section of the environment config.
+
+    Returns:
+        Tuple of (settings dict, target host or None)
+    """
+    settings = dict(DEFAULT_RUN_SETTINGS)
+    host = None
+    config_path = config_path or default_config_path()
+    if os.path.exists(config_path):
+        config = load_config(config_path)
+        settings.update(config.get("run") or {})
+        host = config.get("host")
+    return settings, host
+
+def configured_load_shape(config_path=None):
+    """
+    Return the `load_shape` type from the scenario or env.yaml, or None.
+
+    Mirrors the precedence in locustfiles/load_shapes.py: the scenario's
+    section wins over the one in the environment config.
+    """
+    config_path = config_path or default_config_path()
+    for path, load in ((scenario_path(), load_scenario), (config_path, load_config)):
+        if os.path.exists(path):
+            shape = load(path).get("load_shape")
+            if shape:
+                return shape["type"]
+    return None
+
+def check_config_files():
+    """
+    Validate env.yaml, the scenario and the SLA thresholds before any
+    Locust process starts, exiting with every problem found.
+
+    Validation also fills the config cache, so the master and workers
+    start without parsing the files again.
+    """
+    errors = validate_files()
+    if errors:
+        print("❌ Invalid configuration:")
+        for error in errors:
+            print(error)
+        sys.exit(1)
+
+def resolve_worker_count(workers):
+    """
+    Translate the `workers` setting into a number of local worker processes.
+
+    "auto" means one worker per CPU core; 0 runs Locust standalone.
+    """
+    if workers in (None, "auto"):
+        return os.cpu_count() or 1
+    workers = int(workers)
+    if workers < 0:
+        raise ValueError(f"workers must be >= 0, got {workers}")
+    return workers
+
+def parse_args(argv=None):
+    """
+    Parse command line options. Unset options fall back to config/env.yaml.
+    """
+    parser = argparse.ArgumentParser(description="Run distributed Locust performance tests")
+    parser.add_argument("-u", "--users", type=int, help="Peak number of concurrent users")
+    parser.add_argument("-r", "--spawn-rate", type=float, help="Users started per second")
+    parser.add_argument("-t", "--run-time", help="Test duration, e.g. 60s, 10m, 1h")
+    parser.add_argument("--host", help="Target host (default: host from config/env.yaml)")
+    parser.add_argument("-w", "--workers",
+                        help="Local worker processes: a number, 'auto' (one per core) or 0 for standalone")
+    parser.add_argument("--engine", choices=ENGINES,
+                        help="Load engine: locust (gevent users, default) or asyncio (single process)")
+    parser.add_argument("--remote-workers", type=int,
+                        help="Additional workers started on other machines that the master waits for")
+    parser.add_argument("--master-bind-host", help="Interface the master listens on for workers")
+    parser.add_argument("--master-bind-port", type=int, help="Port the master listens on for workers")
+    parser.add_argument("--record-samples", action="store_true",
+                        help="Write every request to a binary sample log in the report folder")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve live OpenMetrics at PORT/metrics (worker N at PORT + 1 + N)")
+    parser.add_argument("--check-regressions", action="store_true",
+                        help="Fail if this run regressed against the median of previous runs in reports/")
+    parser.add_argument("--baseline", metavar="RUN_ID",
+                        help="With --check-regressions, compare against this run instead of recent history")
+    parser.add_argument("--join", metavar="MASTER_HOST",
+                        help="Only start local workers and connect them to a master on MASTER_HOST")
+    return parser.parse_args(argv)
+
+def merge_settings(settings, args):
+    """
+    Overlay command line options on top of the configured run settings.
+    """
+    merged = dict(settings)
+    for key in DEFAULT_RUN_SETTINGS:
+        value = getattr(args, key, None)
+        if value is not None:
+            merged[key] = value
+    return merged
+
+def master_command(settings, host, reports_dir, expect_workers, load_shape=None):
+    """
+    Build the Locust command for the master (or standalone) process.
+
+    With a load shape, users, spawn rate and duration come from the shape.
+    """
+    command = [
+        "locust",
+        "-f", LOCUSTFILE,
+        "--headless",
+    ]
+    if not load_shape:
+        command += [
+            "-u", str(settings["users"]),
+            "-r", str(settings["spawn_rate"]),
+            "-t", str(settings["run_time"]),
+        ]
+    command += [
+        "--host", host,
+        "--html", f"{reports_dir}/report.html",
+        "--csv", f"{reports_dir}/results",
+        "--csv-full-history",
+        "--exit-code-on-error", str(REQUEST_ERROR_EXIT_CODE)
+    ]
+    if expect_workers:
+        command += [
+            "--master",
+            "--master-bind-host", str(settings["master_bind_host"]),
+            "--master-bind-port", str(settings["master_bind_port"]),
+            "--expect-workers", str(expect_workers),
+            "--expect-workers-max-wait", str(settings["worker_connect_timeout"]),
+        ]
+    return command
+
+def async_engine_command(settings, host, reports_dir):
+    """
+    Build the command for the asyncio engine, which writes the same CSVs
+    as a Locust master.
+    """
+    return [
+        sys.executable, ASYNC_ENGINE,
+        "-u", str(settings["users"]),
+        "-r", str(settings["spawn_rate"]),
+        "-t", str(settings["run_time"]),
+        "--host", host,
+        "--csv", f"{reports_dir}/results",
+    ]
 
-def run_tests():
+def worker_command(master_host, master_port):
+    """
+    Build the Locust command for one worker process.
+    """
+    return [
+        "locust",
+        "-f", LOCUSTFILE,
+        "--worker",
+        "--master-host", master_host,
+        "--master-port", str(master_port),
+    ]
+
+def locust_env(reports_dir):
+    """
+    Environment for Locust processes; plugins write run artifacts to reports_dir.
+    """
+    return dict(os.environ, API_PERF_REPORTS_DIR=reports_dir)
+
+def enable_sample_log():
+    """
+    Turn on the per-request sample log for every Locust process started from here.
+    """
+    os.environ["API_PERF_RECORD_SAMPLES"] = "1"
+
+def enable_metrics_exporter(port):
+    """
+    Turn on the OpenMetrics endpoint of every Locust process started from here.
+    """
+    os.environ["API_PERF_METRICS_PORT"] = str(port)
+    print(f"📡 Live metrics at http://127.0.0.1:{port}/metrics (worker N on port {port} + 1 + N)")
+
+def start_workers(count, master_host, master_port, log_dir):
+    """
+    Spawn local worker processes, each logging to its own file.
+
+    Returns:
+        List of (Popen, log file) tuples
+    """
+    workers = []
+    for index in range(count):
+        log_file = open(f"{log_dir}/worker_{index}.log", "w")
+        process = subprocess.Popen(
+            worker_command(master_host, master_port),
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            env=locust_env(log_dir)
+        )
+        workers.append((process, log_file))
+    return workers
+
+def stop_workers(workers):
+    """
+    Wait for workers to exit after the master quits, terminating stragglers.
+
+    Returns:
+        List of non-zero worker exit codes
+    """
+    deadline = time.time() + WORKER_SHUTDOWN_TIMEOUT
+    failed = []
+    for process, log_file in workers:
+        try:
+            process.wait(timeout=max(deadline - time.time(), 0.1))
+        except subprocess.TimeoutExpired:
+            process.terminate()
+            process.wait()
+        finally:
+            log_file.close()
+        if process.returncode not in (0, -15):
+            failed.append(process.returncode)
+    return failed
+
+def join_master(settings, master_host):
+    """
+    Start local workers only and attach them to an existing master.
+    """
+    count = resolve_worker_count(settings["workers"]) or 1
+    log_dir = "reports/workers"
+    os.makedirs(log_dir, exist_ok=True)
+    print(f"Starting {count} worker(s) for master at {master_host}:{settings['master_bind_port']}...")
+    workers = start_workers(count, master_host, settings["master_bind_port"], log_dir)
+    codes = [process.wait() for process, _ in workers]
+    for _, log_file in workers:
+        log_file.close()
+    sys.exit(max(codes) if codes else 0)
+
+def run_tests(argv=None):
     """
     Execute Locust performance tests and validate against SLA.
+
+    Runs one master plus N local worker processes (one per core by default)
+    so load generation is not capped by a single CPU core.
     """
+    args = parse_args(argv)
+    check_config_files()
+    settings, config_host = load_run_settings()
+    settings = merge_settings(settings, args)
+
+    if args.record_samples:
+        enable_sample_log()
+
+    if args.metrics_port:
+        enable_metrics_exporter(args.metrics_port)
+
+    if args.join:
+        join_master(settings, args.join)
+
+    host = args.host or config_host
+    if not host:
+        print("❌ No target host: set `host` in config/env.yaml or pass --host")
+        sys.exit(1)
+
     # Create timestamped report folder
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     reports_dir = f"reports/{timestamp}"
     os.makedirs(reports_dir, exist_ok=True)
-    
+
     # Verify directory was created
     if not os.path.exists(reports_dir):
         print(f"❌ Failed to create reports directory: {reports_dir}")
         sys.exit(1)
 
-    print("Starting performance tests...")
+    workers = []
+    if settings["engine"] == "asyncio":
+        # One event loop process; `workers` and load shapes apply to the Locust engine only
+        print("Starting performance tests on the asyncio engine...")
+        master = subprocess.Popen(async_engine_command(settings, host, reports_dir), env=locust_env(reports_dir))
+    else:
+        local_workers = resolve_worker_count(settings["workers"])
+        expect_workers = local_workers + int(settings["remote_workers"])
 
-    result = subprocess.run([
-        "locust",
-        "-f", "locustfiles/dynamic_tasks.py",
-        "--headless",
-        "-u", "50",
-        "-r", "5",
-        "-t", "60s",
-        "--host", "https://jsonplaceholder.typicode.com",
-        "--html", f"{reports_dir}/report.html",
-        "--csv", f"{reports_dir}/results",
-        "--exit-code-on-error", "1"
-    ])
+        if expect_workers:
+            print(f"Starting performance tests with 1 master and {expect_workers} worker(s)...")
+        else:
+            print("Starting performance tests...")
 
-    if result.returncode != 0:
-        print("❌ Performance tests failed")
-        sys.exit(1)
+        load_shape = configured_load_shape()
+        if load_shape:
+            print(f"📐 Using '{load_shape}' load shape; users, spawn rate and run time come from the shape")
+
+        master = subprocess.Popen(
+            master_command(settings, host, reports_dir, expect_workers, load_shape),
+            env=locust_env(reports_dir)
+        )
+
+        if local_workers:
+            # Workers always connect over loopback; remote workers use --join
+            workers = start_workers(local_workers, "127.0.0.1", settings["master_bind_port"], reports_dir)
 
-    print("\n✅ Performance tests completed")
+    try:
+        returncode = master.wait()
+    except KeyboardInterrupt:
+        master.terminate()
+        returncode = master.wait()
+    finally:
+        failed_workers = stop_workers(workers)
+
+    if failed_workers:
+        # The report is still generated, but the run fails: the crashed workers' load is missing from it
+        print(f"❌ {len(failed_workers)} worker(s) exited abnormally (exit codes: {failed_workers}), "
+              f"see {reports_dir}/worker_*.log")
+
+    aborted = returncode == SLA_ABORT_EXIT_CODE
+    if aborted:
+        # Still build the report so the breach can be inspected
+        print("🛑 Performance tests aborted early: SLA breach persisted during the run")
+        print(f"   Details: {reports_dir}/sla_abort.json")
+    elif returncode == REQUEST_ERROR_EXIT_CODE and os.path.exists(f"{reports_dir}/results_stats.csv"):
+        # Failed requests alone are judged by the error_rate SLAs below
+        print("\n⚠️  Performance tests completed with failed requests")
+    elif returncode != 0:
+        print("❌ Performance tests failed")
+        sys.exit(returncode)
+    else:
+        print("\n✅ Performance tests completed")
     print(f"Reports generated in {reports_dir}/ directory")
-    
+
     # Generate comprehensive report
     print("\n📊 Generating comprehensive report...")
     from report_generator import create_comprehensive_report
     create_comprehensive_report(reports_dir)
 
+    # Compare against earlier runs
+    regressed = False
+    if args.check_regressions:
+        print("\n📉 Checking for regressions against previous runs...")
+        from regression import check_regressions
+        regressed = not check_regressions(reports_dir, baseline=args.baseline)
+
     # Run SLA validation
     print("\nValidating against SLA thresholds...")
     from validate import validate_sla
-    validate_sla(reports_dir)
+    exit_code = 0
+    try:
+        validate_sla(reports_dir)
+    except SystemExit as e:
+        exit_code = e.code
+    if aborted:
+        sys.exit(SLA_ABORT_EXIT_CODE)
+    if failed_workers:
+        print(f"\n❌ Run degraded: {len(failed_workers)} worker(s) failed, results are incomplete")
+    sys.exit(exit_code or (1 if regressed or failed_workers else 0))
 
 if __name__ == "__main__":
     run_tests()
@@ -0,0 +1,294 @@
+// Dependency-free SVG charts for performance_report.html.
+// runner/report_template.py minifies this file and either copies it to the
+// shared reports/_assets folder under a content-hashed name or inlines it.
+(function (global) {
+    'use strict';
+
+    const SVG_NS = 'http://www.w3.org/2000/svg';
+    // Room for the y axis ticks and title, and below the plot for x labels
+    const MARGIN = { top: 10, right: 16, left: 64 };
+    const BAR_LABELS_HEIGHT = 72;
+    const LINE_LABELS_HEIGHT = 40;
+    const GRID_COLOR = '#e5e7eb';
+    const TEXT_COLOR = '#6b7280';
+    const Y_TICKS = 5;
+    const X_TICKS = 12;
+    const LABEL_LENGTH = 16;
+
+    const charts = [];
+    let resizeTimer = null;
+
+    function escapeXml(text) {
+        return String(text).replace(/[&<>"']/g, c => ({
+            '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+        }[c]));
+    }
+
+    function truncate(text, length) {
+        text = String(text);
+        return text.length > length ? text.slice(0, length - 1) + '…' : text;
+    }
+
+    function round(value) {
+        return Math.round(value * 10) / 10;
+    }
+
+    function formatValue(value) {
+        if (value === null || value === undefined || Number.isNaN(value)) {
+            return '–';
+        }
+        const magnitude = Math.abs(value);
+        if (magnitude >= 1000) {
+            return Math.round(value).toLocaleString();
+        }
+        if (magnitude >= 100 || Number.isInteger(value)) {
+            return String(Math.round(value));
+        }
+        return value.toFixed(magnitude >= 10 ? 1 : 2);
+    }
+
+    // Round the axis maximum up to 1, 2, 2.5 or 5 times a power of ten
+    function niceMax(value) {
+        if (!(value > 0)) {
+            return 1;
+        }
+        const magnitude = Math.pow(10, Math.floor(Math.log10(value)));
+        for (const step of [1, 2, 2.5, 5]) {
+            if (value <= step * magnitude) {
+                return step * magnitude;
+            }
+        }
+        return 10 * magnitude;
+    }
+
+    function maxOf(arrays) {
+        let max = 0;
+        for (const values of arrays) {
+            for (const value of values) {
+                if (value > max) {
+                    max = value;
+                }
+            }
+        }
+        return max;
+    }
+
+    function plotArea(width, height, labelsHeight) {
+        const bottom = height - labelsHeight;
+        const right = width - MARGIN.right;
+        return {
+            left: MARGIN.left, right: right, top: MARGIN.top, bottom: bottom,
+            width: right - MARGIN.left, height: bottom - MARGIN.top
+        };
+    }
+
+    function yAxis(plot, yMax, title) {
+        const parts = [];
+        for (let i = 0; i <= Y_TICKS; i++) {
+            const y = round(plot.bottom - plot.height * i / Y_TICKS);
+            parts.push(`<line x1="${plot.left}" x2="${plot.right}" y1="${y}" y2="${y}" stroke="${GRID_COLOR}"/>`);
+            parts.push(`<text x="${plot.left - 6}" y="${y + 4}" text-anchor="end" fill="${TEXT_COLOR}">${formatValue(yMax * i / Y_TICKS)}</text>`);
+        }
+        if (title) {
+            const middle = round(plot.top + plot.height / 2);
+            parts.push(`<text transform="translate(14 ${middle}) rotate(-90)" text-anchor="middle" fill="${TEXT_COLOR}">${escapeXml(title)}</text>`);
+        }
+        return parts.join('');
+    }
+
+    function legendHtml(items) {
+        if (!items || !items.length) {
+            return '';
+        }
+        return '<div class="chart-legend">' + items.map(item =>
+            `<span><i style="background:${item.color}"></i>${escapeXml(item.label)}</span>`
+        ).join('') + '</div>';
+    }
+
+    // Draw (or redraw) a chart at the current size of its container
+    function paint(chart) {
+        const container = chart.container;
+        container.innerHTML = legendHtml(chart.legend);
+        const legendHeight = chart.legend && chart.legend.length ? container.firstChild.offsetHeight : 0;
+        const width = Math.max(container.clientWidth, 240);
+        const height = Math.max(container.clientHeight - legendHeight, 160);
+        const view = chart.draw(width, height);
+        container.insertAdjacentHTML('beforeend',
+            `<svg xmlns="${SVG_NS}" class="chart-svg" width="${width}" height="${height}">${view.svg}</svg>` +
+            '<div class="chart-tip"></div>');
+        chart.svg = container.querySelector('svg');
+        chart.guide = container.querySelector('.chart-guide');
+        chart.tip = container.lastChild;
+        chart.hover = view.hover || null;
+    }
+
+    function hideTip(chart) {
+        chart.tip.style.display = 'none';
+        if (chart.guide) {
+            chart.guide.setAttribute('visibility', 'hidden');
+        }
+    }
+
+    function showTip(chart, event) {
+        const bounds = chart.container.getBoundingClientRect();
+        const target = event.target.closest ? event.target.closest('[data-tip]') : null;
+        let html = target ? escapeXml(target.getAttribute('data-tip')) : null;
+        if (!html && chart.hover) {
+            const point = chart.hover(event.clientX - chart.svg.getBoundingClientRect().left);
+            if (point) {
+                html = point.html;
+                chart.guide.setAttribute('x1', point.x);
+                chart.guide.setAttribute('x2', point.x);
+                chart.guide.setAttribute('visibility', 'visible');
+            }
+        }
+        if (!html) {
+            hideTip(chart);
+            return;
+        }
+        const tip = chart.tip;
+        tip.innerHTML = html;
+        tip.style.display = 'block';
+        const x = event.clientX - bounds.left;
+        const left = Math.min(x + 12, bounds.width - tip.offsetWidth - 4);
+        tip.style.left = Math.max(left, 0) + 'px';
+        tip.style.top = (event.clientY - bounds.top + 12) + 'px';
+    }
+
+    function mount(container, legend, draw) {
+        const chart = { container: container, legend: legend, draw: draw };
+        container.addEventListener('mousemove', event => showTip(chart, event));
+        container.addEventListener('mouseleave', () => hideTip(chart));
+        charts.push(chart);
+        paint(chart);
+        return chart;
+    }
+
+    // Options: labels, values, color, yTitle, optional yMax
+    function bar(container, options) {
+        const labels = options.labels;
+        const values = options.values;
+        return mount(container, null, (width, height) => {
+            const plot = plotArea(width, height, BAR_LABELS_HEIGHT);
+            const yMax = options.yMax || niceMax(maxOf([values]));
+            const slot = plot.width / Math.max(labels.length, 1);
+            const barWidth = Math.max(slot * 0.7, 1);
+            const parts = [yAxis(plot, yMax, options.yTitle)];
+            labels.forEach((label, i) => {
+                const value = values[i] || 0;
+                const barHeight = round(plot.height * Math.min(value / yMax, 1));
+                const x = plot.left + slot * i;
+                const center = round(x + slot / 2);
+                // The transparent column keeps short bars easy to hover
+                parts.push(
+                    `<g data-tip="${escapeXml(label + ': ' + formatValue(value))}">` +
+                    `<rect x="${round(x)}" y="${plot.top}" width="${round(slot)}" height="${plot.height}" fill="transparent"/>` +
+                    `<rect x="${round(x + (slot - barWidth) / 2)}" y="${round(plot.bottom - barHeight)}" width="${round(barWidth)}" height="${barHeight}" fill="${options.color}"/>` +
+                    '</g>' +
+                    `<text transform="translate(${center} ${plot.bottom + 12}) rotate(-40)" text-anchor="end" fill="${TEXT_COLOR}">${escapeXml(truncate(label, LABEL_LENGTH))}</text>`
+                );
+            });
+            parts.push(`<line x1="${plot.left}" x2="${plot.right}" y1="${plot.bottom}" y2="${plot.bottom}" stroke="${TEXT_COLOR}"/>`);
+            return { svg: parts.join('') };
+        });
+    }
+
+    function slicePath(cx, cy, outer, inner, start, end) {
+        // A full ring cannot be drawn as one arc, so split it in halves
+        if (end - start >= 2 * Math.PI - 1e-9) {
+            const middle = start + Math.PI;
+            return slicePath(cx, cy, outer, inner, start, middle) + slicePath(cx, cy, outer, inner, middle, end);
+        }
+        const large = end - start > Math.PI ? 1 : 0;
+        const point = (radius, angle) => `${round(cx + radius * Math.cos(angle))} ${round(cy + radius * Math.sin(angle))}`;
+        return `M${point(outer, start)}A${outer} ${outer} 0 ${large} 1 ${point(outer, end)}` +
+            `L${point(inner, end)}A${inner} ${inner} 0 ${large} 0 ${point(inner, start)}Z`;
+    }
+
+    // Options: labels, values, colors
+    function doughnut(container, options) {
+        const values = options.values;
+        const total = values.reduce((sum, value) => sum + value, 0);
+        const legend = options.labels.map((label, i) => ({
+            label: label, color: options.colors[i % options.colors.length]
+        }));
+        return mount(container, legend, (width, height) => {
+            const cx = round(width / 2);
+            const cy = round(height / 2);
+            const outer = round(Math.max(Math.min(width, height) / 2 - 8, 10));
+            const inner = round(outer * 0.5);
+            if (!total) {
+                return { svg: `<circle cx="${cx}" cy="${cy}" r="${round((outer + inner) / 2)}" fill="none" stroke="${GRID_COLOR}" stroke-width="${outer - inner}"/>` };
+            }
+            let angle = -Math.PI / 2;
+            const parts = values.map((value, i) => {
+                if (!(value > 0)) {
+                    return '';
+                }
+                const sweep = value / total * 2 * Math.PI;
+                const path = slicePath(cx, cy, outer, inner, angle, angle + sweep);
+                angle += sweep;
+                const tip = `${legend[i].label}: ${formatValue(value)} (${(value / total * 100).toFixed(1)}%)`;
+                return `<path d="${path}" fill="${legend[i].color}" stroke="#fff" stroke-width="2" data-tip="${escapeXml(tip)}"/>`;
+            });
+            return { svg: parts.join('') };
+        });
+    }
+
+    // Options: labels, datasets [{label, data, color}], yTitle, xTitle.
+    // Null values are gaps and are bridged by the line.
+    function line(container, options) {
+        const labels = options.labels;
+        const datasets = options.datasets;
+        const legend = datasets.map(dataset => ({ label: dataset.label, color: dataset.color }));
+        return mount(container, legend, (width, height) => {
+            const plot = plotArea(width, height, LINE_LABELS_HEIGHT);
+            const yMax = niceMax(maxOf(datasets.map(dataset => dataset.data)));
+            const step = labels.length > 1 ? plot.width / (labels.length - 1) : 0;
+            const xAt = i => round(plot.left + step * i);
+            const yAt = value => round(plot.bottom - plot.height * Math.min(value / yMax, 1));
+            const parts = [yAxis(plot, yMax, options.yTitle)];
+
+            const every = Math.max(Math.ceil(labels.length / X_TICKS), 1);
+            for (let i = 0; i < labels.length; i += every) {
+                parts.push(`<text x="${xAt(i)}" y="${plot.bottom + 16}" text-anchor="middle" fill="${TEXT_COLOR}">${escapeXml(labels[i])}</text>`);
+            }
+            if (options.xTitle) {
+                parts.push(`<text x="${round(plot.left + plot.width / 2)}" y="${height - 4}" text-anchor="middle" fill="${TEXT_COLOR}">${escapeXml(options.xTitle)}</text>`);
+            }
+
+            datasets.forEach(dataset => {
+                const points = [];
+                dataset.data.forEach((value, i) => {
+                    if (value !== null && value !== undefined) {
+                        points.push((points.length ? 'L' : 'M') + xAt(i) + ' ' + yAt(value));
+                    }
+                });
+                if (points.length) {
+                    parts.push(`<path d="${points.join('')}" fill="none" stroke="${dataset.color}" stroke-width="1.5" stroke-linejoin="round"/>`);
+                }
+            });
+            parts.push(`<line class="chart-guide" x1="0" x2="0" y1="${plot.top}" y2="${plot.bottom}" stroke="${TEXT_COLOR}" stroke-dasharray="3 3" visibility="hidden"/>`);
+
+            // Tooltip with every series at the hovered bucket
+            function hover(x) {
+                if (!labels.length || x < plot.left || x > plot.right) {
+                    return null;
+                }
+                const i = step ? Math.min(Math.max(Math.round((x - plot.left) / step), 0), labels.length - 1) : 0;
+                const rows = datasets.map(dataset =>
+                    `<div><i style="background:${dataset.color}"></i>${escapeXml(dataset.label)}: ${formatValue(dataset.data[i])}</div>`
+                );
+                return { x: xAt(i), html: `<strong>${escapeXml(labels[i])}</strong>${rows.join('')}` };
+            }
+            return { svg: parts.join(''), hover: hover };
+        });
+    }
+
+    global.addEventListener('resize', () => {
+        clearTimeout(resizeTimer);
+        resizeTimer = setTimeout(() => charts.forEach(paint), 150);
+    });
+
+    global.ReportCharts = { bar: bar, doughnut: doughnut, line: line };
+})(window);
@@ -0,0 +1,221 @@
+import csv
+import math
+import os
+import warnings
+
+import numpy as np
+
+from metrics.artifacts import SAMPLES_DIR
+from metrics.sample_log import SUMMARY_CHUNK, GroupedLatencies, iter_sample_chunks, load_sample_logs
+
+# Locust's per-second history (written with --csv-full-history)
+HISTORY_FILE = "results_stats_history.csv"
+
+TIMESERIES_PERCENTILES = (50, 95, 99)
+
+# Key used for the all-endpoints series
+AGGREGATE_NAME = "Aggregated"
+
+
+def _series(values):
+    """
+    Convert a float array to a JSON-friendly list with NaN as None.
+    """
+    return [None if math.isnan(v) else round(float(v), 3) for v in values]
+
+
+def _bucket_stats(latencies, failures, interval):
+    """
+    Per-group request rate, error rate and latency percentiles.
+
+    Args:
+        latencies: GroupedLatencies holding the samples of every group
+        failures: Failed requests per group
+        interval: Seconds per time bucket
+    """
+    counts = latencies.requests
+    with np.errstate(invalid="ignore", divide="ignore"):
+        error_rate = np.where(counts > 0, failures / counts * 100, np.nan)
+
+    stats = {
+        "rps": counts / interval,
+        "error_rate": error_rate,
+    }
+    for p, values in latencies.percentiles(TIMESERIES_PERCENTILES).items():
+        stats[f"p{p}"] = values
+    return stats
+
+
+def timeseries_from_samples(directory, interval=1):
+    """
+    Build per-interval series for every endpoint from the binary sample logs.
+
+    The logs are read twice in chunks: once for the time range, then to
+    count every (endpoint, time bucket) into GroupedLatencies, so the run's
+    samples are never loaded or sorted all at once.
+
+    Returns:
+        Time-series dict, or None if no samples were recorded
+    """
+    endpoints, parts = load_sample_logs(directory)
+    if not parts or not sum(len(samples) for samples, _ in parts):
+        return None
+
+    first, last = np.inf, -np.inf
+    for samples, _ in parts:
+        for offset in range(0, len(samples), SUMMARY_CHUNK):
+            timestamps = samples["timestamp"][offset:offset + SUMMARY_CHUNK]
+            first = min(first, float(timestamps.min()))
+            last = max(last, float(timestamps.max()))
+    start = math.floor(first)
+    bucket_count = int((last - start) // interval) + 1
+
+    # Groups are endpoint * bucket_count + time bucket; the aggregate has its own
+    group_count = len(endpoints) * bucket_count
+    per_endpoint = GroupedLatencies(group_count)
+    aggregate = GroupedLatencies(bucket_count)
+    endpoint_failures = np.zeros(group_count)
+    aggregate_failures = np.zeros(bucket_count)
+    for ids, chunk in iter_sample_chunks(parts):
+        buckets = ((chunk["timestamp"] - start) // interval).astype(np.int64)
+        groups = ids * bucket_count + buckets
+        per_endpoint.add(groups, chunk["latency_ms"])
+        aggregate.add(buckets, chunk["latency_ms"])
+        endpoint_failures += np.bincount(groups, weights=chunk["failed"], minlength=group_count)
+        aggregate_failures += np.bincount(buckets, weights=chunk["failed"], minlength=bucket_count)
+
+    per_endpoint = _bucket_stats(per_endpoint, endpoint_failures, interval)
+    aggregate = _bucket_stats(aggregate, aggregate_failures, interval)
+
+    series = {}
+    for endpoint_id, (method, name) in enumerate(endpoints):
+        window = slice(endpoint_id * bucket_count, (endpoint_id + 1) * bucket_count)
+        series[f"{method} {name}"] = {key: _series(values[window]) for key, values in per_endpoint.items()}
+    series[AGGREGATE_NAME] = {key: _series(values) for key, values in aggregate.items()}
+
+    return {
+        "source": "samples",
+        "interval": interval,
+        "start": start,
+        "offsets": list(range(0, bucket_count * interval, interval)),
+        "endpoints": series,
+    }
+
+
+def _history_float(value):
+    return np.nan if value in ("", "N/A") else float(value)
+
+
+def timeseries_from_history(history_file):
+    """
+    Build per-second series from Locust's results_stats_history.csv.
+
+    Percentiles in this file are Locust's rolling "current" values (roughly
+    the last 10 seconds), rounded to Locust's response time buckets.
+
+    Returns:
+        Time-series dict, or None if the file holds no data
+    """
+    columns = {"Requests/s": "rps", "Failures/s": "fps"}
+    columns.update({f"{p}%": f"p{p}" for p in TIMESERIES_PERCENTILES})
+
+    rows = {}
+    with open(history_file, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if not header:
+            return None
+        timestamp_col, type_col, name_col = (header.index(c) for c in ("Timestamp", "Type", "Name"))
+        value_cols = [header.index(column) for column in columns]
+        for row in reader:
+            name = row[name_col] if row[name_col] == AGGREGATE_NAME else f"{row[type_col]} {row[name_col]}"
+            rows.setdefault(name, []).append(
+                [int(row[timestamp_col])] + [_history_float(row[i]) for i in value_cols]
+            )
+    if not rows:
+        return None
+
+    start = min(values[0][0] for values in rows.values())
+    end = max(values[-1][0] for values in rows.values())
+    length = end - start + 1
+
+    series = {}
+    for name, values in rows.items():
+        data = np.array(values, dtype=np.float64)
+        offsets = data[:, 0].astype(np.int64) - start
+        grid = np.full((length, data.shape[1] - 1), np.nan)
+        grid[offsets] = data[:, 1:]
+        rps = grid[:, 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            error_rate = np.where(rps > 0, grid[:, 1] / rps * 100, np.nan)
+        entry = {"rps": _series(np.nan_to_num(rps)), "error_rate": _series(error_rate)}
+        for i, p in enumerate(TIMESERIES_PERCENTILES):
+            entry[f"p{p}"] = _series(grid[:, 2 + i])
+        series[name] = entry
+
+    return {
+        "source": "stats_history",
+        "interval": 1,
+        "start": start,
+        "offsets": list(range(length)),
+        "endpoints": series,
+    }
+
+
+def build_timeseries(reports_dir="reports", interval=1):
+    """
+    Build the run's time series, preferring exact per-request samples and
+    falling back to Locust's stats history CSV.
+
+    Returns:
+        Time-series dict, or None if neither source is available
+    """
+    samples_dir = f"{reports_dir}/{SAMPLES_DIR}"
+    if os.path.isdir(samples_dir):
+        timeseries = timeseries_from_samples(samples_dir, interval)
+        if timeseries:
+            return timeseries
+
+    history_file = f"{reports_dir}/{HISTORY_FILE}"
+    if os.path.exists(history_file):
+        return timeseries_from_history(history_file)
+    return None
+
+
+def downsample(timeseries, max_points):
+    """
+    Reduce a time series to at most `max_points` buckets for charting.
+
+    Rates are averaged within each bucket; latency percentiles take the
+    bucket maximum so short stalls stay visible.
+    """
+    length = len(timeseries["offsets"])
+    factor = max(math.ceil(length / max_points), 1)
+    if factor == 1:
+        return timeseries
+
+    padded = math.ceil(length / factor) * factor
+
+    def reduce(values, how):
+        data = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        data = np.pad(data, (0, padded - length), constant_values=np.nan).reshape(-1, factor)
+        with warnings.catch_warnings():
+            # Buckets without any data legitimately reduce to NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            reduced = np.nanmax(data, axis=1) if how == "max" else np.nanmean(data, axis=1)
+        return _series(reduced)
+
+    endpoints = {}
+    for name, entry in timeseries["endpoints"].items():
+        endpoints[name] = {
+            key: reduce(values, "mean" if key in ("rps", "error_rate") else "max")
+            for key, values in entry.items()
+        }
+
+    return dict(
+        timeseries,
+        interval=timeseries["interval"] * factor,
+        offsets=timeseries["offsets"][::factor],
+        endpoints=endpoints,
+    )
+
@@ -1,13 +1,209 @@
 import csv
-import yaml
+import json
 import sys
 import os
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Make top-level packages (config/, metrics/) importable when run as `python runner/...`
+ROOT_DIR = str(Path(__file__).resolve().parent.parent)
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from config.loader import DEFAULT_THRESHOLDS_FILE, load_thresholds
+from metrics.artifacts import (CORRECTED_HISTOGRAM_FILE, FLOW_REQUEST_TYPE, GENERATOR_HEALTH_FILE, HISTOGRAM_FILE,
+                               INTENDED_HISTOGRAM_FILE)
+from metrics.hdr_histogram import load_histograms, merge_all, split_histogram_key
+from metrics.sla_rules import AGGREGATE_TARGET, SlaRules, TargetStats, evaluate
+
+# Machine-readable verdicts written next to the Locust CSVs
+VERDICTS_FILE = "sla_verdicts.json"
+JUNIT_FILE = "sla_junit.xml"
+
+def load_endpoint_histograms(reports_dir):
+    """
+    Load HDR histograms merged per (request type, name), across HTTP methods.
+
+    Open-loop runs are judged on latency from the intended send time, which
+    includes any time requests waited because the generator fell behind.
+
+    Returns:
+        Tuple of (dict mapping (is_flow, name) to HdrHistogram, source label);
+        the dict is empty if nothing was recorded
+    """
+    source = "hdr_intended"
+    path = f"{reports_dir}/{INTENDED_HISTOGRAM_FILE}"
+    if not os.path.exists(path):
+        source = "hdr"
+        path = f"{reports_dir}/{HISTOGRAM_FILE}"
+    if not os.path.exists(path):
+        return {}, None
+    return _merge_by_target(path), source
+
+def load_corrected_histograms(reports_dir, histograms, histogram_source):
+    """
+    Load the histograms that `latency: corrected` rules are measured on.
+
+    Closed-loop runs use the latencies corrected for coordinated omission.
+    Open-loop runs don't suffer from it: their latency from the intended
+    send time already counts the waits, so it is used as is.
+
+    Returns:
+        Tuple of (dict mapping (is_flow, name) to HdrHistogram, source label)
+    """
+    if histogram_source == "hdr_intended":
+        return histograms, histogram_source
+    path = f"{reports_dir}/{CORRECTED_HISTOGRAM_FILE}"
+    if not os.path.exists(path):
+        return {}, None
+    return _merge_by_target(path), "hdr_corrected"
+
+def _merge_by_target(path):
+    by_target = {}
+    for key, histogram in load_histograms(path).items():
+        method, name = split_histogram_key(key)
+        by_target.setdefault((method == FLOW_REQUEST_TYPE, name), []).append(histogram)
+    return {target: merge_all(histograms) for target, histograms in by_target.items()}
+
+def _csv_percentiles(row):
+    # Locust's percentile columns are named "50%", "99.9%", ...; "N/A" without requests
+    percentiles = {}
+    for column, value in row.items():
+        if column.endswith("%") and value not in ("", "N/A"):
+            percentiles[float(column[:-1])] = float(value)
+    return percentiles
+
+def load_target_stats(reports_dir, histograms, corrected=None):
+    """
+    Build TargetStats for every endpoint, every flow and the aggregate.
+
+    Counts and request rates come from the Locust stats CSV; rows of the
+    same name with different methods are combined. Without a histogram, a
+    combined target uses the worst CSV percentile of its methods.
+    `corrected` holds the histograms of `latency: corrected` rules.
+
+    Returns:
+        Dict mapping (is_flow, name) to TargetStats, with (False, "Aggregated")
+        for all requests except flows
+    """
+    rows = {}
+    with open(f"{reports_dir}/results_stats.csv") as f:
+        for row in csv.DictReader(f):
+            if row["Name"] != AGGREGATE_TARGET:
+                rows.setdefault((row["Type"] == FLOW_REQUEST_TYPE, row["Name"]), []).append(row)
+
+    targets = {}
+    totals = [0, 0, 0.0]
+    for target, group in rows.items():
+        requests = sum(int(row["Request Count"]) for row in group)
+        failures = sum(int(row["Failure Count"]) for row in group)
+        rps = sum(float(row["Requests/s"]) for row in group)
+        percentiles = {}
+        for row in group:
+            for percentile, value in _csv_percentiles(row).items():
+                percentiles[percentile] = max(value, percentiles.get(percentile, value))
+        max_ms = max(float(row["Max Response Time"]) for row in group)
+        targets[target] = TargetStats(requests, failures, rps, histograms.get(target), percentiles, max_ms,
+                                      (corrected or {}).get(target))
+        if not target[0]:
+            totals = [totals[0] + requests, totals[1] + failures, totals[2] + rps]
+
+    # Locust's Aggregated row also counts flows, so the aggregate is rebuilt
+    # from request rows; without histograms its CSV percentiles are unknown
+    request_histograms = [h for (is_flow, _), h in histograms.items() if not is_flow]
+    aggregate = merge_all(request_histograms) if request_histograms else None
+    corrected_histograms = [h for (is_flow, _), h in (corrected or {}).items() if not is_flow]
+    corrected_aggregate = merge_all(corrected_histograms) if corrected_histograms else None
+    targets[(False, AGGREGATE_TARGET)] = TargetStats(*totals, aggregate, corrected_histogram=corrected_aggregate)
+    return targets
+
+def check_generator_health(reports_dir):
+    """
+    Check whether the load generators were saturated during the run.
+
+    Saturation is always reported as a warning; it only counts as a
+    violation when `generator_monitor.fail_on_saturation` is enabled.
+
+    Returns:
+        List of violation messages (empty unless saturation fails the run)
+    """
+    path = f"{reports_dir}/{GENERATOR_HEALTH_FILE}"
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        health = json.load(f)
+    if not health["saturated"]:
+        return []
+
+    print("⚠️  Load generator saturated, latencies may measure the generator rather than the target:")
+    for warning in health["warnings"]:
+        print(f"  - {warning}")
+    if health.get("fail_on_saturation"):
+        return [f"Generator saturation: {warning}" for warning in health["warnings"]]
+    return []
+
+def evaluate_rules(rules, targets, histogram_source="hdr", corrected_source="hdr_corrected"):
+    """
+    Evaluate every endpoint, flow and aggregate rule.
+
+    Endpoints named in the thresholds file but absent from the results are
+    reported as skipped.
+
+    Returns:
+        Tuple of (checks, skipped) as produced by metrics.sla_rules.evaluate
+    """
+    checks = []
+    skipped = []
+    for (is_flow, name), stats in sorted(targets.items()):
+        if (is_flow, name) == (False, AGGREGATE_TARGET):
+            rule = rules.aggregate
+        else:
+            rule = rules.for_endpoint(name, defaults=not is_flow)
+        target_checks, target_skipped = evaluate(name, rule, stats, histogram_source, corrected_source)
+        checks.extend(target_checks)
+        skipped.extend(target_skipped)
+
+    recorded = {name for _, name in targets}
+    for name in rules.exact:
+        if name not in recorded:
+            skipped.append({"target": name, "metric": None, "threshold": None,
+                            "reason": "no requests with this name were recorded"})
+    return checks, skipped
+
+def write_junit(path, checks, skipped):
+    """
+    Write the verdicts as a JUnit XML suite, one test case per target and metric.
+    """
+    failures = [check for check in checks if not check["passed"]]
+    suite = ET.Element("testsuite", name="SLA", tests=str(len(checks) + len(skipped)),
+                       failures=str(len(failures)), skipped=str(len(skipped)), errors="0")
+    for check in checks:
+        case = ET.SubElement(suite, "testcase", classname=check["target"], name=check["metric"])
+        if not check["passed"]:
+            failure = ET.SubElement(case, "failure", message=check["message"], type="SLABreach")
+            failure.text = (f"actual {check['actual']} vs threshold {check['threshold']} "
+                            f"(source: {check['source']})")
+    for entry in skipped:
+        case = ET.SubElement(suite, "testcase", classname=entry["target"], name=entry["metric"] or "rules")
+        ET.SubElement(case, "skipped", message=entry["reason"])
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+def write_verdicts(reports_dir, checks, skipped):
+    """
+    Write sla_verdicts.json and sla_junit.xml to the report folder.
+    """
+    passed = all(check["passed"] for check in checks)
+    with open(f"{reports_dir}/{VERDICTS_FILE}", "w") as f:
+        json.dump({"passed": passed, "checks": checks, "skipped": skipped}, f, indent=2)
+    write_junit(f"{reports_dir}/{JUNIT_FILE}", checks, skipped)
 
 def validate_sla(reports_dir="reports"):
     """
     Validate that test results meet SLA thresholds.
-    
-    Checks both p95 response time and error rate against thresholds.
+
+    Evaluates the endpoint, flow and aggregate rules of the thresholds file
+    plus load generator health, and writes the verdicts as JSON and JUnit
+    XML before exiting non-zero on any violation.
     """
     # Check if report file exists
     report_file = f"{reports_dir}/results_stats.csv"
@@ -18,50 +214,46 @@ def validate_sla(reports_dir="reports"):
     
     # Load SLA thresholds
     try:
-        with open("thresholds/sla.yaml") as f:
-            sla = yaml.safe_load(f)
+        rules = SlaRules(load_thresholds())
     except FileNotFoundError:
-        print("Error: SLA thresholds file not found at thresholds/sla.yaml")
+        print(f"Error: SLA thresholds file not found at {DEFAULT_THRESHOLDS_FILE}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
     
-    # Validate results against SLA
-    violations = []
-    
+    # Exact percentiles from HDR histograms take precedence over CSV rounding
+    histograms, histogram_source = load_endpoint_histograms(reports_dir)
+    corrected, corrected_source = load_corrected_histograms(reports_dir, histograms, histogram_source)
+
     try:
-        with open(report_file) as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                name = row["Name"]
-                if name in sla:
-                    try:
-                        p95 = float(row["95%"])
-                        error_rate = float(row["Failure Rate %"])
-                        
-                        # Check p95 threshold
-                        if p95 > sla[name]["p95_ms"]:
-                            violations.append(
-                                f"P95 breach: {name} ({p95}ms > {sla[name]['p95_ms']}ms)"
-                            )
-                        
-                        # Check error rate threshold
-                        if error_rate > sla[name]["error_rate"]:
-                            violations.append(
-                                f"Error rate breach: {name} ({error_rate}% > {sla[name]['error_rate']}%)"
-                            )
-                    except (ValueError, KeyError) as e:
-                        print(f"Warning: Could not parse metrics for {name}: {e}")
-    except Exception as e:
+        targets = load_target_stats(reports_dir, histograms, corrected)
+    except (OSError, ValueError, KeyError) as e:
         print(f"Error reading report file: {e}")
         sys.exit(1)
-    
+
+    checks, skipped = evaluate_rules(rules, targets, histogram_source, corrected_source)
+    for message in check_generator_health(reports_dir):
+        checks.append({"target": "Load generator", "metric": "saturation", "threshold": None,
+                       "actual": None, "passed": False, "source": GENERATOR_HEALTH_FILE,
+                       "message": message})
+    write_verdicts(reports_dir, checks, skipped)
+
+    for entry in skipped:
+        metric = f" {entry['metric']}" if entry["metric"] else ""
+        print(f"Warning: Skipped {entry['target']}{metric}: {entry['reason']}")
+
     # Report results
+    violations = [check["message"] for check in checks if not check["passed"]]
     if violations:
         print("❌ SLA Violations Found:")
         for violation in violations:
             print(f"  - {violation}")
+        print(f"📄 Verdicts saved: {reports_dir}/{VERDICTS_FILE}, {reports_dir}/{JUNIT_FILE}")
         sys.exit(1)
     else:
-        print("✅ All SLAs met successfully!")
+        print(f"✅ All SLAs met successfully! ({len(checks)} checks)")
+        print(f"📄 Verdicts saved: {reports_dir}/{VERDICTS_FILE}, {reports_dir}/{JUNIT_FILE}")
         sys.exit(0)
 
 if __name__ == "__main__":
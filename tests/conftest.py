@@ -0,0 +1,9 @@
+# Put the repo root (config, metrics, auth) and the flat runner/ and
+# locustfiles/ module folders on sys.path, as the scripts do themselves
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, "runner"), os.path.join(ROOT_DIR, "locustfiles")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
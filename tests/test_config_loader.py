@@ -0,0 +1,108 @@
+import glob
+import os
+
+import pytest
+
+from config import loader
+from config.loader import (ENV_SCHEMA, NUMBER, ROOT_DIR, SCENARIO_SCHEMA, THRESHOLDS_SCHEMA, Field, load_file,
+                           validate)
+
+REQUEST = {"name": "List", "method": "GET", "endpoint": "/items"}
+
+
+def errors_of(value, field):
+    errors = []
+    validate(value, field, "", errors)
+    return errors
+
+
+@pytest.mark.parametrize("value, expected", [
+    ({"client": {"backend": "curl"}}, ["client.backend: must be one of requests, fasthttp, httpx, got 'curl'"]),
+    ({"run": {"users": True}}, ["run.users: expected integer, got bool True"]),
+    ({"run": {"users": -1}}, ["run.users: must be >= 0, got -1"]),
+    ({"run": {"workers": "many"}}, ["run.workers: must be auto or a number of processes, got 'many'"]),
+    ({"hots": "localhost"}, ["hots: unknown key (did you mean 'host'?)"]),
+    ({"client": {"max_connections": 0}}, ["client.max_connections: must be >= 1, got 0"]),
+    ({"auth": {"type": "none"}, "run": {"workers": "auto", "spawn_rate": 0.5}}, []),
+])
+def test_env_schema(value, expected):
+    assert errors_of(value, ENV_SCHEMA) == expected
+
+
+def test_auth_needs_token_url_and_credentials():
+    assert errors_of({"auth": {"type": "jwt"}}, ENV_SCHEMA) == [
+        "auth.token_url: required unless auth.type is none",
+        "auth.username: required unless auth.credentials or auth.type: none is set",
+        "auth.password: required unless auth.credentials or auth.type: none is set",
+    ]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ({}, ["requests: the scenario must define at least one request, flow or replay"]),
+    ({"requests": [{**REQUEST, "feeder": "ids"}]}, ["requests: request 'List' uses undefined feeder 'ids'"]),
+    ({"wait_time": {"min": 3, "max": 1}, "requests": [REQUEST]}, ["wait_time: min must not exceed max"]),
+    ({"requests": [REQUEST]}, []),
+])
+def test_scenario_schema(value, expected):
+    assert errors_of(value, SCENARIO_SCHEMA) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ({"defaults": {"p95_ms": -1}}, ["defaults.p95_ms: must be >= 0, got -1"]),
+    ({"GET Users": {"p99_ms": "fast"}}, ["GET Users.p99_ms: expected number, got str 'fast'"]),
+    ({"endpoints": {"re:[": {"p95_ms": 1}}},
+     ["endpoints.re:[: invalid regular expression (unterminated character set at position 0)"]),
+    ({"defaults": {"p99.9_ms": 800}, "endpoints": {"GET *": {"error_rate": 1}}}, []),
+])
+def test_thresholds_schema(value, expected):
+    assert errors_of(value, THRESHOLDS_SCHEMA) == expected
+
+
+def test_nested_paths_in_messages():
+    field = Field(dict, keys={"items": Field(list, items=Field(dict, keys={"n": Field(NUMBER, required=True)}))})
+
+    assert errors_of({"items": [{"n": 1}, {}, {"n": "x"}]}, field) == [
+        "items[1].n: missing required key",
+        "items[2].n: expected number, got str 'x'",
+    ]
+
+
+def test_none_is_allowed_unless_required():
+    assert errors_of(None, Field(int)) == []
+    assert errors_of(None, Field(int, required=True)) == ["top level: expected integer, got NoneType None"]
+
+
+@pytest.mark.parametrize("kind, pattern", [
+    ("config", "config/env.yaml"),
+    ("scenario", "scenarios/*.yaml"),
+    ("thresholds", "thresholds/sla.yaml"),
+])
+def test_shipped_files_are_valid(kind, pattern, tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, "CACHE_DIR", str(tmp_path))
+    paths = glob.glob(os.path.join(ROOT_DIR, pattern))
+    assert paths
+    for path in paths:
+        assert load_file(kind, path)
+
+
+def test_load_file_reports_schema_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, "CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "env.yaml"
+    path.write_text("run:\n  users: many\n")
+
+    with pytest.raises(ValueError, match="run.users: expected integer, got str 'many'"):
+        load_file("config", str(path))
+
+
+def test_load_file_reuses_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, "CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "env.yaml"
+    path.write_text("host: http://localhost:8080\nrun:\n  users: 5\n")
+    first = load_file("config", str(path))
+    loader._loaded.clear()
+
+    def fail(*args):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(loader, "_parse", fail)
+    assert load_file("config", str(path)) == first == {"host": "http://localhost:8080", "run": {"users": 5}}
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from metrics.hdr_histogram import MICROS_PER_MS, HdrHistogram, load_histograms, merge_all, save_histograms
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+@pytest.fixture(scope="module")
+def latencies():
+    # Log-normal response times in whole microseconds, 0.2ms to a few seconds
+    rng = np.random.default_rng(7)
+    return np.maximum(rng.lognormal(np.log(40_000), 0.8, 100_000).astype(np.int64), 200)
+
+
+def histogram_of(values):
+    histogram = HdrHistogram()
+    for value in values.tolist():
+        histogram.record_value(value)
+    return histogram
+
+
+def assert_within_precision(histogram, values):
+    expected = np.percentile(values, PERCENTILES, method="inverted_cdf")
+    actual = histogram.values_at_percentiles(PERCENTILES)
+    for percentile, exact in zip(PERCENTILES, expected):
+        assert actual[percentile] == pytest.approx(exact, rel=0.001), percentile
+
+
+def test_percentiles_match_numpy_within_precision(latencies):
+    histogram = histogram_of(latencies)
+
+    assert histogram.total_count == len(latencies)
+    assert histogram.min_value == latencies.min()
+    assert histogram.max_value == latencies.max()
+    assert histogram.mean == pytest.approx(latencies.mean())
+    assert_within_precision(histogram, latencies)
+
+
+def test_single_value_percentiles():
+    histogram = HdrHistogram()
+    histogram.record_ms(12.5)
+
+    assert histogram.percentiles_ms((50, 99.9)) == {50: 12.5, 99.9: 12.5}
+    assert histogram.value_at_percentile(0) == 12_500
+
+
+def test_empty_histogram_reports_zero():
+    histogram = HdrHistogram()
+
+    assert histogram.values_at_percentiles((50, 99)) == {50: 0, 99: 0}
+    assert histogram.mean == 0.0
+
+
+def test_values_are_clamped_to_highest_trackable():
+    histogram = HdrHistogram(highest_trackable=1_000_000)
+    histogram.record_value(5_000_000)
+
+    assert histogram.max_value == 1_000_000
+
+
+def test_negative_values_are_rejected():
+    with pytest.raises(ValueError):
+        HdrHistogram().record_value(-1)
+
+
+def test_encode_decode_round_trip(latencies):
+    histogram = histogram_of(latencies[:5_000])
+    decoded = HdrHistogram.decode(histogram.encode())
+
+    assert decoded.counts == histogram.counts
+    assert decoded.total_count == 5_000
+    assert decoded.min_value == histogram.min_value
+    assert decoded.max_value == histogram.max_value
+    assert decoded.mean == pytest.approx(histogram.mean)
+
+
+def test_merged_parts_equal_the_whole(latencies):
+    parts = [histogram_of(part) for part in np.array_split(latencies, 4)]
+    merged = merge_all(parts)
+    whole = histogram_of(latencies)
+
+    assert merged.counts == whole.counts
+    assert merged.total_count == whole.total_count
+    assert (merged.min_value, merged.max_value) == (whole.min_value, whole.max_value)
+    assert_within_precision(merged, latencies)
+
+
+def test_merge_into_empty_keeps_min():
+    histogram = HdrHistogram()
+    histogram.merge(histogram_of(np.array([3 * MICROS_PER_MS, 9 * MICROS_PER_MS])))
+
+    assert histogram.min_value == 3 * MICROS_PER_MS
+    assert histogram.max_value == 9 * MICROS_PER_MS
+
+
+def test_save_and_load_histograms(tmp_path, latencies):
+    histograms = {"GET\tList Users": histogram_of(latencies[:1_000]),
+                  "POST\tCreate User": histogram_of(latencies[1_000:1_500])}
+    path = tmp_path / "latency_histograms.hdr"
+    save_histograms(str(path), histograms)
+    loaded = load_histograms(str(path))
+
+    assert sorted(loaded) == sorted(histograms)
+    for key, histogram in histograms.items():
+        assert loaded[key].counts == histogram.counts
+        assert loaded[key].total_count == histogram.total_count
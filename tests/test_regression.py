@@ -0,0 +1,74 @@
+import pytest
+
+from regression import MAD_SCALE, compare_runs
+
+
+def run(requests=1_000, **metrics):
+    return {"GET Users": {"requests": requests, **metrics}}
+
+
+def regressions_of(current, history, **kwargs):
+    return {(r["endpoint"], r["metric"]): r for r in compare_runs(current, history, **kwargs)}
+
+
+def test_single_reference_uses_min_change():
+    found = regressions_of(run(p95=115.0, p99=105.0), [run(p95=100.0, p99=100.0)])
+
+    assert list(found) == [("GET Users", "p95")]
+    regression = found[("GET Users", "p95")]
+    assert regression["reference"] == 100.0
+    assert regression["change_pct"] == pytest.approx(15.0)
+    assert regression["z_score"] is None
+    assert regression["reference_runs"] == 1
+
+
+def test_median_and_mad_of_history():
+    history = [run(p95=value) for value in (100.0, 102.0, 98.0, 101.0, 99.0)]
+
+    regression = regressions_of(run(p95=110.0), history)[("GET Users", "p95")]
+
+    # Median 100; absolute deviations 0, 2, 2, 1, 1 have a median of 1
+    assert regression["reference"] == 100.0
+    assert regression["z_score"] == pytest.approx(10 / MAD_SCALE)
+    assert regression["reference_runs"] == 5
+
+
+def test_noisy_history_is_not_significant():
+    # Median 100 and MAD 10: a 20% rise is only 1.35 scaled MADs away
+    history = [run(p95=value) for value in (80.0, 100.0, 120.0, 90.0, 110.0)]
+
+    assert regressions_of(run(p95=120.0), history) == {}
+    assert ("GET Users", "p95") in regressions_of(run(p95=160.0), history)
+
+
+def test_identical_history_has_infinite_z_score():
+    history = [run(p99=50.0)] * 3
+
+    regression = regressions_of(run(p99=60.0), history)[("GET Users", "p99")]
+
+    assert regression["z_score"] == float("inf")
+
+
+def test_direction_per_metric():
+    history = [run(rps=100.0, p50=10.0)]
+
+    found = regressions_of(run(rps=80.0, p50=8.0), history)
+
+    assert list(found) == [("GET Users", "rps")]
+    assert found[("GET Users", "rps")]["change_pct"] == pytest.approx(-20.0)
+
+
+def test_error_rate_needs_an_absolute_change():
+    history = [run(error_rate=0.1)]
+
+    assert regressions_of(run(error_rate=0.5), history) == {}
+    assert ("GET Users", "error_rate") in regressions_of(run(error_rate=1.5), history)
+
+
+def test_endpoints_below_min_requests_are_skipped():
+    assert regressions_of(run(requests=50, p95=500.0), [run(p95=100.0)]) == {}
+    assert regressions_of(run(requests=50, p95=500.0), [run(p95=100.0)], min_requests=10)
+
+
+def test_endpoints_missing_from_history_are_skipped():
+    assert compare_runs(run(p95=500.0), [{"GET Posts": {"requests": 1_000, "p95": 100.0}}]) == []
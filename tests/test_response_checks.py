@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from flows import compile_jsonpath
+from response_checks import MISSING, CheckFailed, JsonCheck, ResponseChecks, compile_checks, find_json
+
+DOCUMENT = json.dumps({
+    "data": {
+        "items": [
+            {"id": 1, "tags": ["a", "b"], "meta": {"score": 0.5}},
+            {"id": 2, "name": 'quoted "name"', "empty": {}, "none": None},
+        ],
+        "total": 2,
+    },
+    "ok": True,
+})
+
+
+def find(text, path):
+    return find_json(text, compile_jsonpath(path))
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("$.ok", True),
+    ("$.data.total", 2),
+    ("$.data.items[0].id", 1),
+    ("$.data.items[0].tags[1]", "b"),
+    ("$.data.items[0].meta.score", 0.5),
+    ("$.data.items[1].name", 'quoted "name"'),
+    ("$.data.items[1].empty", {}),
+    ("$.data.items[1].none", None),
+    ("$.data.items[-1].id", 2),
+    ("$['data']['items'][0][\"id\"]", 1),
+    ("$.data.items[0]", {"id": 1, "tags": ["a", "b"], "meta": {"score": 0.5}}),
+])
+def test_find_json(path, expected):
+    assert find(DOCUMENT, path) == expected
+
+
+@pytest.mark.parametrize("path", [
+    "$.missing",
+    "$.data.items[2]",
+    "$.data.items[-3]",
+    "$.data.items[1].empty.key",
+    "$.ok.nested",
+    "$.data.total[0]",
+])
+def test_find_json_missing(path):
+    assert find(DOCUMENT, path) is MISSING
+
+
+def test_find_json_with_whitespace():
+    assert find(' \n{ "a" : [ 1 ,\t{ "b" : "c" } ] }\n', "$.a[1].b") == "c"
+
+
+def test_truncated_body_after_the_target():
+    # Nothing after the target is read, so the cut-off tail does not matter
+    truncated = DOCUMENT[:DOCUMENT.index('"name"')]
+
+    assert find(truncated, "$.data.items[0].tags[1]") == "b"
+
+
+@pytest.mark.parametrize("path", ["$.data.items[1].name", "$.data.items[-1].id", "$.ok"])
+def test_truncated_body_before_the_target(path):
+    truncated = DOCUMENT[:DOCUMENT.index('"name"') + 3]
+
+    with pytest.raises(ValueError):
+        find(truncated, path)
+
+
+def test_truncated_body_fails_the_check():
+    checks = compile_checks({"json": [{"path": "$.ok"}]})
+
+    failure = checks.evaluate(200, {}, DOCUMENT[:40].encode())
+
+    assert isinstance(failure, CheckFailed)
+    assert str(failure) == "json: body is not valid JSON"
+
+
+@pytest.mark.parametrize("equals, body, passes", [
+    (1, '{"v": 1}', True),
+    (1, '{"v": 1.0}', True),
+    (1, '{"v": true}', False),
+    (True, '{"v": 1}', False),
+    (False, '{"v": 0}', False),
+    (False, '{"v": false}', True),
+    ("active", '{"v": "active"}', True),
+    (None, '{"v": null}', True),
+    (None, '{"v": 0}', False),
+])
+def test_json_equals(equals, body, passes):
+    failure = JsonCheck({"path": "$.v", "equals": equals}).failure(body)
+
+    assert (failure is None) == passes
+    if failure is not None:
+        assert str(failure) == f"json: $.v is not {equals!r}"
+
+
+def test_json_presence():
+    check = JsonCheck({"path": "$.v"})
+
+    assert check.failure('{"v": null}') is None
+    assert str(check.failure('{"w": 1}')) == "json: $.v missing"
+
+
+def test_checks_run_cheapest_first():
+    checks = ResponseChecks(statuses=[200], max_body_bytes=10, json_checks=[JsonCheck({"path": "$.v"})])
+
+    assert str(checks.evaluate(500, {}, b"{}")) == "status: got 500, expected 200"
+    assert str(checks.evaluate(200, {}, b'{"w": 12345678}')) == "body_size: over 10 bytes"
+    assert str(checks.evaluate(200, {}, b'{"w": 1}')) == "json: $.v missing"
+    assert checks.evaluate(200, {}, b'{"v": 1}') is None
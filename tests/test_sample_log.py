@@ -0,0 +1,133 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from metrics.sample_log import (ENDPOINTS_SUFFIX, SAMPLE_RECORD, SAMPLE_SUFFIX, GroupedLatencies, SampleLogWriter,
+                                load_sample_logs, read_sample_file, summarize_samples)
+
+
+def write_log(directory, node, samples, close=True, batch=100):
+    writer = SampleLogWriter(os.path.join(directory, f"{node}{SAMPLE_SUFFIX}"), flush_bytes=SAMPLE_RECORD.size * batch)
+    for sample in samples:
+        writer.record(*sample)
+    if close:
+        writer.close()
+    return writer
+
+
+@pytest.fixture
+def two_workers(tmp_path):
+    """
+    Two sample files whose endpoints were interned in a different order.
+    """
+    rng = np.random.default_rng(3)
+    latency = {"users": rng.lognormal(np.log(30), 0.5, 3_000), "posts": rng.lognormal(np.log(80), 0.3, 1_000)}
+    worker_0 = [(1000.0 + i * 0.01, "GET", "Users", 200, float(ms), 100, False)
+                for i, ms in enumerate(latency["users"][:2_000])]
+    worker_0 += [(1001.0, "POST", "Posts", 500, float(ms), 10, True) for ms in latency["posts"][:250]]
+    worker_1 = [(1002.0, "POST", "Posts", 201, float(ms), 10, False) for ms in latency["posts"][250:]]
+    worker_1 += [(1050.5, "GET", "Users", 200, float(ms), 100, i % 10 == 0)
+                 for i, ms in enumerate(latency["users"][2_000:])]
+    write_log(tmp_path, "worker-0", worker_0)
+    write_log(tmp_path, "worker-1", worker_1)
+    # Samples are stored as float32
+    return tmp_path, {key: values.astype(np.float32) for key, values in latency.items()}
+
+
+def test_summarize_samples_counts_and_percentiles(two_workers):
+    directory, latency = two_workers
+    summary = summarize_samples(str(directory))
+
+    assert summary["total_samples"] == 4_000
+    assert summary["start"] == 1000.0
+    assert summary["end"] == 1050.5
+
+    users = summary["endpoints"]["GET Users"]
+    assert (users["requests"], users["failures"], users["bytes"]) == (3_000, 100, 300_000)
+    posts = summary["endpoints"]["POST Posts"]
+    assert (posts["requests"], posts["failures"], posts["bytes"]) == (1_000, 250, 10_000)
+
+    for name, key in (("GET Users", "users"), ("POST Posts", "posts")):
+        values = latency[key]
+        assert summary["endpoints"][name]["max"] == pytest.approx(float(values.max()))
+        for p in (50, 95, 99):
+            exact = np.percentile(values, p, method="inverted_cdf")
+            assert summary["endpoints"][name][f"p{p}"] == pytest.approx(float(exact), rel=0.001)
+
+
+def test_summarize_samples_without_samples(tmp_path):
+    assert summarize_samples(str(tmp_path)) is None
+    write_log(tmp_path, "idle", [])
+    assert summarize_samples(str(tmp_path)) is None
+
+
+def test_grouped_latencies_chunks_equal_one_pass():
+    rng = np.random.default_rng(11)
+    groups = rng.integers(0, 3, 10_000)
+    latency = rng.exponential(50, 10_000).astype(np.float32)
+
+    whole = GroupedLatencies(4)
+    whole.add(groups, latency)
+    chunked = GroupedLatencies(4)
+    for part in np.array_split(np.arange(10_000), 100):
+        chunked.add(groups[part], latency[part])
+
+    assert chunked.requests.tolist() == whole.requests.tolist()
+    assert chunked.maximum.tolist() == whole.maximum.tolist()
+    expected = whole.percentiles((50, 99))
+    actual = chunked.percentiles((50, 99))
+    for p in (50, 99):
+        np.testing.assert_array_equal(actual[p], expected[p])
+    # The fourth group never got a sample
+    assert np.isnan(actual[50][3])
+    for group in range(3):
+        exact = np.percentile(latency[groups == group], 99, method="inverted_cdf")
+        assert actual[99][group] == pytest.approx(float(exact), rel=0.001)
+
+
+def test_unclosed_log_is_readable(tmp_path):
+    samples = [(1000.0 + i, "GET", "Users", 200, 10.0 + i, 1, False) for i in range(2_500)]
+    # Batches larger than the file buffer go straight to disk
+    writer = write_log(tmp_path, "killed", samples, close=False, batch=1_000)
+
+    # Only the full batches reached the file, with the sidecar written ahead of them
+    endpoints, records = read_sample_file(writer.path)
+    assert endpoints == [["GET", "Users"]]
+    assert len(records) == 2_000
+    assert records["latency_ms"][-1] == pytest.approx(2_009.0)
+
+
+def test_partial_trailing_record_is_ignored(tmp_path):
+    writer = write_log(tmp_path, "worker", [(1000.0, "GET", "Users", 200, 5.0, 1, False)] * 3)
+    with open(writer.path, "ab") as f:
+        f.write(b"\x00" * (SAMPLE_RECORD.size // 2))
+
+    _, records = read_sample_file(writer.path)
+    assert len(records) == 3
+
+
+def test_file_without_sidecar_is_skipped(tmp_path, caplog):
+    write_log(tmp_path, "good", [(1000.0, "GET", "Users", 200, 5.0, 1, False)])
+    orphan = write_log(tmp_path, "orphan", [(1000.0, "GET", "Posts", 200, 5.0, 1, False)])
+    os.remove(orphan.path[:-len(SAMPLE_SUFFIX)] + ENDPOINTS_SUFFIX)
+
+    endpoints, parts = load_sample_logs(str(tmp_path))
+
+    assert endpoints == [("GET", "Users")]
+    assert len(parts) == 1
+    assert "orphan" in caplog.text
+
+
+def test_endpoint_ids_are_unified_across_files(tmp_path):
+    write_log(tmp_path, "a", [(1.0, "GET", "Users", 200, 1.0, 1, False), (1.0, "GET", "Posts", 200, 1.0, 1, False)])
+    write_log(tmp_path, "b", [(1.0, "GET", "Posts", 200, 1.0, 1, False)])
+
+    endpoints, parts = load_sample_logs(str(tmp_path))
+
+    assert endpoints == [("GET", "Users"), ("GET", "Posts")]
+    with open(tmp_path / f"b{ENDPOINTS_SUFFIX}") as f:
+        assert json.load(f) == [["GET", "Posts"]]
+    samples, mapping = parts[1]
+    assert mapping[samples["endpoint"]].tolist() == [1]
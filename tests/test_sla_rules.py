@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+from metrics.sla_rules import SlaRules, compile_pattern, rule_checks
+
+THRESHOLDS = {
+    "defaults": {"p95_ms": 500, "error_rate": 1},
+    "endpoints": {
+        "GET *": {"p95_ms": 300, "p99_ms": 800},
+        "re:^GET /users": {"p95_ms": 200},
+        "GET /users/{id}": {"p95_ms": 100},
+    },
+    "aggregate": {"p99_ms": 1000},
+}
+
+
+@pytest.fixture
+def rules():
+    return SlaRules(THRESHOLDS)
+
+
+def test_defaults_apply_when_nothing_matches(rules):
+    assert rules.for_endpoint("POST /orders") == {"p95_ms": 500, "error_rate": 1}
+
+
+def test_patterns_override_defaults_in_file_order(rules):
+    assert rules.for_endpoint("GET /items") == {"p95_ms": 300, "error_rate": 1, "p99_ms": 800}
+    # The regex comes after the glob, so it wins
+    assert rules.for_endpoint("GET /users") == {"p95_ms": 200, "error_rate": 1, "p99_ms": 800}
+
+
+def test_exact_name_wins_over_patterns(rules):
+    assert rules.for_endpoint("GET /users/{id}") == {"p95_ms": 100, "error_rate": 1, "p99_ms": 800}
+
+
+def test_flows_skip_defaults(rules):
+    assert rules.for_endpoint("Checkout", defaults=False) == {}
+    assert rules.for_endpoint("GET flow", defaults=False) == {"p95_ms": 300, "p99_ms": 800}
+
+
+def test_flat_layout_and_endpoints_section_merge():
+    rules = SlaRules({"GET /a": {"p95_ms": 1}, "endpoints": {"GET /a": {"p95_ms": 2}}})
+
+    assert rules.for_endpoint("GET /a") == {"p95_ms": 2}
+
+
+def test_empty_thresholds():
+    assert SlaRules(None).for_endpoint("GET /a") == {}
+    assert SlaRules(None).aggregate == {}
+
+
+def test_resolved_rules_are_cached_per_flow_flag(rules):
+    assert rules.for_endpoint("GET /items") is rules.for_endpoint("GET /items")
+    assert rules.for_endpoint("GET /items", defaults=False) == {"p95_ms": 300, "p99_ms": 800}
+
+
+def test_aggregate_rule(rules):
+    assert rules.aggregate == {"p99_ms": 1000}
+
+
+def test_compile_pattern():
+    assert compile_pattern("GET /users") is None
+    assert compile_pattern("GET /users/*")("GET /users/42")
+    assert not compile_pattern("GET /users/*")("POST /users/42")
+    # Regexes search anywhere in the name unless anchored
+    assert compile_pattern("re:users")("GET /users/42")
+    with pytest.raises(re.error):
+        compile_pattern("re:(")
+
+
+def test_rule_checks_order():
+    rule = {"apdex": {"t_ms": 200, "min": 0.9}, "p99.9_ms": 900, "error_rate": 1, "p50_ms": 100, "p99_ms": 500}
+
+    assert list(rule_checks(rule)) == [
+        ("p50_ms", 100), ("p99_ms", 500), ("p99.9_ms", 900), ("error_rate", 1), ("apdex", 0.9),
+    ]
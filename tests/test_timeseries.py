@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+
+from metrics.sample_log import SAMPLE_SUFFIX, GroupedLatencies, SampleLogWriter
+from timeseries import AGGREGATE_NAME, _bucket_stats, timeseries_from_samples
+
+
+def test_bucket_stats():
+    latencies = GroupedLatencies(3)
+    latencies.add(np.array([0, 0, 0, 0, 2], dtype=np.int64), np.array([10, 20, 30, 40, 5], dtype=np.float32))
+    failures = np.array([1.0, 0.0, 1.0])
+
+    stats = _bucket_stats(latencies, failures, interval=2)
+
+    assert stats["rps"].tolist() == [2.0, 0.0, 0.5]
+    assert stats["error_rate"][0] == 25.0
+    assert np.isnan(stats["error_rate"][1])
+    assert stats["error_rate"][2] == 100.0
+    # Bucket upper edges, capped at the group's maximum
+    assert stats["p50"][0] == pytest.approx(20.0, rel=0.001)
+    assert stats["p99"][0] == 40.0
+    assert np.isnan(stats["p95"][1])
+    assert stats["p95"][2] == 5.0
+
+
+def test_timeseries_from_samples(tmp_path):
+    writers = [SampleLogWriter(os.path.join(tmp_path, f"worker-{i}{SAMPLE_SUFFIX}")) for i in range(2)]
+    # Second 0: 4 users requests, one failed; second 1: none; second 2: 2 posts requests
+    for i, ms in enumerate((10.0, 20.0, 30.0, 40.0)):
+        writers[i % 2].record(1000.2 + i * 0.1, "GET", "Users", 200, ms, 1, i == 3)
+    writers[1].record(1002.5, "POST", "Posts", 201, 100.0, 1, False)
+    writers[0].record(1002.9, "POST", "Posts", 201, 300.0, 1, False)
+    for writer in writers:
+        writer.close()
+
+    timeseries = timeseries_from_samples(str(tmp_path))
+
+    assert timeseries["source"] == "samples"
+    assert timeseries["start"] == 1000
+    assert timeseries["offsets"] == [0, 1, 2]
+    users = timeseries["endpoints"]["GET Users"]
+    assert users["rps"] == [4.0, 0.0, 0.0]
+    assert users["error_rate"] == [25.0, None, None]
+    assert users["p99"] == [40.0, None, None]
+    posts = timeseries["endpoints"]["POST Posts"]
+    assert posts["rps"] == [0.0, 0.0, 2.0]
+    assert posts["p50"][2] == pytest.approx(100.0, rel=0.001)
+    aggregate = timeseries["endpoints"][AGGREGATE_NAME]
+    assert aggregate["rps"] == [4.0, 0.0, 2.0]
+    assert aggregate["error_rate"] == [25.0, None, 0.0]
+    assert aggregate["p99"] == [40.0, None, 300.0]
+
+
+def test_timeseries_interval(tmp_path):
+    writer = SampleLogWriter(os.path.join(tmp_path, f"local{SAMPLE_SUFFIX}"))
+    for second in range(10):
+        writer.record(2000.0 + second, "GET", "Users", 200, 5.0, 1, False)
+    writer.close()
+
+    timeseries = timeseries_from_samples(str(tmp_path), interval=5)
+
+    assert timeseries["offsets"] == [0, 5]
+    assert timeseries["endpoints"]["GET Users"]["rps"] == [1.0, 1.0]
+
+
+def test_timeseries_without_samples(tmp_path):
+    assert timeseries_from_samples(str(tmp_path)) is None